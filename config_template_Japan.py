@@ -5,6 +5,27 @@ LOG_LEVEL = "INFO"
 # Run the different pathways in parallel
 RUN_PARALLEL = False
 
+# Maximum number of runs at the same time when running in parallel (None: number of cores)
+# Lower this if the runs don't fit in memory together
+MAX_WORKERS = None
+
+# Number of times a failed run is tried again when running in parallel
+RUN_RETRIES = 0
+
+# When running in parallel, read the intermediate data that runs have in common once before starting the workers
+# The workers share one read-only copy of it in memory instead of each reading and parsing the files again
+FORK_AFTER_LOAD = False
+
+# Path of a work queue (SQLite database) to spread the runs over several hosts, e.g. "queue/runs.db" (None: no queue)
+# Runs are added to the queue, and run by every host where the model is started with the same queue and output directory
+# A run is given back to the queue when its worker sends no heartbeat for QUEUE_TIMEOUT_SECONDS
+WORK_QUEUE = None
+QUEUE_HEARTBEAT_SECONDS = 30
+QUEUE_TIMEOUT_SECONDS = 300
+
+# Directory of the model outputs, relative to the repository
+OUTPUT_DIR = "output"
+
 # MODEL_SCOPE = "World"
 MODEL_SCOPE = "Japan"
 
@@ -35,10 +56,16 @@ run_config = {
     "OPTIMIZE_PATHWAY",
     "CALCULATE_OUTPUTS",
     "EXPORT_OUTPUTS",
+    #"BRANCH_PATHWAY",
     "PLOT_AVAILABILITIES",
     "MERGE_OUTPUTS",
 }
 
+# Skip the sections above whose input data, code and config did not change since they last ran
+# Only the data, code and config listed for each section in main.py are compared (e.g. not the code in util/)
+# Delete output/<MODEL_SCOPE>/<pathway>/<sensitivity>/stages.json to run all sections again
+SKIP_UNCHANGED_STAGES = False
+
 # Which pathway(s) to take; this impacts how technologies are ranked (see ranking config below):
 # most economic, fast abatement, no fossil, no fossil strict, business as usual
 PATHWAYS = [
@@ -58,6 +85,25 @@ SENSITIVITIES = [
     # "ccs"
 ]
 
+# Sweep config constants over a design of values, e.g. {"RETROFIT_CAP": [0.05, 0.1], "REGIONAL_CAP": [0.2, 0.3]} (empty: no sweep)
+# Every pathway and sensitivity is run for each combination of values, in output/sweep/<name of the combination>
+# Sections before the first one that depends on a swept constant run once, and all combinations reuse their outputs
+# "grid" runs all combinations, "random" runs SWEEP_SAMPLES random ones (a (low, high) tuple draws from a range)
+# The results are collected in output/<MODEL_SCOPE>/Aggregated/sweep_*.csv, with a column for every swept constant
+SWEEP_PARAMETERS = {}
+SWEEP_DESIGN = "grid"
+SWEEP_SAMPLES = 20
+SWEEP_SEED = 0
+
+# Seed of the random tie-breaks in the pathway optimizer: order of the chemicals, choice between equally ranked transitions and plants
+RANDOM_SEED = 100
+
+# Run every pathway and sensitivity (and sweep combination) for ENSEMBLE_SIZE seeds, to see how much the results depend on the tie-breaks (0: no ensemble)
+# The seeds come from independent streams of RANDOM_SEED, so the same ensemble runs again with the same RANDOM_SEED
+# Percentile bands over the seeds of the volume per technology, emissions and costs (including LCOX) are in output/<MODEL_SCOPE>/Aggregated/ensemble_*.csv
+ENSEMBLE_SIZE = 0
+ENSEMBLE_PERCENTILES = [5, 50, 95]
+
 # For the no fossil scenario: from this year, no more fossil is allowed to be built new
 NO_FOSSIL_FROM_YEAR = 2030
 
@@ -112,6 +158,36 @@ AGE_DEPENDENCY = ["Ethylene", "Propylene", "Butadiene", "Benzene", "Toluene", "X
 # it won't be able to build any integer number of plants without violating the tech ramp up rate
 MAX_PLANTS_RAMP_UP = 4*(3000/PLANT_SPEC_OVERRIDE["assumed_plant_capacity"])
 
+# Build new plants from the best ranked transitions without ranking again, until none is valid
+# Plants are picked at random among the best transitions, but with other random draws than when building them one at a time, so results for the same RANDOM_SEED differ
+BUILD_NEW_IN_BULK = False
+
+# Retrofit plants with the best ranked transitions without ranking again, until none is valid
+# Plants are picked at random among the best transitions, but with other random draws than when retrofitting them one at a time, so results for the same RANDOM_SEED differ
+RETROFIT_IN_BULK = False
+
+# Optimize the chemicals that don't share technologies or methanol at the same time within a year, each group in its own worker process (Methanol runs after them)
+# Every regional resource is then capped on each chemical's share, so the groups can't use each other's resources; results differ from optimizing the chemicals one by one
+# The room each region has under REGIONAL_CAP is split between the groups in the same way
+# Maximum number of workers for the groups of chemicals (None: number of cores)
+PARALLEL_CHEMICALS = False
+CHEMICAL_WORKERS = None
+
+# Save the state of the pathway optimization at the end of every year, in output/<MODEL_SCOPE>/<pathway>/<sensitivity>/checkpoints
+SAVE_CHECKPOINTS = False
+
+# Resume the pathway optimization from the checkpoint of this year, or from the last one saved with "latest" (None: start from the beginning)
+# The results are the same as without interruption, as long as the inputs and config did not change
+RESUME_FROM_CHECKPOINT = None
+
+# What-if branches of the pathway, continued from the checkpoint of BRANCH_FROM_YEAR (needs SAVE_CHECKPOINTS)
+# Each branch changes the config constants in its dict, e.g. {"late_fossil_ban": {"NO_FOSSIL_FROM_YEAR": 2040}}
+# Constants derived from others in this file (e.g. MAX_PLANTS_RAMP_UP) must be changed explicitly
+# Constants of the sections before the pathway optimization (e.g. NUMBER_OF_BINS_RANKING, DISCOUNT_RATE) can't be changed
+# The outputs of each branch are in output/<MODEL_SCOPE>/<pathway>/<sensitivity>/branches/<name>
+BRANCHES = {}
+BRANCH_FROM_YEAR = None
+
 # Input chemicals for methanol demand
 # These chemicals have production routes that use methanol as raw material and therefore affect overall methanol demand
 METHANOL_DEPENDENCY = ["Ethylene", "Propylene", "Benzene", "Toluene", "Xylene"]
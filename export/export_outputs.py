@@ -4,6 +4,7 @@ from plotly.offline import plot
 
 from flow.import_data.intermediate_data import IntermediateDataImporter
 from models.decarbonization import DecarbonizationPathway
+from models.run_config import RunConfig
 
 
 def load_technologies_over_time_region(
@@ -139,7 +140,11 @@ def pivot_data_region(df: pd.DataFrame) -> pd.DataFrame:
 
 
 def export_outputs(
-    pathway: DecarbonizationPathway, sensitivity: str, chemicals: list, model_scope: str
+    pathway: DecarbonizationPathway,
+    sensitivity: str,
+    chemicals: list,
+    model_scope: str,
+    config: RunConfig = None,
 ):
     """
     Export outputs made in calculate_outputs to a format more suited for analysis (pivot and aggregate)
@@ -149,12 +154,14 @@ def export_outputs(
         sensitivity:
         chemicals:
         model_scope:
+        config: Config of the run
     """
     importer = IntermediateDataImporter(
         pathway=pathway,
         sensitivity=sensitivity,
         chemicals=chemicals,
         model_scope=model_scope,
+        config=config,
     )
 
     plot_availabilities(importer)
@@ -5,8 +5,9 @@ import shutil
 
 import pandas as pd
 
-from config import END_YEAR, LOG_LEVEL, START_YEAR
+from config import LOG_LEVEL
 from flow.import_data.intermediate_data import IntermediateDataImporter
+from models.run_config import RunConfig
 
 logger = logging.getLogger(name=__name__)
 logger.setLevel(LOG_LEVEL)
@@ -101,7 +102,11 @@ ALL_CHEMICALS = {
 
 
 def create_dataframe(
-    chemical: bool = True, region: bool = False, tech: bool = False, **kwargs
+    chemical: bool = True,
+    region: bool = False,
+    tech: bool = False,
+    config: RunConfig = None,
+    **kwargs,
 ):
     """
     Create an empty dataframe with the right index and the order.
@@ -110,6 +115,7 @@ def create_dataframe(
         chemical: boolean to add as an index
         region: boolean to add as an index
         tech: boolean to add as an index
+        config: Config of the run, to import the tech dataframe
         **kwargs: pathway and sensitivity variable to import the tech dataframe
 
     Returns: Empty dataframe with the right index
@@ -162,10 +168,11 @@ def create_dataframe(
                 pathway = value
             elif key == "sensitivity":
                 sensitivity = value
-        dl = IntermediateDataImporter(pathway=pathway, sensitivity=sensitivity)
+        dl = IntermediateDataImporter(
+            pathway=pathway, sensitivity=sensitivity, config=config
+        )
 
-        df_tech = dl.get_tech()
-        df_tech["empty"] = ""
+        df_tech = dl.get_tech().assign(empty="")
         tech_columns = df_tech.columns[
             ~df_tech.columns.str.contains("available")
             & ~df_tech.columns.str.contains("chemical")
@@ -288,6 +295,7 @@ def save_outputs_xlsx(
     writer,
     index_col,
     empty_join=False,
+    config: RunConfig = None,
 ):
     """
     Save specifics outputs in on xlsx file
@@ -300,6 +308,7 @@ def save_outputs_xlsx(
         writer:
         index_col:
         empty_join:
+        config: Config of the run
 
     Returns:
 
@@ -421,7 +430,9 @@ def save_outputs_xlsx(
 
     elif category == "tech":
         # create for various technology functions
-        df_tech = create_dataframe(tech=True, pathway=pathway, sensitivity=sensitivity)
+        df_tech = create_dataframe(
+            tech=True, config=config, pathway=pathway, sensitivity=sensitivity
+        )
         tech_cat_list = list(df_tech.tech_category.unique())
         tech_cat_list.remove("empty")
         for tech_category in tech_cat_list:
@@ -512,11 +523,16 @@ def _merge_wedge_charts(sensitivity_list: dict, cwd: str, model_scope: str):
                             logger.warning(f"Did not find {new_wedge_name}, skipping")
 
 
-def merge_outputs(model_scope, chemicals):
+def merge_outputs(model_scope, chemicals, config: RunConfig = None):
     """
     Merge outputs for different pathway/sensitivity runs
 
+    Args:
+        model_scope: Scope of the runs
+        chemicals: Chemicals of the runs
+        config: Config of the runs, defaults to config.py
     """
+    config = config or RunConfig()
 
     # Setting directories
     agg_output_dir = f"output/{model_scope}/Aggregated"
@@ -572,6 +588,7 @@ def merge_outputs(model_scope, chemicals):
                     sensitivity=sensitivity,
                     model_scope=model_scope,
                     chemicals=chemicals,
+                    config=config,
                 )
                 file_path = dl.export_dir.joinpath(
                     "final", "All", f"{category}_output.csv"
@@ -591,6 +608,7 @@ def merge_outputs(model_scope, chemicals):
                     sensitivity=sensitivity,
                     writer=writer,
                     index_col=index_col,
+                    config=config,
                 )
 
         if category in ["emission", "cost", "inputs"]:
@@ -614,7 +632,9 @@ def merge_outputs(model_scope, chemicals):
     for category in ["region", "tech"]:
         for pathway in pathway_list:
             for sensitivity in sensitivity_list[pathway]:
-                dl = IntermediateDataImporter(pathway=pathway, sensitivity=sensitivity)
+                dl = IntermediateDataImporter(
+                    pathway=pathway, sensitivity=sensitivity, config=config
+                )
                 file_path = dl.export_dir.joinpath(
                     "final", "All", f"all_chemical_{category}.csv"
                 )
@@ -627,12 +647,15 @@ def merge_outputs(model_scope, chemicals):
                     writer=writer,
                     index_col=[0, 1],
                     empty_join=True,
+                    config=config,
                 )
 
     # Loop across the ranking file to output
     for pathway in pathway_list:
         for sensitivity in sensitivity_list[pathway]:
-            dl = IntermediateDataImporter(pathway=pathway, sensitivity=sensitivity)
+            dl = IntermediateDataImporter(
+                pathway=pathway, sensitivity=sensitivity, config=config
+            )
             for variable, folder, file_name in [
                 ("lcox", "ranking", "new_build_post_rank"),
                 ("scope_1", "intermediate", "emissions"),
@@ -721,7 +744,9 @@ def merge_outputs(model_scope, chemicals):
     df_empty = pd.DataFrame()
     for pathway in pathway_list:
         for sensitivity in sensitivity_list[pathway]:
-            dl = IntermediateDataImporter(pathway=pathway, sensitivity=sensitivity)
+            dl = IntermediateDataImporter(
+                pathway=pathway, sensitivity=sensitivity, config=config
+            )
             file_path = dl.export_dir.joinpath(
                 "final", "All", "all_chemical_region.csv"
             )
@@ -737,15 +762,20 @@ def merge_outputs(model_scope, chemicals):
     df_region = df_region.stack().unstack([0, -1])
 
     # Drop not needed columns
-    nondrop_list = [x for x in df_region.columns if x[1] == str(END_YEAR)] + [
-        (pathway_list[0], str(START_YEAR))
-    ]
+    nondrop_list = [
+        x for x in df_region.columns if x[1] == str(config.END_YEAR)
+    ] + [(pathway_list[0], str(config.START_YEAR))]
     df_region.drop(df_region.columns.difference(nondrop_list), axis=1, inplace=True)
 
     # Rename column index
     df_region.columns = df_region.columns.to_flat_index()
     df_region = df_region.rename(
-        columns={(pathway_list[0], str(START_YEAR)): ("Baseline", str(START_YEAR))}
+        columns={
+            (pathway_list[0], str(config.START_YEAR)): (
+                "Baseline",
+                str(config.START_YEAR),
+            )
+        }
     )
 
     dl.export_data(
@@ -0,0 +1,127 @@
+import logging
+from pathlib import Path
+
+import pandas as pd
+
+from config import LOG_LEVEL
+
+logger = logging.getLogger(name=__name__)
+logger.setLevel(LOG_LEVEL)
+
+# Outputs made by EXPORT_OUTPUTS, per chemical, category and quantity with a column per year
+YEARLY_OUTPUTS = ["emission_output.csv", "cost_output.csv"]
+
+
+def _get_volume(final_path: Path) -> pd.DataFrame:
+    """Yearly volume per chemical and technology of a run"""
+    df = pd.read_csv(final_path.joinpath("All", "all_plants.csv"))
+    return (
+        df.groupby(["chemical", "technology", "year"])[["yearly_volume"]]
+        .sum()
+        .reset_index()
+    )
+
+
+def _get_outputs(final_path: Path) -> pd.DataFrame:
+    """Emissions and costs of a run, one row per chemical, quantity and year"""
+    dfs = []
+    for filename in YEARLY_OUTPUTS:
+        path = final_path.joinpath("All", filename)
+        if not path.exists():
+            continue
+        df = pd.read_csv(path, index_col=["chemical", "category", "quantity"])
+        dfs.append(df.reset_index().melt(id_vars=df.index.names, var_name="year"))
+
+    if not dfs:
+        return pd.DataFrame()
+    df = pd.concat(dfs)
+    df["year"] = df["year"].astype(int)
+    return df
+
+
+def merge_sweep(
+    sweep_dir: Path, points: dict, runs: list, model_scope: str, export_dir: Path
+) -> dict:
+    """
+    Collect the results of all runs of a parameter sweep in tidy tables
+
+    Every row has the pathway, sensitivity and swept parameter values of its run, so the
+    tables can be filtered and grouped by parameter. Runs without results are skipped.
+
+    Args:
+        sweep_dir: Directory with the output directory of each combination of values
+        points: Parameter values of each combination, by name
+        runs: Pathway and sensitivity of each run
+        model_scope: Scope of the runs
+        export_dir: Directory to export the tables to
+
+    Returns:
+        Tables by name: "volume" and (if outputs were exported) "outputs"
+    """
+    tables = {"volume": [], "outputs": []}
+    for name, point in points.items():
+        for pathway, sensitivity in runs:
+            final_path = sweep_dir.joinpath(
+                name, model_scope, pathway, sensitivity, "final"
+            )
+            try:
+                results = {
+                    "volume": _get_volume(final_path),
+                    "outputs": _get_outputs(final_path),
+                }
+            except FileNotFoundError:
+                logger.warning(
+                    f"No results for {pathway} {sensitivity} with {point}, skipping"
+                )
+                continue
+
+            keys = {"pathway": pathway, "sensitivity": sensitivity, **point}
+            for table, df in results.items():
+                if not df.empty:
+                    tables[table].append(
+                        pd.concat(
+                            [pd.DataFrame(keys, index=df.index), df], axis=1
+                        )
+                    )
+
+    export_dir.mkdir(exist_ok=True, parents=True)
+    merged = {}
+    for table, dfs in tables.items():
+        if dfs:
+            merged[table] = pd.concat(dfs, ignore_index=True)
+            merged[table].to_csv(
+                export_dir.joinpath(f"sweep_{table}.csv"), index=False
+            )
+    return merged
+
+
+def summarize_ensemble(tables: dict, percentiles: list, export_dir: Path) -> dict:
+    """
+    Percentile bands of the results of an ensemble over its seeds
+
+    A technology without volume in a run of the ensemble counts as 0 volume in that
+    run, so that the bands are over all seeds.
+
+    Args:
+        tables: Tables by name, as made by merge_sweep
+        percentiles: Percentiles of the bands, e.g. [5, 50, 95]
+        export_dir: Directory to export the bands to
+
+    Returns:
+        Bands by table name, with a column per percentile (e.g. p5)
+    """
+    values = {"volume": "yearly_volume", "outputs": "value"}
+    bands = {}
+    for table, df in tables.items():
+        value = values[table]
+        keys = [column for column in df.columns if column not in ["RANDOM_SEED", value]]
+        df_seeds = df.set_index(keys + ["RANDOM_SEED"])[value].unstack("RANDOM_SEED")
+        if table == "volume":
+            df_seeds = df_seeds.fillna(0)
+
+        df_bands = df_seeds.quantile([p / 100 for p in percentiles], axis=1).T
+        df_bands.columns = [f"p{p}" for p in percentiles]
+        df_bands["seeds"] = df_seeds.notna().sum(axis=1)
+        bands[table] = df_bands.reset_index()
+        bands[table].to_csv(export_dir.joinpath(f"ensemble_{table}.csv"), index=False)
+    return bands
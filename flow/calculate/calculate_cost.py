@@ -2,9 +2,8 @@ import logging
 
 import pandas as pd
 
-from config import (CARBON_PRICE, CARBON_PRICE_ADJUSTMENT,
-                    CCS_PRICE_ADJUSTMENT, POWER_PRICE_ADJUSTMENT)
 from flow.calculate.pivot_inputs import pivot_inputs
+from models.run_config import RunConfig
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -14,6 +13,7 @@ def calculate_carbon_cost(
     df_ccs_price: pd.DataFrame,
     df_carbon_price: pd.DataFrame,
     df_emissions: pd.DataFrame,
+    config: RunConfig,
 ) -> pd.DataFrame:
     """
     Calculate the total cost of carbon
@@ -21,6 +21,7 @@ def calculate_carbon_cost(
         df_ccs_price: CCS prices
         df_carbon_price: Carbon tax
         df_emissions: Emissions per process
+        config: Config of the run
 
     Returns:
         Carbon cost per process
@@ -30,28 +31,31 @@ def calculate_carbon_cost(
         df_ccs_price, on=["year", "region"]
     )
 
-    if CARBON_PRICE:
+    if config.CARBON_PRICE:
         df_cost["carbon"] = (
-            df_cost["scope_1"] * df_cost["carbon_price"] * CARBON_PRICE_ADJUSTMENT
+            df_cost["scope_1"]
+            * df_cost["carbon_price"]
+            * config.CARBON_PRICE_ADJUSTMENT
         )
     else:
         df_cost["carbon"] = 0.0
 
     df_cost["ccs"] = (
-        df_cost["ccs_capacity"] * df_cost["ccs_price"] * CCS_PRICE_ADJUSTMENT
+        df_cost["ccs_capacity"] * df_cost["ccs_price"] * config.CCS_PRICE_ADJUSTMENT
     )
 
     return df_cost[["carbon", "ccs"]]
 
 
 def calculate_input_cost(
-    df_inputs: pd.DataFrame, df_input_prices: pd.DataFrame
+    df_inputs: pd.DataFrame, df_input_prices: pd.DataFrame, config: RunConfig
 ) -> pd.DataFrame:
     """
     Calculate cost of inputs
     Args:
         df_inputs: inputs per process
         df_input_prices: price of inputs
+        config: Config of the run
 
     Returns:
         cost of inputs per process
@@ -61,7 +65,9 @@ def calculate_input_cost(
     df = df_inputs.merge(df_input_prices, on=["name", "year", "region"])
     df["cost"] = df["input_price"] * df["input"]
 
-    df.loc[df.name.str.contains("Electricity"), "cost"] *= POWER_PRICE_ADJUSTMENT
+    df.loc[
+        df.name.str.contains("Electricity"), "cost"
+    ] *= config.POWER_PRICE_ADJUSTMENT
     df = pivot_inputs(df=df, values="cost")
 
     return df
@@ -74,6 +80,7 @@ def calculate_cost(
     df_carbon_price: pd.DataFrame,
     df_input_price: pd.DataFrame,
     df_economics: pd.DataFrame,
+    config: RunConfig,
 ) -> pd.DataFrame:
     """
 
@@ -84,6 +91,7 @@ def calculate_cost(
         df_carbon_price: price of CCS over time/region
         df_input_price: price of inputs over time/region
         df_economics: process economics
+        config: Config of the run
 
     Returns:
         Cost data per process/region/year
@@ -92,8 +100,11 @@ def calculate_cost(
         df_ccs_price=df_ccs_price,
         df_carbon_price=df_carbon_price,
         df_emissions=df_emissions,
+        config=config,
+    )
+    df_cost = calculate_input_cost(
+        df_inputs=df_inputs, df_input_prices=df_input_price, config=config
     )
-    df_cost = calculate_input_cost(df_inputs=df_inputs, df_input_prices=df_input_price)
 
     df_cost["other", "ccs"] = df_carbon_cost["ccs"]
     df_cost["other", "carbon"] = df_carbon_cost["carbon"]
@@ -330,7 +330,7 @@ def calculate_lcox_start_year(df_all_plants: pd.DataFrame, df_process: pd.DataFr
     return df_all_plants.merge(df_lcox, on=["technology", "region", "start_year"])
 
 
-def calculate_outputs(pathway, sensitivity, chemicals, model_scope):
+def calculate_outputs(pathway, sensitivity, chemicals, model_scope, config=None):
     """
     Calculate derived outputs from the model run
     """
@@ -339,6 +339,7 @@ def calculate_outputs(pathway, sensitivity, chemicals, model_scope):
         sensitivity=sensitivity,
         chemicals=chemicals,
         model_scope=model_scope,
+        config=config,
     )
 
     df_ethylene_fossil = _calculate_ethylene_fossil_share(importer)
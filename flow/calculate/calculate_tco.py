@@ -2,8 +2,8 @@ import logging
 
 import pandas as pd
 
-from config import DISCOUNT_RATE, ECONOMIC_LIFETIME_YEARS, END_YEAR, START_YEAR
 from flow.calculate.npv import net_present_value
+from models.run_config import RunConfig
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -26,14 +26,16 @@ def subset_cost_df(df_cost: pd.DataFrame, start_year: int, plant_lifetime: int):
     ]
 
 
-def calculate_npv_costs(df_cost: pd.DataFrame, year) -> pd.DataFrame:
+def calculate_npv_costs(
+    df_cost: pd.DataFrame, year, config: RunConfig
+) -> pd.DataFrame:
     """
     Calculate the Net Present Value (NPV) of costs
 
     Args:
         year: Current year or none
         df_cost: Process costs
-        cols: Columns to discount
+        config: Config of the run
 
     Returns:
         Discounted
@@ -44,14 +46,14 @@ def calculate_npv_costs(df_cost: pd.DataFrame, year) -> pd.DataFrame:
     )
     if year is None:
         df_cost = df_cost[
-            (df_cost.index >= START_YEAR) & (df_cost.index <= END_YEAR)
+            (df_cost.index >= config.START_YEAR) & (df_cost.index <= config.END_YEAR)
         ].apply(
             lambda row: net_present_value(
-                rate=DISCOUNT_RATE,
+                rate=config.DISCOUNT_RATE,
                 df=subset_cost_df(
                     df_cost=df_cost,
                     start_year=row.name,
-                    plant_lifetime=ECONOMIC_LIFETIME_YEARS,
+                    plant_lifetime=config.ECONOMIC_LIFETIME_YEARS,
                 ),
             ),
             axis=1,
@@ -62,9 +64,9 @@ def calculate_npv_costs(df_cost: pd.DataFrame, year) -> pd.DataFrame:
                 subset_cost_df(
                     df_cost=df_cost,
                     start_year=year,
-                    plant_lifetime=ECONOMIC_LIFETIME_YEARS,
+                    plant_lifetime=config.ECONOMIC_LIFETIME_YEARS,
                 ),
-                DISCOUNT_RATE,
+                config.DISCOUNT_RATE,
             )
         ).T
         df_cost["year"] = year
@@ -72,12 +74,13 @@ def calculate_npv_costs(df_cost: pd.DataFrame, year) -> pd.DataFrame:
     return df_cost
 
 
-def discount_costs(df_cost: pd.DataFrame, year) -> pd.DataFrame:
+def discount_costs(df_cost: pd.DataFrame, year, config: RunConfig) -> pd.DataFrame:
     """
     Discount costs with a fixed discounting rate
 
     Args:
         df_cost: Process costs
+        config: Config of the run
 
     Returns:
         Discounted costs
@@ -102,7 +105,7 @@ def discount_costs(df_cost: pd.DataFrame, year) -> pd.DataFrame:
 
     # Discount all costs over time
     df_discount = df.groupby(["chemical", "origin", "technology", "region"]).apply(
-        calculate_npv_costs, year
+        calculate_npv_costs, year, config
     )
 
     # Calculate var opex and total energy cost
@@ -121,7 +124,7 @@ def discount_costs(df_cost: pd.DataFrame, year) -> pd.DataFrame:
 
 
 def calculate_tco(
-    df_cost: pd.DataFrame, df_spec: pd.DataFrame, year=None
+    df_cost: pd.DataFrame, df_spec: pd.DataFrame, config: RunConfig, year=None
 ) -> pd.DataFrame:
     """
     Calculate TCO (total cost of ownership) per technology
@@ -129,6 +132,7 @@ def calculate_tco(
     Args:
         df_cost: Costs per technology
         df_spec: Specifications per technology
+        config: Config of the run
 
     Returns:
         TCO and LCOX per technology
@@ -136,11 +140,11 @@ def calculate_tco(
 
     df_cost = df_cost.join(pd.concat({"spec": df_spec}, axis=1))
 
-    df_discount = discount_costs(df_cost, year)
+    df_discount = discount_costs(df_cost, year, config)
 
     # Join the data, keep only until 2050 as that is what we need
     df = df_cost.join(pd.concat({"discounted": df_discount}, axis=1)).query(
-        f"year <= {END_YEAR}"
+        f"year <= {config.END_YEAR}"
     )
 
     cols = [("discounted", col) for col in df["discounted"].columns] + [
@@ -69,9 +69,10 @@ def calculate_variables(**kwargs):
         df_carbon_price=df_carbon_price,
         df_input_price=df_input_price,
         df_economics=df_economics,
+        config=importer.config,
     )
 
     # Calculate TCO per process and year
-    df_tco = calculate_tco(df_cost=df_cost, df_spec=df_spec)
+    df_tco = calculate_tco(df_cost=df_cost, df_spec=df_spec, config=importer.config)
 
     importer.export_data(df=df_tco, filename="cost.csv", export_dir="intermediate")
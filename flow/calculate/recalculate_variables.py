@@ -9,6 +9,7 @@ from flow.calculate.calculate_cost import calculate_cost
 from flow.calculate.calculate_emissions import calculate_emissions_aggregate
 from flow.calculate.calculate_tco import calculate_tco
 from flow.import_data.intermediate_data import IntermediateDataImporter
+from models.run_config import RunConfig
 
 logger = logging.getLogger(__name__)
 logger.setLevel("INFO")
@@ -75,11 +76,13 @@ def recalculate_costs(
     df_input_price: pd.DataFrame,
     df_economics: pd.DataFrame,
     dict_lcox: dict,
+    config: RunConfig,
 ):
     dict_lcox = {
         key: value for (key, value) in dict_lcox.items() if not math.isnan(value)
     }
-    # Calculate input costs
+    # Calculate input costs, on a copy as the prices can be shared by other runs
+    df_input_price = df_input_price.copy()
     for methanol_type, value_ in dict_lcox.items():
         df_input_price.loc[
             (df_input_price.name == methanol_type), "input_price"
@@ -92,6 +95,7 @@ def recalculate_costs(
         df_carbon_price=df_carbon_price,
         df_input_price=df_input_price,
         df_economics=df_economics,
+        config=config,
     )
 
 
@@ -139,8 +143,11 @@ def recalculate_variables(
         df_input_price=df_input_price,
         df_economics=df_economics,
         dict_lcox=dict_lcox,
+        config=importer.config,
     )
 
-    df_tco = calculate_tco(df_cost=df_cost, df_spec=df_spec, year=year)
+    df_tco = calculate_tco(
+        df_cost=df_cost, df_spec=df_spec, config=importer.config, year=year
+    )
 
     return df_emissions, df_tco
@@ -3,6 +3,7 @@ from pathlib import Path
 import pandas as pd
 
 from config import CHEMICALS, MODEL_SCOPE
+from models.run_config import RunConfig
 
 RENAME_COLS = {
     "Scope": "scope",
@@ -61,6 +62,7 @@ class BaseImporter:
         model_scope=MODEL_SCOPE,
         chemicals=CHEMICALS,
         rename_cols=RENAME_COLS,
+        config: RunConfig = None,
     ):
         parent_path = Path(__file__).resolve().parents[2]
         if model_scope=="Japan":
@@ -74,10 +76,11 @@ class BaseImporter:
         self.pathway = pathway
         self.sensitivity = sensitivity
         self.chemicals = chemicals
+        self.config = config or RunConfig()
         self.export_dir = parent_path.joinpath(
-            "output", model_scope, pathway, sensitivity
+            self.config.OUTPUT_DIR, model_scope, pathway, sensitivity
         )
-        self.aggregate_export_dir = parent_path.joinpath("output/")
+        self.aggregate_export_dir = parent_path.joinpath(self.config.OUTPUT_DIR)
         self.rename_cols = rename_cols
 
     def _get_excel(
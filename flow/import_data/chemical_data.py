@@ -2,7 +2,6 @@ from functools import partial
 
 import pandas as pd
 
-from config import ECONOMIC_LIFETIME_YEARS, PLANT_SPEC_OVERRIDE
 from flow.import_data.generic_data import GenericDataImporter
 from flow.import_data.util import convert_df_to_regional
 
@@ -307,7 +306,7 @@ class ChemicalDataImporter(GenericDataImporter):
 
         df_pivot["plant_lifetime"] = df_pivot["plant_lifetime"].fillna(30)
 
-        for prop, value in PLANT_SPEC_OVERRIDE.items():
+        for prop, value in self.config.PLANT_SPEC_OVERRIDE.items():
             df_pivot[prop] = value
 
         # Convert plant capacity from t/day to Mton/year
@@ -323,10 +322,13 @@ class ChemicalDataImporter(GenericDataImporter):
             df_pivot=df_pivot,
             chemical=chemical,
             df_multi_product_ratio=super()._import_multi_product_ratios(),
+            economic_lifetime_years=self.config.ECONOMIC_LIFETIME_YEARS,
         )
 
 
-def _calculate_yearly_volume(df_pivot, chemical, df_multi_product_ratio):
+def _calculate_yearly_volume(
+    df_pivot, chemical, df_multi_product_ratio, economic_lifetime_years
+):
     """Calculate yearly volume based on plant capacity and multi product ratios"""
 
     df_pivot = convert_df_to_regional(df_pivot)
@@ -353,7 +355,7 @@ def _calculate_yearly_volume(df_pivot, chemical, df_multi_product_ratio):
 
     # Total volume to use in TCO calculations
     df_pivot["total_volume_economic"] = (
-        df_pivot["total_yearly_volume"] * ECONOMIC_LIFETIME_YEARS
+        df_pivot["total_yearly_volume"] * economic_lifetime_years
     )
 
     if "primary_chemical" not in df_pivot.columns:
@@ -1,10 +1,135 @@
+import hashlib
+from pathlib import Path
+
+import numpy as np
 import pandas as pd
 from pandas.errors import ParserError
 
-from config import MODEL_SCOPE
 from flow.import_data.base import BaseImporter
 from util.util import make_multi_df
 
+# Intermediate files that are the same for many runs, and that the model only reads
+SHARED_FILES = [
+    "technologies.csv",
+    "technology_transitions.csv",
+    "multi_product_ratio.csv",
+    "plant_specs.csv",
+    "emissions_factors.csv",
+    "input_prices.csv",
+    "input_conversion.csv",
+    "decommission_rates.csv",
+    "inputs_pivot.csv",
+    "emissions.csv",
+    "cost.csv",
+]
+
+# Shared files read by load_shared_data, by file contents and read arguments
+_shared_data = {}
+_loading_shared_data = False
+
+# Fingerprints of the shared files when load_shared_data read them, by path
+_shared_files = {}
+
+
+def _file_digest(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _file_stat(path) -> tuple:
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _get_fingerprint(path):
+    """
+    Fingerprint of the file's contents: hashed once when load_shared_data reads it,
+    and after that the same as long as the file was not written to since
+    """
+    path = Path(path).resolve()
+    stat = _file_stat(path)
+    if path in _shared_files and _shared_files[path][0] == stat:
+        return _shared_files[path][1]
+    if not _loading_shared_data:
+        return None
+    digest = _file_digest(path)
+    _shared_files[path] = (stat, digest)
+    return digest
+
+
+def _make_read_only(df: pd.DataFrame):
+    """Make the arrays that hold the values of the dataframe read-only"""
+    for values in df._mgr.arrays:
+        if isinstance(values, np.ndarray):
+            values.flags.writeable = False
+
+
+def _read_csv(path, **kwargs) -> pd.DataFrame:
+    """
+    Read a csv file, or get it from the shared data if load_shared_data read it and
+    it did not change since. All runs in the process (and all forked worker
+    processes) use the values of a shared dataframe, so they are read-only: only a
+    shallow copy is returned, to which columns can be added or replaced.
+    """
+    if path.name not in SHARED_FILES or not (_shared_data or _loading_shared_data):
+        return pd.read_csv(path, **kwargs)
+
+    fingerprint = _get_fingerprint(path)
+    if fingerprint is None:
+        return pd.read_csv(path, **kwargs)
+
+    key = (fingerprint, repr(sorted(kwargs.items())))
+    if key not in _shared_data:
+        df = pd.read_csv(path, **kwargs)
+        if not _loading_shared_data:
+            return df
+        _make_read_only(df)
+        _shared_data[key] = df
+    return _shared_data[key].copy(deep=False)
+
+
+def load_shared_data(runs: list, **kwargs):
+    """
+    Read the shared files of all runs once, before forking the worker processes
+
+    Workers inherit the dataframes (copy-on-write), and use them from there instead
+    of reading the file again when it was not written to since. Their values are
+    read-only, so that they are not copied for each worker. Each file is hashed
+    here only, so runs with the same data (e.g. different pathways of one sensitivity)
+    share one copy.
+
+    Args:
+        runs: Pathway and sensitivity of each run
+        kwargs: Other arguments of the importer
+    """
+    global _loading_shared_data
+    _loading_shared_data = True
+    try:
+        for pathway, sensitivity in runs:
+            importer = IntermediateDataImporter(
+                pathway=pathway, sensitivity=sensitivity, **kwargs
+            )
+            for get_data in [
+                importer.get_tech,
+                importer.get_tech_transitions,
+                importer.get_multi_product_ratio,
+                importer.get_plant_specs,
+                importer.get_emissions_factors,
+                importer.get_input_price,
+                importer.get_input_conversion,
+                importer.get_decommission_rates,
+                importer.get_all_process_data,
+            ]:
+                try:
+                    get_data()
+                except FileNotFoundError:
+                    pass
+    finally:
+        _loading_shared_data = False
+
 
 class IntermediateDataImporter(BaseImporter):
     """Imports data that is output by the model at some point in time"""
@@ -28,7 +153,7 @@ class IntermediateDataImporter(BaseImporter):
         return pd.read_csv(self.intermediate_path.joinpath("availabilities.csv"))
 
     def get_decommission_rates(self):
-        return pd.read_csv(self.intermediate_path.joinpath("decommission_rates.csv"))
+        return _read_csv(self.intermediate_path.joinpath("decommission_rates.csv"))
 
     def get_emissions_shares(self):
         return pd.read_csv(self.intermediate_path.joinpath("emissions_share.csv"))
@@ -37,10 +162,10 @@ class IntermediateDataImporter(BaseImporter):
         return pd.read_csv(self.intermediate_path.joinpath("inputs.csv"))
 
     def get_input_conversion(self):
-        return pd.read_csv(self.intermediate_path.joinpath("input_conversion.csv"))
+        return _read_csv(self.intermediate_path.joinpath("input_conversion.csv"))
 
     def get_plant_specs(self):
-        return pd.read_csv(
+        return _read_csv(
             self.intermediate_path.joinpath("plant_specs.csv"),
             index_col=["technology", "year", "region", "chemical"],
         )
@@ -52,11 +177,11 @@ class IntermediateDataImporter(BaseImporter):
         ]
 
     def get_emissions_factors(self):
-        return pd.read_csv(self.intermediate_path.joinpath("emissions_factors.csv"))
+        return _read_csv(self.intermediate_path.joinpath("emissions_factors.csv"))
 
     def get_demand(self):
         return pd.read_csv(self.intermediate_path.joinpath("demand.csv")).query(
-            f"region =='{MODEL_SCOPE}'"
+            f"region =='{self.config.MODEL_SCOPE}'"
         )
 
     def get_ccs_rate(self):
@@ -69,7 +194,7 @@ class IntermediateDataImporter(BaseImporter):
         )
 
     def get_input_price(self):
-        return pd.read_csv(self.intermediate_path.joinpath("input_prices.csv"))
+        return _read_csv(self.intermediate_path.joinpath("input_prices.csv"))
 
     def get_carbon_price(self):
         return pd.read_csv(
@@ -77,7 +202,7 @@ class IntermediateDataImporter(BaseImporter):
         )
 
     def get_multi_product_ratio(self):
-        return pd.read_csv(self.intermediate_path.joinpath("multi_product_ratio.csv"))
+        return _read_csv(self.intermediate_path.joinpath("multi_product_ratio.csv"))
 
     def get_current_production(self, japan_only=False):
         df = pd.read_csv(self.intermediate_path.joinpath("current_production.csv"))
@@ -100,12 +225,12 @@ class IntermediateDataImporter(BaseImporter):
         )
 
     def get_tech_transitions(self):
-        return pd.read_csv(
+        return _read_csv(
             self.intermediate_path.joinpath("technology_transitions.csv")
         )
 
     def get_tech(self):
-        return pd.read_csv(self.intermediate_path.joinpath("technologies.csv"))
+        return _read_csv(self.intermediate_path.joinpath("technologies.csv"))
 
     def get_process_data(self, data_type):
         """Get data outputted by the model on process level: cost/inputs/emissions"""
@@ -117,7 +242,7 @@ class IntermediateDataImporter(BaseImporter):
         # Costs
         index_cols = [0, 1, 2, 3, 4] if data_type == "cost" else [0, 1, 2, 3]
 
-        return pd.read_csv(file_path, header=header, index_col=index_cols)
+        return _read_csv(file_path, header=header, index_col=index_cols)
 
     def get_all_process_data(self, chemical=None):
         """Get combined data outputted by the model on process level"""
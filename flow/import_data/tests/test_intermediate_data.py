@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from flow.import_data import intermediate_data
+
+
+@pytest.fixture
+def shared_file(tmp_path, monkeypatch):
+    """A shared file, read as load_shared_data does"""
+    monkeypatch.setattr(intermediate_data, "_shared_data", {})
+    monkeypatch.setattr(intermediate_data, "_shared_files", {})
+
+    path = tmp_path.joinpath("technologies.csv")
+    pd.DataFrame(
+        {"technology": ["PDH", "Bio propylene"], "available_from": [2020, 2023]}
+    ).to_csv(path, index=False)
+
+    monkeypatch.setattr(intermediate_data, "_loading_shared_data", True)
+    intermediate_data._read_csv(path)
+    monkeypatch.setattr(intermediate_data, "_loading_shared_data", False)
+    return path
+
+
+def test_read_shared_csv(shared_file):
+    df_run_1 = intermediate_data._read_csv(shared_file)
+    df_run_2 = intermediate_data._read_csv(shared_file)
+
+    # The runs use the same values instead of copies of them
+    values = df_run_1.available_from.values
+    assert np.shares_memory(values, df_run_2.available_from.values)
+    assert not values.flags.writeable
+    with pytest.raises(ValueError):
+        df_run_1.loc[0, "available_from"] = 2025
+
+    # Columns can be added or replaced for one run only
+    df_run_1["available_from"] = 2025
+    df_run_1["empty"] = ""
+    assert df_run_2.available_from.tolist() == [2020, 2023]
+    assert "empty" not in df_run_2
+
+
+def test_read_changed_shared_csv(shared_file):
+    pd.DataFrame({"technology": ["PDH"], "available_from": [2021]}).to_csv(
+        shared_file, index=False
+    )
+
+    df = intermediate_data._read_csv(shared_file)
+    assert df.available_from.tolist() == [2021]
+    assert df.available_from.values.flags.writeable
@@ -0,0 +1,124 @@
+import logging
+
+from config import LOG_LEVEL
+from flow.optimize.optimize import get_checkpoint_path, optimize, save_pathway
+from models.decarbonization import DecarbonizationPathway
+from models.run_config import RunConfig
+from models.run_scheduler import RunScheduler
+from util.util import timing
+
+logger = logging.getLogger(__name__)
+logger.setLevel(LOG_LEVEL)
+
+# Pathway loaded from a checkpoint, that the branches continue from. Branches run in
+# forked worker processes, which share its memory until they change it.
+_prefix = {}
+
+
+def _load_prefix(pathway, sensitivity, chemicals, model_scope, year, config):
+    """Make a pathway and load the checkpoint of a year, once per process"""
+    key = (pathway, sensitivity, tuple(chemicals), model_scope, year, repr(config))
+    if key not in _prefix:
+        _prefix.clear()
+        decarbonization_pathway = DecarbonizationPathway(
+            pathway_name=pathway,
+            chemicals=chemicals,
+            start_year=config.START_YEAR,
+            end_year=config.END_YEAR,
+            sensitivity=sensitivity,
+            model_scope=model_scope,
+            config=config,
+        )
+        checkpoint_dir = decarbonization_pathway.importer.export_dir.joinpath(
+            "checkpoints"
+        )
+        decarbonization_pathway.load_checkpoint(
+            path=get_checkpoint_path(checkpoint_dir, year)
+        )
+        _prefix[key] = decarbonization_pathway
+    return _prefix[key]
+
+
+def run_branch(
+    name, overrides, pathway, sensitivity, chemicals, model_scope, year, config
+):
+    """
+    Continue a pathway from the checkpoint of a year with other config constants
+
+    The outputs of the branch are exported to branches/<name> in the output directory
+    of the run, in the same layout as the outputs of the pathway.
+
+    Args:
+        name: Name of the branch
+        overrides: Config constants to change, by name
+        year: The branch continues from the end of this year
+        config: Config of the run the checkpoint was saved by
+    """
+    branch = _load_prefix(pathway, sensitivity, chemicals, model_scope, year, config)
+    # The branch changes the pathway, so another branch in this process loads it again
+    _prefix.clear()
+    branch.config = branch.importer.config = config.replace(**overrides)
+    importer = branch.importer
+    importer.export_dir = importer.export_dir.joinpath("branches", name)
+
+    logger.info(f"Running branch {name} from {year} with {overrides}")
+    branch = optimize(pathway=branch, first_year=year + 1)
+    save_pathway(branch)
+
+
+@timing
+def branch_pathway(
+    pathway,
+    sensitivity,
+    chemicals,
+    model_scope,
+    config: RunConfig = None,
+    branches=None,
+    year=None,
+    fixed_constants=(),
+):
+    """
+    Run what-if branches of a pathway from the checkpoint of a year
+
+    The checkpoint is loaded once, and every branch runs in a forked worker process that
+    continues from it, so the years before the branches are only simulated once (when
+    the pathway was optimized with SAVE_CHECKPOINTS). Config changes should only affect
+    the years after the checkpoint, e.g. NO_FOSSIL_FROM_YEAR after `year`.
+
+    Args:
+        config: Config of the run, defaults to config.py
+        branches: Config overrides per branch name, defaults to BRANCHES
+        year: Year of the checkpoint, defaults to BRANCH_FROM_YEAR
+        fixed_constants: Config constants that the data the pathway is made from
+            depends on (e.g. the rankings), which branches can't change
+
+    Returns:
+        Summary of the branch runs
+    """
+    config = config or RunConfig()
+    branches = config.BRANCHES if branches is None else branches
+    year = config.BRANCH_FROM_YEAR if year is None else year
+
+    fixed = {
+        name: sorted(set(overrides) & set(fixed_constants))
+        for name, overrides in branches.items()
+        if set(overrides) & set(fixed_constants)
+    }
+    if fixed:
+        raise ValueError(
+            f"Branches can't change config constants of the sections before the "
+            f"pathway optimization, run the model again instead: {fixed}"
+        )
+
+    _load_prefix(pathway, sensitivity, chemicals, model_scope, year, config)
+    summary = RunScheduler(func=run_branch, max_workers=config.MAX_WORKERS).run(
+        [
+            (name, overrides, pathway, sensitivity, chemicals, model_scope, year, config)
+            for name, overrides in branches.items()
+        ]
+    )
+
+    failed = [result["run"][0] for result in summary if result["status"] == "failed"]
+    if failed:
+        raise RuntimeError(f"Branches {failed} failed")
+    return summary
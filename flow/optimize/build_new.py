@@ -1,14 +1,20 @@
 import logging
 
-from config import INITIAL_TECH_ALLOWED_UNTIL_YEAR, NO_FOSSIL_FROM_YEAR, MODEL_SCOPE
-from flow.optimize.constraints import (apply_constraints, apply_regional_cap,
+import numpy as np
+
+from flow.optimize.constraints import (MARGIN, apply_constraints,
+                                       apply_regional_cap,
                                        apply_tech_ramp_rate,
                                        filter_available_tech,
-                                       remove_initial_tech)
+                                       filter_still_valid, frees_resources,
+                                       get_ramp_rate_steps,
+                                       get_regional_cap_steps,
+                                       get_resource_steps, remove_initial_tech)
 from flow.optimize.util import filter_out_fossil, keep_only_initial_tech
 from flow.rank.util import select_best_transition
 from models.decarbonization import DecarbonizationPathway
-from models.plant import make_new_plant
+from models.plant import (NO_CAPACITIES, RESOURCE_ATTRIBUTES, PlantSpecTable,
+                          make_new_plant)
 
 logger = logging.getLogger(__name__)
 logger.setLevel("INFO")
@@ -28,25 +34,31 @@ def build_new(pathway: DecarbonizationPathway, year: int, chemical: str):
     df_rank = pathway.get_ranking(year=year, chemical=chemical, rank_type="new_build")
 
     # Get the tech available now
-    df_tech = pathway.tech
+    eligibility = pathway.eligibility
+    config = pathway.config
 
-    if pathway.pathway_name != "bau" and year > INITIAL_TECH_ALLOWED_UNTIL_YEAR:
-        df_rank = remove_initial_tech(df_rank=df_rank, df_tech=df_tech)
+    if pathway.pathway_name != "bau" and year > config.INITIAL_TECH_ALLOWED_UNTIL_YEAR:
+        df_rank = remove_initial_tech(df_rank=df_rank, eligibility=eligibility)
 
     df_rank = filter_available_tech(
-        df_tech=df_tech, df_rank=df_rank, year=year, chemical=chemical
+        eligibility=eligibility, df_rank=df_rank, year=year, chemical=chemical
     )
 
     # Strictly no fossil: only allow initial until 2025, then only non-fossil tech
     if pathway.pathway_name == "nfs":
         if year >= 2025:
-            df_rank = filter_out_fossil(df_rank=df_rank, df_tech=df_tech)
+            df_rank = filter_out_fossil(df_rank=df_rank, eligibility=eligibility)
         else:
-            df_rank = keep_only_initial_tech(df_rank=df_rank, df_tech=df_tech)
+            df_rank = keep_only_initial_tech(df_rank=df_rank, eligibility=eligibility)
 
     # No new fossil after cutoff year
-    elif pathway.pathway_name == "nf" and year >= NO_FOSSIL_FROM_YEAR:
-        df_rank = filter_out_fossil(df_rank=df_rank, df_tech=df_tech)
+    elif pathway.pathway_name == "nf" and year >= config.NO_FOSSIL_FROM_YEAR:
+        df_rank = filter_out_fossil(df_rank=df_rank, eligibility=eligibility)
+
+    # Only keep tech that this chemical is the primary chemical of
+    df_rank = pathway.filter_tech_primary_chemical(
+        df_tech=df_rank, chemical=chemical, col="destination"
+    )
 
     # Get the old/new year's stack
     old_stack = pathway.get_stack(year=year)
@@ -54,6 +66,7 @@ def build_new(pathway: DecarbonizationPathway, year: int, chemical: str):
 
     # Get process data
     df_process_data = pathway.get_all_process_data(chemical=chemical, year=year)
+    spec_table = PlantSpecTable(df_process_data)
 
     # Determine volume gap
     yearly_volume = new_stack.get_yearly_volume(chemical=chemical)
@@ -72,34 +85,53 @@ def build_new(pathway: DecarbonizationPathway, year: int, chemical: str):
             filter_naphtha_na=True,
         )
 
-        if MODEL_SCOPE == "World":
-            df_valid = apply_regional_cap(stack=new_stack, df_rank=df_valid)
+        valid_regions = None
+        if config.MODEL_SCOPE == "World":
+            df_valid = apply_regional_cap(
+                stack=new_stack, df_rank=df_valid, regional_cap=config.REGIONAL_CAP
+            )
+            valid_regions = set(
+                new_stack.get_regions_below_cap(
+                    regional_cap=config.REGIONAL_CAP
+                ).region
+            )
 
         df_valid = apply_tech_ramp_rate(
             old_stack=old_stack,
             new_stack=new_stack,
             df_rank=df_valid,
             chemical=chemical,
-        )
-
-        # Only keep tech that this chemical is the primary chemical of
-        df_valid = pathway.filter_tech_primary_chemical(
-            df_tech=df_valid, chemical=chemical, col="destination"
+            config=config,
         )
 
         if df_valid.empty:
             logger.info("No more new builds available for %s", year)
             break
 
+        df_best = df_valid[df_valid["rank"] == df_valid["rank"].min()]
+        if config.BUILD_NEW_IN_BULK and not frees_resources(df_rank=df_best):
+            gap = build_new_in_bulk(
+                pathway=pathway,
+                transitions=df_best.to_dict(orient="records"),
+                spec_table=spec_table,
+                old_stack=old_stack,
+                new_stack=new_stack,
+                chemical=chemical,
+                year=year,
+                gap=gap,
+                valid_regions=valid_regions,
+            )
+            continue
+
         best_transition = select_best_transition(df_rank=df_valid)
 
         new_plant = make_new_plant(
             best_transition=best_transition,
-            df_process_data=df_process_data,
+            spec_table=spec_table,
             year=year,
             retrofit=False,
             chemical=chemical,
-            df_plant_capacities=pathway.df_plant_capacities,
+            plant_capacities=pathway.plant_capacities,
         )
 
         new_stack.append(new_plant)
@@ -110,3 +142,166 @@ def build_new(pathway: DecarbonizationPathway, year: int, chemical: str):
         pathway = pathway.update_availability(plant=new_plant, year=year)
 
     return pathway.update_stack(year=year + 1, stack=new_stack)
+
+
+def build_new_in_bulk(
+    pathway: DecarbonizationPathway,
+    transitions: list,
+    spec_table,
+    old_stack,
+    new_stack,
+    chemical: str,
+    year: int,
+    gap: float,
+    valid_regions=None,
+):
+    """
+    Build new plants from the transitions that share the best rank, without re-ranking
+
+    Like building one plant at a time, every plant is one of the best transitions at
+    random. Adding plants can only make other transitions invalid, so only the best
+    transitions are checked again, until none of them is valid, another region falls
+    below the regional cap or the gap is closed. Plants are built in batches: a batch
+    is as many plants as can be built before any of the constraints could change which
+    transitions are valid, so they are added to the stack in one step with the same
+    outcomes as one at a time.
+
+    Args:
+        transitions: The valid transitions with the best rank
+        gap: Volume to build
+        valid_regions: Regions below the regional cap, None if it does not apply
+
+    Returns:
+        The remaining gap
+    """
+    while transitions and gap > 0:
+        n_plants = _get_batch_size(
+            pathway=pathway,
+            transitions=transitions,
+            spec_table=spec_table,
+            old_stack=old_stack,
+            new_stack=new_stack,
+            chemical=chemical,
+            year=year,
+            gap=gap,
+            valid_regions=valid_regions,
+        )
+        new_plants = [
+            make_new_plant(
+                best_transition=transitions[i],
+                spec_table=spec_table,
+                year=year,
+                retrofit=False,
+                chemical=chemical,
+                plant_capacities=pathway.plant_capacities,
+            )
+            for i in np.random.randint(len(transitions), size=n_plants)
+        ]
+
+        new_stack.extend(new_plants)
+        for new_plant in new_plants:
+            pathway.transitions.add(
+                transition_type="new_build", year=year, destination=new_plant
+            )
+            gap -= new_plant.get_yearly_volume(chemical=chemical)
+            pathway.update_availability(plant=new_plant, year=year)
+
+        transitions = filter_still_valid(
+            transitions=transitions,
+            pathway=pathway,
+            old_stack=old_stack,
+            new_stack=new_stack,
+            chemical=chemical,
+            year=year,
+            valid_regions=valid_regions,
+        )
+
+    return gap
+
+
+def _get_batch_size(
+    pathway,
+    transitions,
+    spec_table,
+    old_stack,
+    new_stack,
+    chemical,
+    year,
+    gap,
+    valid_regions,
+) -> int:
+    """
+    Number of plants to build before any of the transitions could become invalid, for
+    any picks among them: the gap stays open, and each resource cap, tech ramp up rate
+    and regional share can't change even if all plants are of the transition that
+    changes it most
+    """
+    specs = [
+        spec_table.get(
+            technology=transition["destination"],
+            year=transition["year"],
+            region=transition["region"],
+        )
+        for transition in transitions
+    ]
+    capacities = [
+        pathway.plant_capacities.get(
+            (transition["destination"], transition["region"]), NO_CAPACITIES
+        )
+        for transition in transitions
+    ]
+
+    # Gap, less a margin for the rounding of subtracting one plant at a time
+    volume = max(
+        plant_capacities.get(chemical, 0) * spec["capacity_factor"]
+        for plant_capacities, spec in zip(capacities, specs)
+    )
+    if not volume > 0:
+        return 1
+    n_plants = max(1, int(np.ceil((gap * (1 - MARGIN) - MARGIN) / volume)))
+
+    # Resource caps
+    regions = [transition["region"] for transition in transitions]
+    use = np.array(
+        [[spec[attribute] for attribute in RESOURCE_ATTRIBUTES] for spec in specs]
+    )
+    decrease = pathway.availability.get_change_bound(regions=regions, use=use)
+    n_plants = get_resource_steps(
+        transitions=transitions,
+        pathway=pathway,
+        chemical=chemical,
+        year=year,
+        decrease=decrease,
+        increase=np.zeros_like(decrease),
+        limit=n_plants,
+    )
+
+    # Regional cap
+    if valid_regions is not None:
+        n_plants = get_regional_cap_steps(
+            stack=new_stack,
+            transitions=transitions,
+            capacities=[
+                plant_capacities.get(chemical, 0) for plant_capacities in capacities
+            ],
+            regional_cap=pathway.config.REGIONAL_CAP,
+            limit=n_plants,
+        )
+
+    # Tech ramp up rate
+    increase = {}
+    for transition, plant_capacities in zip(transitions, capacities):
+        changes = increase.setdefault(transition["destination"], (0, 0))
+        increase[transition["destination"]] = (
+            max(changes[0], sum(plant_capacities.values())),
+            max(changes[1], len(plant_capacities)),
+        )
+    return get_ramp_rate_steps(
+        old_stack=old_stack,
+        new_stack=new_stack,
+        technologies=list(increase),
+        increase=increase,
+        decrease={},
+        limit=n_plants,
+        config=pathway.config,
+    )
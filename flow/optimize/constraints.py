@@ -1,66 +1,83 @@
 import logging
 
+import numpy as np
 import pandas as pd
 
-from config import (MAX_PLANTS_RAMP_UP, MAX_TECH_RAMP_RATE, METHANOL_TYPES,
-                    REGIONAL_CAP)
 from models.decarbonization import DecarbonizationPathway
-from models.plant import PlantStack
+from models.plant import REGION_CODES, TECHNOLOGY_CODES, PlantStack
+from models.resource_constraints import RESOURCE_USE, ResourceConstraints
+from models.run_config import RunConfig
+from models.tech_eligibility import TechEligibility
 
 logger = logging.getLogger(__name__)
 logger.setLevel("INFO")
 
+# Margin for rounding, when bounding how far the constraints can move in a number of
+# steps
+MARGIN = 1e-9
 
-def apply_regional_cap(stack: PlantStack, df_rank: pd.DataFrame):
+
+def apply_regional_cap(stack: PlantStack, df_rank: pd.DataFrame, regional_cap: float):
     """Filter regions where we reach the regional cap"""
-    df_regions = stack.get_regional_contribution()
-    df_valid_regions = df_regions.loc[df_regions["proportion"] < REGIONAL_CAP, "region"]
-    return df_rank.merge(df_valid_regions)
+    return df_rank.merge(stack.get_regions_below_cap(regional_cap=regional_cap))
 
 
-def apply_tech_ramp_rate(
-    old_stack: PlantStack, new_stack: PlantStack, df_rank: pd.DataFrame, chemical: str
+def _is_too_fast(
+    new_capacity, new_number_of_plants, old_capacity, old_number_of_plants, config
 ):
-    """Remove tech that would violate the max ramp up rate"""
-
-    rates = (
-        new_stack.get_tech(id_vars="technology", chemical=chemical)["capacity"]
-        / old_stack.get_tech(id_vars="technology", chemical=chemical)["capacity"]
-    )
+    """Ramp up rates of tech and whether they violate the max ramp up rate"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rates = new_capacity / old_capacity
 
     # Tech that is new receives an artificially high rate (first n plants will still be allowed bt MAX_PLANTS_RAMP_UP)
-    rates.fillna(10, inplace=True)
+    in_both_stacks = (new_number_of_plants > 0) & (old_number_of_plants > 0)
+    rates[~in_both_stacks | np.isnan(rates)] = 10
 
     # We don't allow relative year on year growth above this rate
-    too_much_growth = rates > MAX_TECH_RAMP_RATE
+    too_much_growth = rates > config.MAX_TECH_RAMP_RATE
 
     # Or, when numbers are low, we don't allow absolute growth above this number
-
-    df_number_of_plants = pd.concat(
-        [
-            new_stack.get_tech(id_vars="technology", chemical=chemical)[
-                "number_of_plants"
-            ],
-            old_stack.get_tech(id_vars="technology", chemical=chemical)[
-                "number_of_plants"
-            ],
-        ],
-        axis=1,
-    ).fillna(0)
-
-    df_number_of_plants.columns = [
-        "number_of_plants_new_stack",
-        "number_of_plants_old_stack",
+    too_many_plants = (
+        new_number_of_plants - old_number_of_plants
+    ) > config.MAX_PLANTS_RAMP_UP
+
+    return rates, too_much_growth & too_many_plants
+
+
+def get_invalid_ramp_rates(
+    old_stack: PlantStack, new_stack: PlantStack, config: RunConfig
+) -> pd.Series:
+    """Get the ramp up rates of tech that would violate the max ramp up rate"""
+    new_capacity, new_number_of_plants = new_stack.get_tech_totals()
+    old_capacity, old_number_of_plants = old_stack.get_tech_totals()
+    n_technologies = max(len(new_capacity), len(old_capacity))
+    new_capacity, new_number_of_plants, old_capacity, old_number_of_plants = [
+        np.pad(totals, (0, n_technologies - len(totals)))
+        for totals in [
+            new_capacity,
+            new_number_of_plants,
+            old_capacity,
+            old_number_of_plants,
+        ]
     ]
 
-    df_number_of_plants["plants_difference"] = (
-        df_number_of_plants.number_of_plants_new_stack
-        - df_number_of_plants.number_of_plants_old_stack
+    rates, too_fast = _is_too_fast(
+        new_capacity, new_number_of_plants, old_capacity, old_number_of_plants, config
     )
+    return pd.Series(rates, index=TECHNOLOGY_CODES.labels[:n_technologies])[too_fast]
 
-    too_many_plants = (df_number_of_plants["plants_difference"]) > MAX_PLANTS_RAMP_UP
 
-    invalid_rates = rates[too_much_growth & too_many_plants]
+def apply_tech_ramp_rate(
+    old_stack: PlantStack,
+    new_stack: PlantStack,
+    df_rank: pd.DataFrame,
+    chemical: str,
+    config: RunConfig,
+):
+    """Remove tech that would violate the max ramp up rate"""
+    invalid_rates = get_invalid_ramp_rates(
+        old_stack=old_stack, new_stack=new_stack, config=config
+    )
 
     if not invalid_rates.empty:
         logger.debug("Removing tech because of rates, %s", invalid_rates)
@@ -69,71 +86,271 @@ def apply_tech_ramp_rate(
     return df_rank
 
 
-def remove_initial_tech(df_rank: pd.DataFrame, df_tech: pd.DataFrame):
+def frees_resources(df_rank: pd.DataFrame) -> bool:
+    """Check if any of the transitions has a negative use of a resource"""
+    return bool((df_rank[list(RESOURCE_USE.values())] < 0).any(axis=None))
+
+
+def filter_still_valid(
+    transitions: list,
+    pathway: DecarbonizationPathway,
+    old_stack: PlantStack,
+    new_stack: PlantStack,
+    chemical: str,
+    year: int,
+    valid_regions=None,
+) -> list:
+    """
+    Keep the transitions that are still valid after plants were added
+
+    Only checks the constraints that adding plants can change: the resource caps,
+    the tech ramp up rates and the regional cap.
+
+    Args:
+        transitions: Transitions (ranking rows) that were valid before
+        valid_regions: Regions below the regional cap before, None if the regional
+            cap does not apply
+
+    Returns:
+        The valid transitions, or none at all when another region fell below the
+        regional cap (as its transitions could be valid again)
+    """
+    # Regional cap
+    if valid_regions is not None:
+        regions = set(
+            new_stack.get_regions_below_cap(
+                regional_cap=pathway.config.REGIONAL_CAP
+            ).region
+        )
+        if not regions <= valid_regions:
+            return []
+        transitions = [
+            transition for transition in transitions if transition["region"] in regions
+        ]
+
+    # Tech ramp up rate
+    invalid_rates = get_invalid_ramp_rates(
+        old_stack=old_stack, new_stack=new_stack, config=pathway.config
+    )
+    transitions = [
+        transition
+        for transition in transitions
+        if transition["destination"] not in invalid_rates.index
+    ]
+
+    # Resource caps
+    availability = pathway.availability
+    remaining = np.nan_to_num(
+        availability.get_remaining_array(year=year, chemical=chemical)
+    )
+    region_index = {region: i for i, region in enumerate(availability.regions)}
+    return [
+        transition
+        for transition in transitions
+        if (
+            np.array([transition[use] for use in RESOURCE_USE.values()])
+            <= remaining[region_index[transition["region"]]]
+        ).all()
+    ]
+
+
+def get_ramp_rate_steps(
+    old_stack: PlantStack,
+    new_stack: PlantStack,
+    technologies: list,
+    increase: dict,
+    decrease: dict,
+    limit: int,
+    config: RunConfig,
+) -> int:
+    """
+    Get the number of steps (up to a limit) before the tech ramp up rate can make one
+    of the technologies valid or invalid
+
+    Args:
+        technologies: Technologies to check
+        increase: Capacity and number of plants that one step can add at most, per
+            technology
+        decrease: Capacity and number of plants that one step can remove at most, per
+            technology
+    """
+    technologies = sorted(set(technologies))
+    codes = TECHNOLOGY_CODES.get_many(technologies)
+
+    def get_totals(values):
+        # Tech without a code (-1) has no plants
+        return np.append(values, 0)[codes]
+
+    new_capacity, new_number_of_plants = map(get_totals, new_stack.get_tech_totals())
+    old_capacity, old_number_of_plants = map(get_totals, old_stack.get_tech_totals())
+    (
+        increase_capacity,
+        increase_number_of_plants,
+        decrease_capacity,
+        decrease_number_of_plants,
+    ) = [
+        np.array([changes.get(technology, (0, 0))[i] for technology in technologies])
+        for changes in [increase, decrease]
+        for i in range(2)
+    ]
+
+    # Whether a tech is too fast only goes up with its capacity and number of plants,
+    # so the totals reachable in a number of steps are bounded by two extremes (with
+    # a margin for the rounding of running totals)
+    steps = np.arange(1, limit)[:, None]
+    too_fast = _is_too_fast(
+        new_capacity, new_number_of_plants, old_capacity, old_number_of_plants, config
+    )[1]
+    upper = _is_too_fast(
+        (new_capacity + steps * increase_capacity) * (1 + MARGIN) + MARGIN,
+        new_number_of_plants + steps * increase_number_of_plants,
+        old_capacity,
+        old_number_of_plants,
+        config,
+    )[1]
+    lower = _is_too_fast(
+        ((new_capacity - steps * decrease_capacity) * (1 - MARGIN) - MARGIN).clip(
+            min=0
+        ),
+        (new_number_of_plants - steps * decrease_number_of_plants).clip(min=0),
+        old_capacity,
+        old_number_of_plants,
+        config,
+    )[1]
+
+    changed = ((upper != too_fast) | (lower != too_fast)).any(axis=1)
+    return 1 + int(np.argmax(changed)) if changed.any() else limit
+
+
+def get_resource_steps(
+    transitions: list,
+    pathway: DecarbonizationPathway,
+    chemical: str,
+    year: int,
+    decrease: np.ndarray,
+    increase: np.ndarray,
+    limit: int,
+) -> int:
+    """
+    Get the number of steps (up to a limit) before the resource caps can make one of the
+    transitions valid or invalid
+
+    Args:
+        transitions: Transitions (ranking rows) to check
+        decrease: Largest decrease of the remaining resources in one step, as from
+            `AvailabilityLedger.get_change_bound`
+        increase: Largest increase of the remaining resources in one step
+    """
+    if not transitions:
+        return limit
+
+    availability = pathway.availability
+    region_index = {region: i for i, region in enumerate(availability.regions)}
+    regions = [region_index[transition["region"]] for transition in transitions]
+    remaining = np.nan_to_num(
+        availability.get_remaining_array(year=year, chemical=chemical)
+    )[regions]
+    use = np.array(
+        [
+            [transition[column] for column in RESOURCE_USE.values()]
+            for transition in transitions
+        ]
+    )
+    feasible = use <= remaining
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # A resource that covers the use does so until it could have decreased too much
+        covered_steps = np.where(
+            decrease[regions] > 0,
+            np.floor((remaining - use) / decrease[regions]) + 1,
+            np.inf,
+        )
+        # A resource that falls short does so until it could have increased enough
+        short_steps = np.where(
+            increase[regions] > 0,
+            np.ceil((use - remaining) / increase[regions]),
+            np.inf,
+        )
+
+    steps = np.where(
+        feasible.all(axis=1),
+        np.where(feasible, covered_steps, np.inf).min(axis=1),
+        np.where(feasible, 0, short_steps).max(axis=1),
+    )
+    return int(min(limit, steps.min()))
+
+
+def get_regional_cap_steps(
+    stack: PlantStack,
+    transitions: list,
+    capacities: list,
+    regional_cap: float,
+    limit: int,
+) -> int:
+    """
+    Get the number of steps (up to a limit) of adding plants of the transitions before
+    a region can go over or fall below the regional cap, or reach its quota
+
+    Args:
+        transitions: Transitions (ranking rows) that a step adds a plant of
+        capacities: Capacity of the plant of each transition
+    """
+    df_regions = stack.get_regional_contribution()
+    capacity = df_regions["capacity"].values
+    total = capacity.sum()
+
+    # The share of a region goes up most when all plants are added there, and down
+    # most when all plants are added elsewhere
+    regions = [transition["region"] for transition in transitions]
+    added = (
+        pd.Series(capacities, index=regions)
+        .groupby(level=0)
+        .max()
+        .reindex(df_regions["region"], fill_value=0)
+        .values
+    )
+    quota_left = stack.get_regional_quota_left()[
+        REGION_CODES.get_many(df_regions["region"])
+    ]
+    steps = np.arange(1, limit)[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        below_cap = capacity / total < regional_cap
+        upper = (capacity + steps * added) / (total + steps * added)
+        lower = capacity / (total + steps * max(capacities))
+
+    changed = (
+        ((upper + MARGIN < regional_cap) != below_cap)
+        | ((lower - MARGIN < regional_cap) != below_cap)
+        | ((quota_left - steps * added - MARGIN > 0) != (quota_left > 0))
+    ).any(axis=1)
+    return 1 + int(np.argmax(changed)) if changed.any() else limit
+
+
+def remove_initial_tech(df_rank: pd.DataFrame, eligibility: TechEligibility):
     """Filter initial tech out of the ranking df"""
-    return df_rank.merge(
-        df_tech.loc[df_tech["type_of_tech"] != "Initial", ["technology"]],
-        left_on="destination",
-        right_on="technology",
-    ).drop(columns="technology")
+    return df_rank[eligibility.is_non_initial(technologies=df_rank["destination"])]
 
 
 def filter_available_tech(
-    df_tech: pd.DataFrame, year: int, df_rank: pd.DataFrame, chemical: str
+    eligibility: TechEligibility, year: int, df_rank: pd.DataFrame, chemical: str
 ):
     """Keep only tech available in this year"""
-    df_tech = df_tech.loc[
-        (year >= df_tech.available_from)
-        & (year <= df_tech.available_until)
-        & (df_tech.chemical == chemical),
-        ["type_of_tech", "technology"],
+    return df_rank[
+        eligibility.is_available(
+            chemical=chemical, year=year, technologies=df_rank["destination"]
+        )
     ]
-    return df_rank.merge(df_tech, left_on="destination", right_on="technology")
 
 
-def apply_constraints(
+def get_constraint_candidates(
     df_rank: pd.DataFrame,
     df_process_data: pd.DataFrame,
-    pathway: DecarbonizationPathway,
-    chemical: str,
-    year: int,
+    df_remaining: pd.DataFrame,
     filter_naphtha_na=False,
 ):
-    """Apply constraints on raw materials and CCS"""
-    df_availability = pathway.get_availability(year=year)
-
-    # when used went to negative cap it to zero
-    df_availability.loc[
-        (df_availability[f"{chemical}_used"] < 0), f"{chemical}_used"
-    ] = 0
-    df_availability.loc[(df_availability.used < 0), "used"] = 0
-
-    # calculate the available cap sizes
-    df_availability[f"{chemical}_remaining"] = (
-        df_availability[f"{chemical}_cap"] - df_availability[f"{chemical}_used"]
-    )
-    df_availability[f"{chemical}_remaining"].clip(lower=0, inplace=True)
-
-    df_availability["remaining"] = df_availability["cap"] - df_availability["used"]
-    df_availability.remaining.clip(lower=0, inplace=True)
-
-    for material_constraints in ["CO2 storage", "Biomass"]:
-        df_availability.loc[
-            (df_availability.name == material_constraints), "remaining"
-        ] = df_availability.loc[
-            (df_availability.name == material_constraints), f"{chemical}_remaining"
-        ]
-    # Merge remaining resources (expect for Methanol as it is not regional)
-    df_availability_pivot = df_availability.pivot_table(
-        values="remaining", index="region", columns="name"
-    )
-    df_rank = df_rank.merge(df_availability_pivot, on="region")
-
-    # Add remaining methanol green/black
-    for methanol_type in METHANOL_TYPES:
-        df_rank[methanol_type] = df_availability.loc[
-            df_availability.name == methanol_type, "remaining"
-        ].values[0]
+    """Merge the ranking with the remaining resources and resource use of each tech"""
+    # Remaining resources per region (methanol is not regional, so the same everywhere)
+    df_rank = df_rank.merge(df_remaining, on="region")
 
     # Get data on CCS/biomass
     df_process_data = df_process_data[
@@ -165,21 +382,45 @@ def apply_constraints(
         df_process_data,
         on=["destination", "origin", "region"],
     )
-    df_rank = df_rank.fillna(0)
+    return df_rank.fillna(0)
 
-    # Remove tech that would exceed one of the resource caps
-    df_rank = df_rank[
-        (df_rank["biomass_yearly"] <= df_rank["Biomass"])
-        & (df_rank["bio_oils_yearly"] <= df_rank["Bio-oils"])
-        & (df_rank["pyrolysis_oil_yearly"] <= df_rank["Pyrolysis oil"])
-        & (df_rank["ccs_yearly"] <= df_rank["CO2 storage"])
-        & (df_rank["waste_water_yearly"] <= df_rank["Waste water"])
-        & (
-            df_rank["municipal_solid_waste_rdf_yearly"]
-            <= df_rank["Municipal solid waste RdF"]
+
+def apply_constraints(
+    df_rank: pd.DataFrame,
+    df_process_data: pd.DataFrame,
+    pathway: DecarbonizationPathway,
+    chemical: str,
+    year: int,
+    filter_naphtha_na=False,
+):
+    """
+    Apply constraints on raw materials and CCS
+
+    The candidates are made once for a ranking and process data; calls with the same
+    ones (e.g. in the build and retrofit loops) only check the candidates again for
+    the resources that changed since the last call.
+    """
+    sources = (df_rank, df_process_data, chemical, year, filter_naphtha_na)
+    constraints = pathway.resource_constraints
+    if constraints is None or not constraints.is_for(*sources):
+        df_candidates = get_constraint_candidates(
+            df_rank=df_rank,
+            df_process_data=df_process_data,
+            df_remaining=pathway.get_remaining_availability(
+                year=year, chemical=chemical
+            ),
+            filter_naphtha_na=filter_naphtha_na,
         )
-        & (df_rank["methanol_black_yearly"] <= df_rank["Methanol - Black"])
-        & (df_rank["methanol_green_yearly"] <= df_rank["Methanol - Green"])
-    ]
+        constraints = ResourceConstraints(
+            df_candidates=df_candidates,
+            regions=pathway.availability.regions,
+            sources=sources,
+        )
+        pathway.resource_constraints = constraints
 
-    return df_rank
+    # Remove tech that would exceed one of the resource caps
+    return constraints.get_feasible(
+        remaining=pathway.availability.get_remaining_array(
+            year=year, chemical=chemical
+        )
+    )
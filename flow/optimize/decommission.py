@@ -2,20 +2,25 @@ import logging
 
 import pandas as pd
 
-from config import AGE_DEPENDENCY, MODEL_SCOPE, PLANT_SPEC_OVERRIDE
 from models.decarbonization import DecarbonizationPathway
 from models.plant import PlantStack
+from models.run_config import RunConfig
 
 logger = logging.getLogger(__name__)
 logger.setLevel("INFO")
 
 
-def get_plant_capacity_mt():
-    return PLANT_SPEC_OVERRIDE["assumed_plant_capacity"] * 365 / 1e6
+def get_plant_capacity_mt(config: RunConfig):
+    return config.PLANT_SPEC_OVERRIDE["assumed_plant_capacity"] * 365 / 1e6
 
 
 def select_plant_to_decommission(
-    stack: PlantStack, df_rank: pd.DataFrame, df_tech: pd.DataFrame, chemical: str
+    stack: PlantStack,
+    df_rank: pd.DataFrame,
+    df_tech: pd.DataFrame,
+    chemical: str,
+    technology=None,
+    plant_status=None,
 ):
     """
     Select plant to decommission, based on cost or emissions
@@ -24,13 +29,17 @@ def select_plant_to_decommission(
         stack:
         df_rank:
         df_tech:
+        technology: Only consider plants of this technology
+        plant_status: Only consider plants with this status ('new' or 'old')
 
     Returns:
 
     """
 
     # Keep only plants that exist
-    df_old_tech = stack.get_unique_tech(chemical=chemical)
+    df_old_tech = stack.get_unique_tech(
+        chemical=chemical, technology=technology, plant_status=plant_status
+    )
     df_rank = df_rank.merge(
         df_old_tech,
         left_on=["technology", "region"],
@@ -53,10 +62,7 @@ def select_plant_to_decommission(
         if k in ["technology", "region", "chemical"]
     }
 
-    remove_plants = stack.filter_plants(**decommission_spec)
-    remove_plants.sort(key=lambda plant: plant.start_year, reverse=False)
-
-    return remove_plants[0]
+    return stack.get_oldest_plant(plant_status=plant_status, **decommission_spec)
 
 
 def decommission(pathway: DecarbonizationPathway, year: int, chemical: str):
@@ -86,8 +92,9 @@ def decommission(pathway: DecarbonizationPathway, year: int, chemical: str):
     df_rank = pathway.filter_tech_primary_chemical(
         df_tech=df_rank, chemical=chemical, col="destination"
     )
-    df_rank.drop(columns="technology", inplace=True)
-    df_rank.rename(columns={"technology":"origin", "destination":"technology"}, inplace=True)
+    df_rank = df_rank.drop(columns="technology", errors="ignore").rename(
+        columns={"destination": "technology"}
+    )
 
     if (pathway.pathway_name != "bau") and (
         year >= pathway.get_year_earliest_force_decommission()
@@ -116,15 +123,19 @@ def decommission(pathway: DecarbonizationPathway, year: int, chemical: str):
     surplus = yearly_volume - demand
 
     # Decommission to follow demand decrease; only decommission if we have > 1 plant capacity surplus
-    while surplus > get_plant_capacity_mt():
+    while surplus > get_plant_capacity_mt(pathway.config):
         try:
             remove_plant = select_plant_to_decommission(
-                stack=stack.get_old_plant_stack()
-                if (chemical in AGE_DEPENDENCY and MODEL_SCOPE == "World")
-                else stack,
+                stack=stack,
                 df_rank=df_rank,
                 df_tech=df_tech,
                 chemical=chemical,
+                plant_status="old"
+                if (
+                    chemical in pathway.config.AGE_DEPENDENCY
+                    and pathway.config.MODEL_SCOPE == "World"
+                )
+                else None,
             )
 
         except ValueError:
@@ -146,25 +157,28 @@ def decommission(pathway: DecarbonizationPathway, year: int, chemical: str):
 
 def decommission_old_tech(pathway, chemical, year, df_rank, df_tech, stack):
     """Additionally, decommission to get rid of old tech"""
-    for technology in pathway.decommission_rates.technology.unique():
+    for technology in pathway.decommission_rates.keys:
         if technology in df_rank.technology.values:
             decommission_rate = pathway.get_decommission_rate(
                 technology=technology, year=year
             )
-            total_volume = sum(
-                plant.get_yearly_volume(chemical=chemical)
-                for plant in stack.filter_plants(technology=technology)
+            total_volume = stack.get_yearly_volume(
+                chemical=chemical, technology=technology
             )
 
             decommission_volume = total_volume * decommission_rate
 
-            while decommission_volume > 0 or total_volume <= get_plant_capacity_mt():
+            while (
+                decommission_volume > 0
+                or total_volume <= get_plant_capacity_mt(pathway.config)
+            ):
                 try:
                     remove_plant = select_plant_to_decommission(
-                        stack=stack.get_tech_plant_stack(technology=technology),
+                        stack=stack,
                         df_rank=df_rank,
                         df_tech=df_tech,
                         chemical=chemical,
+                        technology=technology,
                     )
                 except ValueError:
                     logger.info("No more plants to decommission")
@@ -1,18 +1,27 @@
 import logging
+import multiprocessing as mp
+import random
 
-from config import END_YEAR, LOG_LEVEL, START_YEAR
-from flow.import_data.intermediate_data import IntermediateDataImporter
+import numpy as np
+
+from config import LOG_LEVEL
 from flow.optimize.build_new import build_new
 from flow.optimize.decommission import decommission
 from flow.optimize.retrofit import retrofit
 from models.decarbonization import DecarbonizationPathway
+from models.plant import renumber_plant
+from models.run_config import RunConfig
 from util.util import timing
 
 logger = logging.getLogger(__name__)
 logger.setLevel(LOG_LEVEL)
 
+# Pathway at the start of a year, that the workers optimizing its chemicals continue
+# from. The workers are forked, and share its memory until they change it.
+_pathway = None
+
 
-def optimize(pathway: DecarbonizationPathway):
+def optimize(pathway: DecarbonizationPathway, first_year=None, checkpoint_dir=None):
     """
     Run the pathway simulation over the years:
         - First, decommission a fixed % of plants
@@ -20,12 +29,24 @@ def optimize(pathway: DecarbonizationPathway):
         - Then, build new if increasing demand
     Args:
         pathway: The decarb pathway
+        first_year: Year to start from (defaults to the start year of the pathway),
+            the years before are in the pathway already
+        checkpoint_dir: If given, save the pathway state here at the end of every year
 
     Returns:
         The updated pathway
     """
 
-    for year in range(START_YEAR, END_YEAR):
+    if first_year is None:
+        first_year = pathway.start_year
+
+    parallel = pathway.config.PARALLEL_CHEMICALS
+    if parallel and "fork" not in mp.get_all_start_methods():
+        logger.warning("Workers can't be forked, optimizing chemicals one by one")
+        parallel = False
+    pathway.availability.set_partitioned(parallel)
+
+    for year in range(first_year, pathway.end_year):
         logger.info("Optimizing for %s", year)
         pathway.update_plant_status(year=year)
 
@@ -34,19 +55,13 @@ def optimize(pathway: DecarbonizationPathway):
         # Copy over last year's stack to this year
         pathway = pathway.copy_stack(year=year)
         # Run model for all chemicals (Methanol last as it needs MTO/A/P demand)
-
-        for chemical in pathway.get_shuffled_chemicals():
-            logger.info(chemical)
-
-            # Decommission plants
-            pathway = decommission(pathway=pathway, year=year, chemical=chemical)
-
-            # Retrofit plants, except for business as usual scenario
-            if pathway.pathway_name != "bau":
-                pathway = retrofit(pathway=pathway, year=year, chemical=chemical)
-
-            # Build new plants
-            pathway = build_new(pathway=pathway, year=year, chemical=chemical)
+        if parallel:
+            pathway = optimize_in_parallel(pathway=pathway, year=year)
+        else:
+            for chemical in pathway.get_shuffled_chemicals():
+                pathway = optimize_chemical(
+                    pathway=pathway, year=year, chemical=chemical
+                )
 
         # Finally, re-rank MTO tech for next year, based on this year's Methanol stack
         if "Methanol" in pathway.chemicals:
@@ -55,39 +70,221 @@ def optimize(pathway: DecarbonizationPathway):
         # Copy availability to next year
         pathway.copy_availability(year=year)
 
+        if checkpoint_dir is not None:
+            pathway.save_checkpoint(
+                path=checkpoint_dir.joinpath(f"{year}.pkl.gz"), year=year
+            )
+
     # Update one last time to make sure end year availability/demand is right
-    pathway.update_methanol_availability_from_stack(year=END_YEAR)
-    pathway.get_demand(chemical="Methanol", year=END_YEAR, build_new=True)
+    pathway.update_methanol_availability_from_stack(year=pathway.end_year)
+    pathway.get_demand(chemical="Methanol", year=pathway.end_year, build_new=True)
 
     return pathway
 
 
-@timing
-def optimize_pathway(pathway, sensitivity, chemicals, model_scope):
+def optimize_chemical(pathway: DecarbonizationPathway, year: int, chemical: str):
+    """Decommission, retrofit and build new plants of a chemical in a year"""
+    logger.info(chemical)
+
+    # Decommission plants
+    pathway = decommission(pathway=pathway, year=year, chemical=chemical)
+
+    # Retrofit plants, except for business as usual scenario
+    if pathway.pathway_name != "bau":
+        pathway = retrofit(pathway=pathway, year=year, chemical=chemical)
+
+    # Build new plants
+    return build_new(pathway=pathway, year=year, chemical=chemical)
+
+
+def optimize_in_parallel(pathway: DecarbonizationPathway, year: int):
     """
-    Get data per technology, ranking data and then run the pathway simulation
+    Optimize the independent groups of chemicals of a year at the same time, then
+    Methanol
+
+    Every group runs in a forked worker process that continues from the pathway at the
+    start of the year, with the resource caps partitioned per chemical. The random
+    generators of a group are seeded from RANDOM_SEED, the year and the group, and the
+    changes of the groups are applied in the order of the groups, so the result does
+    not depend on the order the workers finish in. The room each region has under the
+    regional cap is split between the groups (see `_get_regional_quotas`), so the
+    plants they build together keep it below the cap.
+
+    Returns:
+        The updated pathway
     """
-    importer = IntermediateDataImporter(
-        pathway=pathway,
-        sensitivity=sensitivity,
-        chemicals=chemicals,
-        model_scope=model_scope,
+    global _pathway
+    groups = pathway.get_independent_chemicals()
+    streams = np.random.SeedSequence([pathway.config.RANDOM_SEED, year]).spawn(
+        len(groups)
     )
+    runs = [
+        (year, group, int(stream.generate_state(1)[0]), regional_quota)
+        for group, stream, regional_quota in zip(
+            groups, streams, _get_regional_quotas(pathway, year=year, groups=groups)
+        )
+    ]
 
-    # Make pathway
-    pathway = DecarbonizationPathway(
-        pathway_name=pathway,
-        chemicals=chemicals,
-        start_year=START_YEAR,
-        end_year=END_YEAR,
-        sensitivity=sensitivity,
-        model_scope=model_scope,
+    if runs:
+        logger.info(f"Optimizing {groups} in parallel")
+        n_workers = min(len(runs), pathway.config.CHEMICAL_WORKERS or mp.cpu_count())
+        _pathway = pathway
+        try:
+            # A new worker for every group, forked from the pathway before any changes
+            with mp.get_context("fork").Pool(
+                processes=n_workers, maxtasksperchild=1
+            ) as pool:
+                changes = pool.starmap(_optimize_group, runs)
+        finally:
+            _pathway = None
+
+        for group_changes in changes:
+            _apply_changes(pathway=pathway, year=year, changes=group_changes)
+
+    if "Methanol" in pathway.chemicals:
+        pathway = optimize_chemical(pathway=pathway, year=year, chemical="Methanol")
+    return pathway
+
+
+def _get_regional_quotas(pathway: DecarbonizationPathway, year: int, groups: list):
+    """
+    Split the capacity each region can still get under the regional cap between the
+    groups of chemicals, on the constraint shares of their chemicals
+
+    A group can build in a region until its part is less than the largest plant it can
+    build there, so together the groups don't build more than the region can get.
+
+    Returns:
+        Capacity each group can add per region, or None per group if the regional cap
+            does not apply
+    """
+    regional_cap = pathway.config.REGIONAL_CAP
+    if pathway.config.MODEL_SCOPE != "World" or regional_cap >= 1:
+        return [None] * len(groups)
+
+    # Adding x to a region with capacity c keeps it below the cap while
+    # (c + x) / (total + x) < cap
+    df_regions = pathway.get_stack(year + 1).get_regional_contribution()
+    room = (
+        (regional_cap * df_regions["capacity"].sum() - df_regions["capacity"])
+        / (1 - regional_cap)
+    ).clip(lower=0)
+    room.index = df_regions["region"]
+
+    shares = np.array(
+        [
+            sum(pathway.constraint_share.get(chemical, 0) for chemical in group)
+            for group in groups
+        ]
     )
+    if shares.sum() > 0:
+        shares = shares / shares.sum()
+    else:
+        shares = np.full(len(groups), 1 / len(groups))
 
-    # Optimize plant stack on a yearly basis
-    pathway = optimize(
-        pathway=pathway,
+    quotas = []
+    for group, share in zip(groups, shares):
+        largest_plant = {}
+        for (_, region), capacities in pathway.plant_capacities.items():
+            for chemical in group:
+                largest_plant[region] = max(
+                    largest_plant.get(region, 0), capacities.get(chemical, 0)
+                )
+        quotas.append(
+            {
+                region: max(0, share * region_room - largest_plant.get(region, 0))
+                for region, region_room in room.items()
+            }
+        )
+    return quotas
+
+
+def _optimize_group(year, chemicals, seed, regional_quota=None):
+    """
+    Optimize a group of chemicals in a worker process
+
+    Args:
+        regional_quota: Capacity the group can add per region (see
+            `PlantStack.set_regional_quota`), None for no quota
+
+    Returns:
+        The changes to the stacks of the year and the next year (identifiers of the
+            plants removed, plants added), to the amounts used of resources in the year
+            and the transitions that were added
+    """
+    pathway = _pathway
+    random.seed(seed)
+    np.random.seed(seed)
+    pathway.get_stack(year + 1).set_regional_quota(regional_quota)
+
+    years = [year + 1, year]
+    before = {
+        stack_year: {plant.uuid for plant in pathway.get_stack(stack_year).plants}
+        for stack_year in years
+    }
+    used, chemical_used = pathway.availability.get_used(year=year)
+    n_transitions = len(pathway.transitions.transitions)
+
+    chemicals = list(chemicals)
+    random.shuffle(chemicals)
+    for chemical in chemicals:
+        pathway = optimize_chemical(pathway=pathway, year=year, chemical=chemical)
+
+    changes = {"removed": {}, "added": {}}
+    for stack_year in years:
+        plants = pathway.get_stack(stack_year).plants
+        uuids = {plant.uuid for plant in plants}
+        changes["removed"][stack_year] = sorted(before[stack_year] - uuids)
+        changes["added"][stack_year] = [
+            plant for plant in plants if plant.uuid not in before[stack_year]
+        ]
+
+    new_used, new_chemical_used = pathway.availability.get_used(year=year)
+    changes["used"] = new_used - used
+    changes["chemical_used"] = new_chemical_used - chemical_used
+    changes["transitions"] = pathway.transitions.transitions[n_transitions:]
+    return changes
+
+
+def _apply_changes(pathway: DecarbonizationPathway, year: int, changes: dict):
+    """Apply the changes a worker made to its copy of the pathway"""
+    # Plants made in the worker get identifiers of this process, once per plant
+    added = {
+        id(plant): plant for plants in changes["added"].values() for plant in plants
+    }
+    for plant in added.values():
+        renumber_plant(plant)
+
+    # Remove from the next year first, so removing from both years stays in one table
+    for stack_year in [year + 1, year]:
+        stack = pathway.get_stack(stack_year)
+        for uuid in changes["removed"][stack_year]:
+            stack.remove(stack.get_plant(uuid))
+    for stack_year in [year + 1, year]:
+        stack = pathway.get_stack(stack_year)
+        for plant in changes["added"][stack_year]:
+            stack.append(plant)
+
+    pathway.availability.add_used(
+        year=year, used=changes["used"], chemical_used=changes["chemical_used"]
     )
+    pathway.transitions.transitions.extend(changes["transitions"])
+
+
+def get_checkpoint_path(checkpoint_dir, year="latest"):
+    """Get the checkpoint file of a year, or the last one saved if year is 'latest'"""
+    if year == "latest":
+        paths = checkpoint_dir.glob("*.pkl.gz")
+        years = [int(path.name.split(".")[0]) for path in paths]
+        if not years:
+            raise FileNotFoundError(f"No checkpoints in {checkpoint_dir}")
+        year = max(years)
+    return checkpoint_dir.joinpath(f"{year}.pkl.gz")
+
+
+def save_pathway(pathway: DecarbonizationPathway):
+    """Export the stacks, transitions, rankings, availability and demand of a pathway"""
+    importer = pathway.importer
 
     # Save rankings after they have been adjusted due to MTO
     pathway.save_rankings()
@@ -95,7 +292,7 @@ def optimize_pathway(pathway, sensitivity, chemicals, model_scope):
     pathway.save_demand()
     pathway.save_stacks()
 
-    for chemical in chemicals:
+    for chemical in pathway.chemicals:
         df_stack_total = pathway.aggregate_stacks(this_year=False, chemical=chemical)
         df_stack_new = pathway.aggregate_stacks(this_year=True, chemical=chemical)
 
@@ -114,7 +311,56 @@ def optimize_pathway(pathway, sensitivity, chemicals, model_scope):
         pathway.plot_stacks(df_stack_total, groupby="technology", chemical=chemical)
         pathway.plot_stacks(df_stack_total, groupby="region", chemical=chemical)
 
-    pathway.plot_methanol_availability(df_availability=pathway.availability)
+    pathway.plot_methanol_availability(
+        df_availability=pathway.availability.to_dataframe()
+    )
     pathway.save_transitions()
 
+
+@timing
+def optimize_pathway(
+    pathway, sensitivity, chemicals, model_scope, config: RunConfig = None
+):
+    """
+    Get data per technology, ranking data and then run the pathway simulation
+    """
+    config = config or RunConfig()
+
+    # Make pathway
+    pathway = DecarbonizationPathway(
+        pathway_name=pathway,
+        chemicals=chemicals,
+        start_year=config.START_YEAR,
+        end_year=config.END_YEAR,
+        sensitivity=sensitivity,
+        model_scope=model_scope,
+        config=config,
+    )
+
+    # Seed the random tie-breaks, a checkpoint restores the state it was saved with
+    random.seed(config.RANDOM_SEED)
+    np.random.seed(config.RANDOM_SEED)
+
+    # Continue from a checkpoint, or save checkpoints from the start
+    checkpoint_dir = pathway.importer.export_dir.joinpath("checkpoints")
+    first_year = config.START_YEAR
+    if config.RESUME_FROM_CHECKPOINT is not None:
+        checkpoint_path = get_checkpoint_path(
+            checkpoint_dir, config.RESUME_FROM_CHECKPOINT
+        )
+        logger.info(f"Resuming from checkpoint {checkpoint_path}")
+        first_year = pathway.load_checkpoint(path=checkpoint_path) + 1
+    elif config.SAVE_CHECKPOINTS:
+        for path in checkpoint_dir.glob("*.pkl.gz"):
+            path.unlink()
+
+    # Optimize plant stack on a yearly basis
+    pathway = optimize(
+        pathway=pathway,
+        first_year=first_year,
+        checkpoint_dir=checkpoint_dir if config.SAVE_CHECKPOINTS else None,
+    )
+
+    save_pathway(pathway)
+
     logger.info("Pathway optimization complete")
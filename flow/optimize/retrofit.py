@@ -1,16 +1,21 @@
 import logging
 
+import numpy as np
 import pandas as pd
 
-from config import (AGE_DEPENDENCY, MODEL_SCOPE, NO_FOSSIL_FROM_YEAR,
-                    RETROFIT_CAP, SECOND_RETROFIT_EARLIEST_YEAR)
-from flow.optimize.constraints import (apply_constraints, apply_tech_ramp_rate,
-                                       filter_available_tech)
+from config import METHANOL_DEMAND_TECH
+from flow.optimize.constraints import (MARGIN, apply_constraints,
+                                       apply_tech_ramp_rate,
+                                       filter_available_tech,
+                                       filter_still_valid, get_ramp_rate_steps,
+                                       get_resource_steps)
 from flow.optimize.util import (filter_existing_tech, filter_out_fossil,
                                 keep_only_initial_tech, remove_new_plants)
 from flow.rank.util import select_best_transition
 from models.decarbonization import DecarbonizationPathway
-from models.plant import make_new_plant
+from models.plant import (NO_CAPACITIES, RESOURCE_ATTRIBUTES, PlantSpecTable,
+                          make_new_plant)
+from models.run_config import RunConfig
 
 logger = logging.getLogger(__name__)
 logger.setLevel("INFO")
@@ -45,6 +50,8 @@ def force_availability_retrofit(
     Returns:
 
     """
+    spec_table = PlantSpecTable(df_process_data)
+
     for raw_material, value in dict_raw_material.items():
 
         # create a tuple to subset multi-index dataframe
@@ -97,16 +104,15 @@ def force_availability_retrofit(
                     new_stack=new_stack,
                     df_rank=df_existing,
                     chemical=chemical,
-                )
-
-                # Only keep tech that this chemical is the primary chemical of
-                df_valid = pathway.filter_tech_primary_chemical(
-                    df_tech=df_valid, chemical=chemical, col="destination"
+                    config=pathway.config,
                 )
 
                 # Remove plants that are too new to decommission / build new
                 df_valid = remove_new_plants(
-                    df_valid=df_valid, stack=old_stack, year=year
+                    df_valid=df_valid,
+                    stack=old_stack,
+                    year=year,
+                    minimum_age=pathway.config.MINIMUM_AGE_DECOMMISSION,
                 )
 
                 if df_valid.empty:
@@ -117,11 +123,11 @@ def force_availability_retrofit(
 
                 new_plant = make_new_plant(
                     best_transition=best_transition,
-                    df_process_data=df_process_data,
+                    spec_table=spec_table,
                     year=year,
                     retrofit=True,
                     chemical=chemical,
-                    df_plant_capacities=pathway.df_plant_capacities,
+                    plant_capacities=pathway.plant_capacities,
                 )
 
                 # When the tech to be removed is not in the plant stack, pass
@@ -186,44 +192,49 @@ def retrofit(pathway: DecarbonizationPathway, year: int, chemical: str):
     Returns:
         Updated pathway
     """
+    config = pathway.config
+
     # Get the new year's stack
     old_stack = pathway.get_stack(year=year)
     new_stack = pathway.get_stack(year=year + 1)
 
     # Determine number of plants to retrofit
     yearly_volume = new_stack.get_yearly_volume(chemical=chemical)
-    retrofit_volume = yearly_volume * RETROFIT_CAP
+    retrofit_volume = yearly_volume * config.RETROFIT_CAP
 
     # Get ranking table
     df_rank = pathway.get_ranking(year=year, chemical=chemical, rank_type="retrofit")
 
     # Get the tech available now
-    df_tech = pathway.tech
-
-    # Only keep tech that this chemical is the primary chemical of
-    df_tech = pathway.filter_tech_primary_chemical(df_tech=df_tech, chemical=chemical)
+    eligibility = pathway.eligibility
 
     # Get process data
     df_process_data = pathway.get_all_process_data(chemical=chemical, year=year)
+    spec_table = PlantSpecTable(df_process_data)
 
     # Only retrofit revamp tech from 2040
-    if year < SECOND_RETROFIT_EARLIEST_YEAR:
+    if year < config.SECOND_RETROFIT_EARLIEST_YEAR:
         df_rank = df_rank[~(df_rank["type_of_tech_origin"] == 2)]
 
     df_rank = filter_available_tech(
-        df_tech=df_tech, df_rank=df_rank, year=year, chemical=chemical
+        eligibility=eligibility, df_rank=df_rank, year=year, chemical=chemical
     )
 
     # Strictly no fossil: only allow initial until 2025, then only non-fossil tech
     if pathway.pathway_name == "nfs":
         if year >= 2025:
-            df_rank = filter_out_fossil(df_rank=df_rank, df_tech=df_tech)
+            df_rank = filter_out_fossil(df_rank=df_rank, eligibility=eligibility)
         else:
-            df_rank = keep_only_initial_tech(df_rank=df_rank, df_tech=df_tech)
+            df_rank = keep_only_initial_tech(df_rank=df_rank, eligibility=eligibility)
 
     # No new fossil after cutoff year
-    elif pathway.pathway_name == "nf" and year >= NO_FOSSIL_FROM_YEAR:
-        df_rank = filter_out_fossil(df_rank=df_rank, df_tech=df_tech)
+    elif pathway.pathway_name == "nf" and year >= config.NO_FOSSIL_FROM_YEAR:
+        df_rank = filter_out_fossil(df_rank=df_rank, eligibility=eligibility)
+
+    # Only keep tech that this chemical is the primary chemical of
+    df_rank = pathway.filter_tech_primary_chemical(
+        df_tech=df_rank, chemical=chemical, col="destination"
+    )
 
     dict_raw_material = get_availability_dict(pathway, year)
 
@@ -250,11 +261,7 @@ def retrofit(pathway: DecarbonizationPathway, year: int, chemical: str):
         )
 
         df_valid = filter_existing_tech(
-            stack=(
-                new_stack.get_new_plant_stack()
-                if (chemical in AGE_DEPENDENCY and MODEL_SCOPE == "World")
-                else new_stack
-            ),
+            stack=_get_origin_stack(stack=new_stack, chemical=chemical, config=config),
             df_rank=df_valid,
             chemical=chemical,
             feedstock_switch=False,
@@ -265,29 +272,43 @@ def retrofit(pathway: DecarbonizationPathway, year: int, chemical: str):
             new_stack=new_stack,
             df_rank=df_valid,
             chemical=chemical,
-        )
-
-        # Only keep tech that this chemical is the primary chemical of
-        df_valid = pathway.filter_tech_primary_chemical(
-            df_tech=df_valid, chemical=chemical, col="destination"
+            config=config,
         )
 
         # Remove plants that are too new to decommission / build new
-        df_valid = remove_new_plants(df_valid=df_valid, stack=old_stack, year=year)
+        df_valid = remove_new_plants(
+            df_valid=df_valid,
+            stack=old_stack,
+            year=year,
+            minimum_age=config.MINIMUM_AGE_DECOMMISSION,
+        )
 
         if df_valid.empty:
             logger.info("No more retrofits available for %s", year)
             break
 
+        if config.RETROFIT_IN_BULK:
+            retrofit_volume = retrofit_in_bulk(
+                pathway=pathway,
+                df_valid=df_valid,
+                spec_table=spec_table,
+                old_stack=old_stack,
+                new_stack=new_stack,
+                chemical=chemical,
+                year=year,
+                retrofit_volume=retrofit_volume,
+            )
+            continue
+
         best_transition = select_best_transition(df_rank=df_valid)
 
         new_plant = make_new_plant(
             best_transition=best_transition,
-            df_process_data=df_process_data,
+            spec_table=spec_table,
             year=year,
             retrofit=True,
             chemical=chemical,
-            df_plant_capacities=pathway.df_plant_capacities,
+            plant_capacities=pathway.plant_capacities,
         )
 
         # When the tech to be removed is not in the plant stack, pass
@@ -310,6 +331,332 @@ def retrofit(pathway: DecarbonizationPathway, year: int, chemical: str):
     return pathway.update_stack(year=year + 1, stack=new_stack)
 
 
+def retrofit_in_bulk(
+    pathway: DecarbonizationPathway,
+    df_valid: pd.DataFrame,
+    spec_table,
+    old_stack,
+    new_stack,
+    chemical: str,
+    year: int,
+    retrofit_volume: float,
+):
+    """
+    Retrofit plants with the transitions that share the best rank, without re-ranking
+
+    Like retrofitting one plant at a time, every plant is retrofitted with one of the
+    best transitions at random. After each retrofit, only the transitions that rank at
+    least as well are checked again for what a retrofit can change (the origin plants
+    left, the tech ramp up rate and the resource caps), until none of them is valid,
+    a better ranked transition became valid or the retrofit volume is reached. After
+    the first retrofit, plants are retrofitted in batches: a batch is as many plants as
+    can be retrofitted before any of the constraints could change which transitions
+    are valid, so they are retrofitted in one step with the same outcomes as one at a
+    time. The stack and the resources used are updated once per batch, so the amounts
+    used are rounded once per batch instead of after every plant.
+
+    Args:
+        df_valid: The valid transitions
+        retrofit_volume: Volume left to retrofit
+
+    Returns:
+        The volume left to retrofit
+    """
+    best_rank = df_valid["rank"].min()
+    transitions = df_valid[df_valid["rank"] == best_rank].to_dict(orient="records")
+    candidates = _get_retrofit_candidates(
+        pathway=pathway,
+        best_rank=best_rank,
+        old_stack=old_stack,
+        year=year,
+    )
+
+    n_plants = 1
+    while transitions and retrofit_volume > 0:
+        picks = [
+            transitions[i] for i in np.random.randint(len(transitions), size=n_plants)
+        ]
+        new_plants = [
+            make_new_plant(
+                best_transition=best_transition,
+                spec_table=spec_table,
+                year=year,
+                retrofit=True,
+                chemical=chemical,
+                plant_capacities=pathway.plant_capacities,
+            )
+            for best_transition in picks
+        ]
+
+        for volume in _retrofit_plants(
+            pathway=pathway,
+            transitions=picks,
+            new_plants=new_plants,
+            new_stack=new_stack,
+            chemical=chemical,
+            year=year,
+        ):
+            retrofit_volume -= volume
+
+        valid = filter_still_valid(
+            transitions=candidates,
+            pathway=pathway,
+            old_stack=old_stack,
+            new_stack=new_stack,
+            chemical=chemical,
+            year=year,
+        )
+        origin_stack = _get_origin_stack(
+            stack=new_stack, chemical=chemical, config=pathway.config
+        )
+        valid = [
+            transition
+            for transition in valid
+            if origin_stack.filter_plants(
+                region=transition["region"],
+                technology=transition["origin"],
+                chemical=chemical,
+            )
+        ]
+
+        # A better transition is valid again (e.g. resources were freed): rank again
+        if any(transition["rank"] < best_rank for transition in valid):
+            break
+        transitions = valid
+
+        # The transitions are the valid candidates now, so the next ones can be batched
+        if transitions and retrofit_volume > 0:
+            n_plants = _get_batch_size(
+                pathway=pathway,
+                transitions=transitions,
+                candidates=candidates,
+                spec_table=spec_table,
+                old_stack=old_stack,
+                new_stack=new_stack,
+                chemical=chemical,
+                year=year,
+                retrofit_volume=retrofit_volume,
+            )
+
+    return retrofit_volume
+
+
+def _get_batch_size(
+    pathway,
+    transitions,
+    candidates,
+    spec_table,
+    old_stack,
+    new_stack,
+    chemical,
+    year,
+    retrofit_volume,
+) -> int:
+    """
+    Number of plants to retrofit before any of the candidates could become valid or
+    invalid, for any picks among the transitions: the retrofit volume is not reached,
+    the origins of the candidates keep (or don't get) a plant, and each resource cap
+    and tech ramp up rate can't change even if all retrofits are of the transition
+    that changes it most
+    """
+    # Plants that a retrofit of each transition can remove
+    removable = {}
+    for transition in transitions:
+        key = (transition["region"], transition["origin"], transition["chemical"])
+        if key not in removable:
+            removable[key] = new_stack.filter_plants(
+                region=transition["region"],
+                technology=transition["origin"],
+                chemical=transition["chemical"],
+            )
+    origin_plants = [
+        removable[
+            (transition["region"], transition["origin"], transition["chemical"])
+        ]
+        for transition in transitions
+    ]
+
+    # Retrofit volume, less a margin for the rounding of subtracting one plant at a time
+    volume = max(
+        plant.get_yearly_volume(chemical=chemical)
+        for plants in removable.values()
+        for plant in plants
+    )
+    if not volume > 0:
+        return 1
+    n_plants = max(1, int(np.ceil((retrofit_volume * (1 - MARGIN) - MARGIN) / volume)))
+
+    # Origin plants: a retrofit removes at most one plant of its origin, and adds one
+    # that can be the origin of another candidate
+    removes = {
+        (transition["region"], transition["origin"]) for transition in transitions
+    }
+    adds = {
+        (transition["region"], transition["destination"]) for transition in transitions
+    }
+    origin_stack = _get_origin_stack(
+        stack=new_stack, chemical=chemical, config=pathway.config
+    )
+    for region, origin in {
+        (candidate["region"], candidate["origin"]) for candidate in candidates
+    }:
+        n_origin = len(
+            origin_stack.filter_plants(
+                region=region, technology=origin, chemical=chemical
+            )
+        )
+        if n_origin and (region, origin) in removes:
+            n_plants = min(n_plants, n_origin)
+        elif not n_origin and (region, origin) in adds:
+            n_plants = 1
+
+    # Resource caps: a retrofit frees the use of the old plant and takes that of the
+    # new plant
+    specs = [
+        spec_table.get(
+            technology=transition["destination"],
+            year=transition["year"],
+            region=transition["region"],
+        )
+        for transition in transitions
+    ]
+    new_use = np.nan_to_num(
+        [[spec[attribute] for attribute in RESOURCE_ATTRIBUTES] for spec in specs]
+    )
+    # An old plant of another chemical does not free the chemical's own share
+    old_use = [
+        np.nan_to_num(
+            [
+                [getattr(plant, attribute) for attribute in RESOURCE_ATTRIBUTES]
+                for plant in plants
+            ]
+            + [[0] * len(RESOURCE_ATTRIBUTES)]
+        )
+        for plants in origin_plants
+    ]
+    regions = [transition["region"] for transition in transitions]
+    availability = pathway.availability
+    n_plants = get_resource_steps(
+        transitions=candidates,
+        pathway=pathway,
+        chemical=chemical,
+        year=year,
+        decrease=availability.get_change_bound(
+            regions=regions,
+            use=np.array(
+                [(use - plants.min(axis=0)) for use, plants in zip(new_use, old_use)]
+            ).clip(min=0),
+        ),
+        increase=availability.get_change_bound(
+            regions=regions,
+            use=np.array(
+                [(plants.max(axis=0) - use) for use, plants in zip(new_use, old_use)]
+            ).clip(min=0),
+        ),
+        limit=n_plants,
+    )
+
+    # Tech ramp up rate: a retrofit adds a plant of its destination, and removes one of
+    # its origin
+    increase, decrease = {}, {}
+    for transition, plants in zip(transitions, origin_plants):
+        capacities = pathway.plant_capacities.get(
+            (transition["destination"], transition["region"]), NO_CAPACITIES
+        )
+        _update_largest(
+            increase,
+            transition["destination"],
+            (sum(capacities.values()), len(capacities)),
+        )
+        for plant in plants:
+            _update_largest(
+                decrease,
+                transition["origin"],
+                (sum(plant.capacities.values()), len(plant.capacities)),
+            )
+    return get_ramp_rate_steps(
+        old_stack=old_stack,
+        new_stack=new_stack,
+        technologies=[candidate["destination"] for candidate in candidates],
+        increase=increase,
+        decrease=decrease,
+        limit=n_plants,
+        config=pathway.config,
+    )
+
+
+def _update_largest(changes: dict, technology, change: tuple):
+    """Keep the largest capacity and number of plants of a change per technology"""
+    largest = changes.get(technology, (0, 0))
+    changes[technology] = (max(largest[0], change[0]), max(largest[1], change[1]))
+
+
+def _get_retrofit_candidates(pathway, best_rank, old_stack, year):
+    """
+    Get the transitions ranked at least as well as the best rank that only retrofits
+    can make valid or invalid, from the candidates of the last resource constraints
+    """
+    df = pathway.resource_constraints.df_candidates
+    df = df[
+        (df["rank"] <= best_rank)
+        & ~df.origin.isin(METHANOL_DEMAND_TECH)
+        & ~df.destination.isin(METHANOL_DEMAND_TECH)
+    ]
+    df = remove_new_plants(
+        df_valid=df,
+        stack=old_stack,
+        year=year,
+        minimum_age=pathway.config.MINIMUM_AGE_DECOMMISSION,
+    )
+    return df.to_dict(orient="records")
+
+
+def _get_origin_stack(stack, chemical, config: RunConfig):
+    """Stack of the plants that can be retrofitted"""
+    if chemical in config.AGE_DEPENDENCY and config.MODEL_SCOPE == "World":
+        return stack.get_new_plant_stack()
+    return stack
+
+
+def _retrofit_plants(pathway, transitions, new_plants, new_stack, chemical, year):
+    """
+    Replace a plant of each transition's origin by the transition's new plant at once,
+    with one update of the resources used for the whole batch
+
+    Returns:
+        The volume of the chemical of each plant replaced
+    """
+    # When the tech to be removed is not in the plant stack, pass
+    origin_plants = {}
+    remove_plants = []
+    for transition in transitions:
+        key = (transition["region"], transition["origin"], transition["chemical"])
+        if key not in origin_plants:
+            origin_plants[key] = iter(
+                new_stack.filter_plants(
+                    region=transition["region"],
+                    technology=transition["origin"],
+                    chemical=transition["chemical"],
+                )
+            )
+        remove_plants.append(next(origin_plants[key]))
+
+    new_stack.remove_many(remove_plants)
+    new_stack.extend(new_plants)
+    pathway.update_availability_from_plants(
+        year=year, added=new_plants, removed=remove_plants
+    )
+    for best_transition, new_plant, remove_plant in zip(
+        transitions, new_plants, remove_plants
+    ):
+        _log_retrofit(best_transition, new_plant, pathway, remove_plant, year)
+
+    return [
+        remove_plant.get_yearly_volume(chemical=chemical)
+        for remove_plant in remove_plants
+    ]
+
+
 def _log_retrofit(best_transition, new_plant, pathway, remove_plant, year):
     if best_transition["retrofit_type"] == "normal":
         pathway.transitions.add(
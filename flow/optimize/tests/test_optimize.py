@@ -0,0 +1,429 @@
+import random
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import flow.optimize.branch as branch_module
+import flow.optimize.optimize as optimize_module
+from flow.optimize.constraints import get_invalid_ramp_rates
+from models.availability import AvailabilityLedger
+from models.decarbonization import DecarbonizationPathway
+from models.plant import Plant, PlantStack, make_capacity_index
+from models.run_config import RunConfig
+from models.transition import TransitionRegistry
+from models.year_table import YearTable
+
+YEAR = 2030
+CHEMICALS = ["Ammonia", "Ethylene", "Benzene"]
+NEW_TECH = {
+    "Ammonia": "Electrolyser + Haber-Bosch",
+    "Ethylene": "Naphtha steam cracking + CCS",
+    "Benzene": "Bio-oil refinery",
+}
+# Plants of every chemical per region at the start; Europe is just below the cap
+PLANTS_PER_REGION = {"Africa": 30, "Europe": 20, "China": 10, "India": 10}
+
+
+def _make_plant(chemical, technology, region, plant_capacities, **kwargs):
+    spec = dict(
+        origin="Non-existent",
+        start_year=2020,
+        capacity_factor=1,
+        biomass_yearly=0,
+        bio_oils_yearly=0,
+        pyrolysis_oil_yearly=0,
+        waste_water_yearly=0,
+        municipal_solid_waste_rdf_yearly=0,
+        methanol_black_yearly=0,
+        methanol_green_yearly=0,
+        ccs_total=0,
+        ccs_yearly=0,
+        plant_lifetime=30,
+        retrofit=False,
+        plant_status="new",
+    )
+    spec.update(kwargs)
+    return Plant(
+        chemical=chemical,
+        technology=technology,
+        region=region,
+        plant_capacities=plant_capacities,
+        **spec,
+    )
+
+
+def _make_pathway(chemical_workers):
+    plant_capacities = make_capacity_index(
+        pd.DataFrame(
+            [
+                (chemical, technology, region, 10)
+                for chemical in CHEMICALS
+                for technology in [f"{chemical} - Unabated", NEW_TECH[chemical]]
+                for region in PLANTS_PER_REGION
+            ],
+            columns=["chemical", "technology", "region", "assumed_plant_capacity"],
+        )
+    )
+    stack = PlantStack(
+        plants=[
+            _make_plant(
+                chemical, f"{chemical} - Unabated", region, plant_capacities
+            )
+            for chemical in CHEMICALS
+            for region, n_plants in PLANTS_PER_REGION.items()
+            for _ in range(n_plants)
+        ],
+        year=YEAR,
+    )
+
+    df_availability = pd.DataFrame(
+        [("Biomass", region, 100.0, "t", YEAR) for region in PLANTS_PER_REGION],
+        columns=["name", "region", "cap", "unit", "year"],
+    )
+    df_availability["used"] = 0
+    for chemical in CHEMICALS:
+        df_availability[f"{chemical}_cap"] = df_availability.cap / len(CHEMICALS)
+        df_availability[f"{chemical}_used"] = 0
+
+    stacks = {YEAR: stack, YEAR + 1: stack.copy(year=YEAR + 1)}
+    return SimpleNamespace(
+        config=RunConfig(
+            MODEL_SCOPE="World",
+            REGIONAL_CAP=0.3,
+            MAX_PLANTS_RAMP_UP=3,
+            CHEMICAL_WORKERS=chemical_workers,
+            RANDOM_SEED=1,
+        ),
+        chemicals=CHEMICALS,
+        get_stack=stacks.__getitem__,
+        get_independent_chemicals=lambda: [[chemical] for chemical in CHEMICALS],
+        constraint_share={chemical: 1 / len(CHEMICALS) for chemical in CHEMICALS},
+        plant_capacities=plant_capacities,
+        availability=AvailabilityLedger(
+            df_availability=df_availability, chemicals=CHEMICALS
+        ),
+        transitions=SimpleNamespace(transitions=[]),
+    )
+
+
+def _build_new(pathway, year, chemical):
+    """
+    Build plants of the chemical's new tech in the region with the largest share
+    below the regional cap, until the tech reaches its ramp up rate
+    """
+    # Workers finish in another order every time
+    time.sleep(random.SystemRandom().random() / 10)
+
+    old_stack = pathway.get_stack(year)
+    new_stack = pathway.get_stack(year + 1)
+    while True:
+        df_regions = new_stack.get_regional_contribution().merge(
+            new_stack.get_regions_below_cap(regional_cap=pathway.config.REGIONAL_CAP)
+        )
+        if df_regions.empty:
+            return pathway
+        df_regions = df_regions.sample(frac=1, random_state=np.random.randint(1000))
+        region = df_regions.sort_values("proportion", kind="stable").region.iloc[-1]
+
+        plant = _make_plant(
+            chemical, NEW_TECH[chemical], region, pathway.plant_capacities
+        )
+        new_stack.append(plant)
+        if not get_invalid_ramp_rates(
+            old_stack=old_stack, new_stack=new_stack, config=pathway.config
+        ).empty:
+            new_stack.remove(plant)
+            return pathway
+        pathway.transitions.transitions.append({"chemical": chemical, "region": region})
+
+
+def _optimize(monkeypatch, chemical_workers):
+    pathway = _make_pathway(chemical_workers=chemical_workers)
+    monkeypatch.setattr(optimize_module, "optimize_chemical", _build_new)
+    return optimize_module.optimize_in_parallel(pathway=pathway, year=YEAR)
+
+
+@pytest.mark.skipif(
+    "fork" not in optimize_module.mp.get_all_start_methods(),
+    reason="Workers can't be forked",
+)
+def test_optimize_in_parallel(monkeypatch):
+    """
+    The result should not depend on the workers, and the groups together should keep
+    to the regional cap and the ramp up rates
+    """
+    pathway = _optimize(monkeypatch, chemical_workers=1)
+    for _ in range(2):
+        other_pathway = _optimize(monkeypatch, chemical_workers=len(CHEMICALS))
+        assert [
+            (plant.chemical, plant.technology, plant.region)
+            for plant in other_pathway.get_stack(YEAR + 1).plants
+        ] == [
+            (plant.chemical, plant.technology, plant.region)
+            for plant in pathway.get_stack(YEAR + 1).plants
+        ]
+        assert other_pathway.transitions.transitions == pathway.transitions.transitions
+
+    old_stack = pathway.get_stack(YEAR)
+    new_stack = pathway.get_stack(YEAR + 1)
+    new_plants = new_stack.plants[len(old_stack.plants) :]
+    assert len(new_plants) == 3 * len(CHEMICALS)
+    assert get_invalid_ramp_rates(
+        old_stack=old_stack, new_stack=new_stack, config=pathway.config
+    ).empty
+
+    # Every group could build in Europe on its own, but not all of them together
+    df_regions = new_stack.get_regional_contribution().set_index("region")
+    for region in {plant.region for plant in new_plants}:
+        assert df_regions.proportion[region] <= pathway.config.REGIONAL_CAP
+    assert "Europe" in {plant.region for plant in new_plants}
+
+
+def _make_decarbonization_pathway(export_dir=None, start_year=2020, end_year=2026):
+    """Pathway of synthetic data, made without reading the intermediate data"""
+    years = range(start_year, end_year + 1)
+    pathway = DecarbonizationPathway.__new__(DecarbonizationPathway)
+    pathway.pathway_name = "me"
+    pathway.sensitivity = "def"
+    pathway.model_scope = "World"
+    pathway.chemicals = CHEMICALS
+    pathway.start_year = start_year
+    pathway.end_year = end_year
+    pathway.config = RunConfig(PARALLEL_CHEMICALS=False, NO_FOSSIL_FROM_YEAR=2050)
+    pathway.importer = SimpleNamespace(export_dir=export_dir, config=pathway.config)
+    pathway.plant_capacities = make_capacity_index(
+        pd.DataFrame(
+            [
+                (chemical, technology, region, 10)
+                for chemical in CHEMICALS
+                for technology in [f"{chemical} - Unabated"]
+                + [f"{chemical} {year}" for year in years]
+                for region in PLANTS_PER_REGION
+            ],
+            columns=["chemical", "technology", "region", "assumed_plant_capacity"],
+        )
+    )
+    pathway.stacks = {
+        start_year: PlantStack(
+            plants=[
+                _make_plant(
+                    chemical,
+                    f"{chemical} - Unabated",
+                    region,
+                    pathway.plant_capacities,
+                    start_year=1990 + i,
+                )
+                for chemical in CHEMICALS
+                for region in PLANTS_PER_REGION
+                for i in range(5)
+            ],
+            year=start_year,
+        )
+    }
+
+    resources = [("Biomass", region, 100.0) for region in PLANTS_PER_REGION] + [
+        (name, "World", np.nan) for name in ["Methanol - Black", "Methanol - Green"]
+    ]
+    df_availability = pd.DataFrame(
+        [
+            (name, region, cap, "t", year)
+            for year in years
+            for name, region, cap in resources
+        ],
+        columns=["name", "region", "cap", "unit", "year"],
+    )
+    df_availability["used"] = 0
+    for chemical in CHEMICALS:
+        df_availability[f"{chemical}_cap"] = df_availability.cap / len(CHEMICALS)
+        df_availability[f"{chemical}_used"] = np.where(
+            df_availability.region == "World", np.nan, 0
+        )
+    pathway.availability = AvailabilityLedger(
+        df_availability=df_availability, chemicals=CHEMICALS
+    )
+
+    pathway.demand = YearTable(
+        pd.DataFrame(
+            [
+                (chemical, year, 1.0)
+                for chemical in CHEMICALS + ["Methanol"]
+                for year in years
+            ],
+            columns=["chemical", "year", "demand"],
+        ),
+        key="chemical",
+        value="demand",
+    )
+    pathway.mtx_intensities = {year: [] for year in years}
+    pathway.rankings = {
+        chemical: {
+            rank_type: {} for rank_type in ["new_build", "retrofit", "decommission"]
+        }
+        for chemical in CHEMICALS
+    }
+    pathway.updated_rankings = set()
+    pathway.cost = pd.DataFrame(columns=["year", "technology", "chemical", "lcox"])
+    pathway.cost_updates = []
+    pathway.transitions = TransitionRegistry()
+    pathway.resource_constraints = None
+    return pathway
+
+
+def _optimize_chemical(pathway, year, chemical):
+    """
+    Decommission the oldest plant of a random region or not, and build a plant of the
+    year's tech there (two from NO_FOSSIL_FROM_YEAR), updating the ranking and cost of
+    the next year
+    """
+    stack = pathway.get_stack(year + 1)
+    region = list(PLANTS_PER_REGION)[np.random.randint(len(PLANTS_PER_REGION))]
+    plant = stack.get_oldest_plant(
+        chemical=chemical, technology=f"{chemical} - Unabated", region=region
+    )
+    if plant is not None and random.random() < 0.5:
+        stack.remove(plant)
+        pathway.update_availability(plant=plant, year=year, remove=True)
+        pathway.transitions.add(year=year, transition_type="decommission", origin=plant)
+
+    for _ in range(1 + (year >= pathway.config.NO_FOSSIL_FROM_YEAR)):
+        plant = _make_plant(
+            chemical,
+            f"{chemical} {year}",
+            region,
+            pathway.plant_capacities,
+            start_year=year,
+            biomass_yearly=1,
+        )
+        stack.append(plant)
+        pathway.update_availability(plant=plant, year=year)
+        pathway.transitions.add(
+            year=year, transition_type="new_build", destination=plant
+        )
+
+    pathway.update_ranking(
+        df_rank=pd.DataFrame({"rank": np.random.rand(2)}),
+        chemical=chemical,
+        year=year + 1,
+        rank_type="new_build",
+    )
+    pathway.update_cost(
+        year=year,
+        df_tco=pd.DataFrame(
+            {
+                "year": [year + 1],
+                "technology": ["MTO - Black"],
+                "chemical": [chemical],
+                "lcox": [random.random()],
+            }
+        ),
+    )
+    return pathway
+
+
+def test_resume_from_checkpoint(tmp_path, monkeypatch):
+    """Resuming a fresh pathway from a checkpoint should give the same pathway"""
+    monkeypatch.setattr(optimize_module, "optimize_chemical", _optimize_chemical)
+    random.seed(1)
+    np.random.seed(1)
+    pathway = optimize_module.optimize(
+        pathway=_make_decarbonization_pathway(), checkpoint_dir=tmp_path
+    )
+
+    # Other random states and plant identifiers, that the checkpoint should restore
+    random.seed(2)
+    np.random.seed(2)
+    resumed = _make_decarbonization_pathway()
+    first_year = resumed.load_checkpoint(path=tmp_path.joinpath("2022.pkl.gz")) + 1
+    resumed = optimize_module.optimize(pathway=resumed, first_year=first_year)
+
+    assert resumed.stacks.keys() == pathway.stacks.keys()
+    for year, stack in pathway.stacks.items():
+        other_stack = resumed.get_stack(year)
+        assert [
+            (plant.uuid, plant.technology, plant.region, plant.plant_status)
+            for plant in other_stack.plants
+        ] == [
+            (plant.uuid, plant.technology, plant.region, plant.plant_status)
+            for plant in stack.plants
+        ]
+        for totals, other_totals in zip(
+            stack.get_tech_totals(), other_stack.get_tech_totals()
+        ):
+            np.testing.assert_array_equal(totals, other_totals)
+        pd.testing.assert_frame_equal(
+            other_stack.get_regional_contribution(), stack.get_regional_contribution()
+        )
+    assert resumed.transitions.transitions == pathway.transitions.transitions
+    pd.testing.assert_frame_equal(
+        resumed.availability.to_dataframe(), pathway.availability.to_dataframe()
+    )
+    pd.testing.assert_frame_equal(
+        resumed.demand.to_dataframe(), pathway.demand.to_dataframe()
+    )
+    assert resumed.updated_rankings == pathway.updated_rankings
+    for chemical, rank_type, year in pathway.updated_rankings:
+        pd.testing.assert_frame_equal(
+            resumed.get_ranking(chemical=chemical, year=year, rank_type=rank_type),
+            pathway.get_ranking(chemical=chemical, year=year, rank_type=rank_type),
+        )
+    pd.testing.assert_frame_equal(resumed.cost, pathway.cost)
+
+
+def _get_plants(pathway, year):
+    return [
+        (plant.uuid, plant.technology, plant.region, plant.plant_status)
+        for plant in pathway.get_stack(year).plants
+    ]
+
+
+def test_run_branch(tmp_path, monkeypatch):
+    """
+    Branches from a checkpoint should only differ from the pathway after it, and not
+    from the changes of another branch
+    """
+    monkeypatch.setattr(optimize_module, "optimize_chemical", _optimize_chemical)
+    random.seed(1)
+    np.random.seed(1)
+    pathway = optimize_module.optimize(
+        pathway=_make_decarbonization_pathway(export_dir=tmp_path),
+        checkpoint_dir=tmp_path.joinpath("checkpoints"),
+    )
+
+    branches = {}
+    monkeypatch.setattr(
+        branch_module,
+        "DecarbonizationPathway",
+        lambda **kwargs: _make_decarbonization_pathway(export_dir=tmp_path),
+    )
+    monkeypatch.setattr(
+        branch_module,
+        "save_pathway",
+        lambda branch: branches.setdefault(branch.importer.export_dir.name, branch),
+    )
+    run = ("me", "def", CHEMICALS, "World", 2022, pathway.config)
+    branch_module.run_branch("earlier_ban", {"NO_FOSSIL_FROM_YEAR": 2024}, *run)
+    branch_module.run_branch("same", {}, *run)
+
+    same, earlier_ban = branches["same"], branches["earlier_ban"]
+    assert same is not earlier_ban
+    for year in pathway.stacks:
+        assert _get_plants(same, year) == _get_plants(pathway, year)
+        if year <= 2024:
+            assert _get_plants(earlier_ban, year) == _get_plants(pathway, year)
+    assert _get_plants(earlier_ban, 2025) != _get_plants(pathway, 2025)
+    assert same.transitions.transitions == pathway.transitions.transitions
+    pd.testing.assert_frame_equal(
+        same.availability.to_dataframe(), pathway.availability.to_dataframe()
+    )
+
+    with pytest.raises(ValueError):
+        branch_module.branch_pathway(
+            *run[:4],
+            config=pathway.config,
+            branches={"bins": {"NUMBER_OF_BINS_RANKING": 3}},
+            year=2022,
+            fixed_constants=["NUMBER_OF_BINS_RANKING"],
+        )
@@ -1,19 +1,19 @@
+import numpy as np
 import pandas as pd
 
-from config import METHANOL_DEMAND_TECH, MINIMUM_AGE_DECOMMISSION
+from config import METHANOL_DEMAND_TECH
 from models.plant import PlantStack
+from models.tech_eligibility import TechEligibility
 
 
-def filter_out_fossil(df_rank: pd.DataFrame, df_tech: pd.DataFrame) -> pd.DataFrame:
-    df_non_fossil = df_tech.loc[
-        ~df_tech.category_detailed.str.contains("Fossil"), ["chemical", "technology"]
+def filter_out_fossil(
+    df_rank: pd.DataFrame, eligibility: TechEligibility
+) -> pd.DataFrame:
+    return df_rank[
+        eligibility.is_non_fossil(
+            chemicals=df_rank["chemical"], technologies=df_rank["destination"]
+        )
     ]
-    return df_rank.merge(
-        df_non_fossil,
-        left_on=["chemical", "destination"],
-        right_on=["chemical", "technology"],
-        how="inner",
-    )
 
 
 def filter_existing_tech(
@@ -35,49 +35,37 @@ def filter_existing_tech(
     return df_rank
 
 
-def keep_only_initial_tech(df_rank: pd.DataFrame, df_tech: pd.DataFrame):
-    df_initial = df_tech.loc[
-        df_tech.type_of_tech == "Initial", ["chemical", "technology"]
+def keep_only_initial_tech(df_rank: pd.DataFrame, eligibility: TechEligibility):
+    return df_rank[
+        eligibility.is_initial(
+            chemicals=df_rank["chemical"], technologies=df_rank["destination"]
+        )
     ]
-    return df_rank.merge(
-        df_initial,
-        left_on=["chemical", "destination"],
-        right_on=["chemical", "technology"],
-        how="inner",
-    )
 
 
-def remove_new_plants(df_valid: pd.DataFrame, stack: PlantStack, year: int):
+def remove_new_plants(
+    df_valid: pd.DataFrame, stack: PlantStack, year: int, minimum_age: int
+):
     """
     Remove retrofit options that
-    - Involve plants that are too new
+    - Involve plants that are too new (younger than minimum_age)
     - Are decommission + new build
     - Don't remove initial tech
     """
 
-    # Get plant age by chemical/region/tech
-    df_plants = pd.DataFrame(
-        [
-            {
-                "chemical": plant.chemical,
-                "region": plant.region,
-                "origin": plant.technology,
-                "age": plant.get_age(year=year),
-            }
-            for plant in stack.plants
-        ]
-    )
-
-    df_valid = df_valid.merge(
-        df_plants.drop_duplicates(["chemical", "region", "origin"]),
-        on=["chemical", "region", "origin"],
+    # Get plant age by chemical/region/tech, and only keep tech that has plants
+    age = year - stack.get_first_start_years(
+        chemicals=df_valid["chemical"],
+        regions=df_valid["region"],
+        technologies=df_valid["origin"],
     )
+    df_valid = df_valid[~np.isnan(age)].assign(age=age[~np.isnan(age)])
 
     # Remove transitions that are decommission + new build, don't remove initial tech and involve new plants
     invalid_transition_idx = (
         (df_valid.retrofit_type == "decommission_new_build")
         & (df_valid.type_of_tech_origin != "Initial")
-        & (df_valid.age < MINIMUM_AGE_DECOMMISSION)
+        & (df_valid.age < minimum_age)
     )
 
     return df_valid[~invalid_transition_idx]
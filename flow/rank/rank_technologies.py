@@ -3,9 +3,9 @@ import logging
 import numpy as np
 import pandas as pd
 
-from config import (INITIAL_TECH_ALLOWED_UNTIL_YEAR, LOG_LEVEL,
-                    NUMBER_OF_BINS_RANKING)
+from config import LOG_LEVEL
 from flow.import_data.intermediate_data import IntermediateDataImporter
+from models.run_config import RunConfig
 from util.util import flatten_columns
 
 logger = logging.getLogger(__name__)
@@ -142,7 +142,7 @@ def get_rank_config(rank_type: str, pathway: str):
     return config[rank_type][pathway]
 
 
-def bin_ranking(rank_array: np.array, n_bins: int = NUMBER_OF_BINS_RANKING) -> np.array:
+def bin_ranking(rank_array: np.array, n_bins: int) -> np.array:
     """
     Bin the ranking, i.e. values that are close together end up in the same bin
 
@@ -157,9 +157,7 @@ def bin_ranking(rank_array: np.array, n_bins: int = NUMBER_OF_BINS_RANKING) -> n
     return np.digitize(rank_array, bins=bins)
 
 
-def _add_binned_rankings(
-    df_rank: pd.DataFrame, n_bins: int = NUMBER_OF_BINS_RANKING
-) -> pd.DataFrame:
+def _add_binned_rankings(df_rank: pd.DataFrame, n_bins: int) -> pd.DataFrame:
     """Add binned values for the possible ranking columns"""
     for rank_var in [
         "emissions_scope_1_2_delta",
@@ -177,6 +175,7 @@ def rank_per_year(
     rank_type: str,
     pathway: str,
     initial_tech_allowed_until_year: int,
+    n_bins: int,
     year: int = None,
 ) -> pd.DataFrame:
     """
@@ -186,8 +185,9 @@ def rank_per_year(
         df_rank: Dataframe with technologies for ranking
         rank_type: 'decommission', 'new_build' or 'decommission'
         pathway: pathway name
-        year: for this year (else infer this from the dataframe)
         initial_tech_allowed_until_year: self explanatory
+        n_bins: number of bins of each variable
+        year: for this year (else infer this from the dataframe)
 
     Returns:
         Dataframe with ranked technologies for this year
@@ -213,7 +213,9 @@ def rank_per_year(
     #  If maximum -> rank descending (low cost = high rank = bad)
     ascending = [l == "min" for l in list(config.values())]
 
-    df_rank = df_rank.groupby(["chemical", "year"]).apply(_add_binned_rankings)
+    df_rank = df_rank.groupby(["chemical", "year"]).apply(
+        _add_binned_rankings, n_bins=n_bins
+    )
 
     df_rank = df_rank.sort_values(vars, ascending=ascending).copy()
 
@@ -405,6 +407,7 @@ def rank_tech(
     df_emissions: pd.DataFrame,
     rank_type: str,
     pathway: str,
+    config: RunConfig,
     year: int = None,
 ) -> pd.DataFrame:
     """
@@ -417,6 +420,7 @@ def rank_tech(
         df_cost: Dataframe with TCO and emissions per technology
         rank_type: type of ranking; can be new_build, decommission or retrofit
         pathway: pathway name
+        config: Config of the run
         year: optional, rank only for this year
     Returns:
         Dataframe with ranking
@@ -449,7 +453,8 @@ def rank_tech(
             df_rank=df_rank.query(f"year == {year}"),
             rank_type=rank_type,
             pathway=pathway,
-            initial_tech_allowed_until_year=INITIAL_TECH_ALLOWED_UNTIL_YEAR,
+            initial_tech_allowed_until_year=config.INITIAL_TECH_ALLOWED_UNTIL_YEAR,
+            n_bins=config.NUMBER_OF_BINS_RANKING,
         )
     else:
         # All years (for initial ranking)
@@ -459,7 +464,8 @@ def rank_tech(
             rank_per_year,
             rank_type=rank_type,
             pathway=pathway,
-            initial_tech_allowed_until_year=INITIAL_TECH_ALLOWED_UNTIL_YEAR,
+            initial_tech_allowed_until_year=config.INITIAL_TECH_ALLOWED_UNTIL_YEAR,
+            n_bins=config.NUMBER_OF_BINS_RANKING,
         )
 
     return df_rank.set_index(["chemical", "origin", "destination", "region", "year"])
@@ -469,8 +475,10 @@ def _add_tech_types(
     df_tech_transitions: pd.DataFrame, df_tech: pd.DataFrame, rank_type: str
 ) -> pd.DataFrame:
     """Add the tech types (origin and destination) to the tech transitions data"""
-    df_tech.type_of_tech = df_tech.type_of_tech.replace(
-        {"Initial": 1, "Transition": 2, "End-state": 3}
+    df_tech = df_tech.assign(
+        type_of_tech=df_tech.type_of_tech.replace(
+            {"Initial": 1, "Transition": 2, "End-state": 3}
+        )
     )
 
     def _get_df_tech(endpoint):
@@ -490,7 +498,7 @@ def _add_tech_types(
     return df_tech_transitions
 
 
-def make_rankings(pathway, sensitivity, chemicals, model_scope):
+def make_rankings(pathway, sensitivity, chemicals, model_scope, config=None):
     """
     Make rankings for new builds, retrofits and decommission.
 
@@ -503,6 +511,7 @@ def make_rankings(pathway, sensitivity, chemicals, model_scope):
         sensitivity=sensitivity,
         chemicals=chemicals,
         model_scope=model_scope,
+        config=config,
     )
 
     df_tech_transitions = importer.get_tech_transitions()
@@ -518,6 +527,7 @@ def make_rankings(pathway, sensitivity, chemicals, model_scope):
             df_emissions=df_emissions,
             rank_type=rank_type,
             pathway=pathway,
+            config=importer.config,
         )
 
         # Export for each chemical
@@ -1,6 +1,9 @@
 import pandas as pd
 
 from flow.rank.rank_technologies import bin_ranking, rank_per_year
+from models.run_config import RunConfig
+
+N_BINS = RunConfig().NUMBER_OF_BINS_RANKING
 
 
 def _make_options_df(options: list[tuple], binned=True):
@@ -53,6 +56,7 @@ def _test_rank_template(
         pathway=pathway,
         year=year or 2030,
         initial_tech_allowed_until_year=2025,
+        n_bins=N_BINS,
     )
     results = df.loc[df_rank["rank"] == df_rank["rank"].min(), "destination"].values
     if get_one:
@@ -430,7 +434,9 @@ def test_bin_ranking():
     ]
     rank_var = "emissions_scope_1_2_delta"
     df_rank = _make_options_df(emissions_options, binned=False)
-    df_rank[rank_var + "_binned"] = bin_ranking(rank_array=df_rank[rank_var])
+    df_rank[rank_var + "_binned"] = bin_ranking(
+        rank_array=df_rank[rank_var], n_bins=N_BINS
+    )
 
     # Close numbers end up in the same bin
     assert (
@@ -1,7 +1,12 @@
 import itertools
+import json
 import logging
 import multiprocessing as mp
 import random
+import shutil
+import socket
+import sys
+from pathlib import Path
 
 import numpy as np
 
@@ -9,50 +14,235 @@ from config import (CHEMICALS, LOG_LEVEL, MODEL_SCOPE, PATHWAYS, RUN_PARALLEL,
                     SENSITIVITIES, run_config)
 from export.export_outputs import export_outputs
 from export.merge_outputs import merge_outputs
+from export.merge_sweep import merge_sweep, summarize_ensemble
 from flow.calculate.calculate_outputs import calculate_outputs
 from flow.calculate.calculate_variables import calculate_variables
 from flow.import_data.all import import_data
+from flow.import_data.intermediate_data import load_shared_data
+from flow.optimize.branch import branch_pathway
 from flow.optimize.optimize import optimize_pathway
 from flow.rank.rank_technologies import make_rankings
+from models.parameter_sweep import ParameterSweep
+from models.run_config import DEFAULT_CONSTANTS, RunConfig
+from models.run_scheduler import RunScheduler
+from models.stage_runner import Stage, StageRunner
+from models.work_queue import WorkQueue
 
 logger = logging.getLogger(__name__)
 logger.setLevel(LOG_LEVEL)
 
-np.random.seed(100)
-random.seed(100)
+# Constants added to config_template.py since the first version of the model, with the
+# value there if config.py does not have them yet
+_config = RunConfig()
+ENSEMBLE_PERCENTILES = _config.ENSEMBLE_PERCENTILES
+ENSEMBLE_SIZE = _config.ENSEMBLE_SIZE
+FORK_AFTER_LOAD = _config.FORK_AFTER_LOAD
+MAX_WORKERS = _config.MAX_WORKERS
+OUTPUT_DIR = _config.OUTPUT_DIR
+QUEUE_HEARTBEAT_SECONDS = _config.QUEUE_HEARTBEAT_SECONDS
+QUEUE_TIMEOUT_SECONDS = _config.QUEUE_TIMEOUT_SECONDS
+RANDOM_SEED = _config.RANDOM_SEED
+RUN_RETRIES = _config.RUN_RETRIES
+SKIP_UNCHANGED_STAGES = _config.SKIP_UNCHANGED_STAGES
+SWEEP_DESIGN = _config.SWEEP_DESIGN
+SWEEP_PARAMETERS = _config.SWEEP_PARAMETERS
+SWEEP_SAMPLES = _config.SWEEP_SAMPLES
+SWEEP_SEED = _config.SWEEP_SEED
+WORK_QUEUE = _config.WORK_QUEUE
 
+np.random.seed(RANDOM_SEED)
+random.seed(RANDOM_SEED)
 
-funcs = {
-    "IMPORT_DATA": import_data,
-    "CALCULATE_VARIABLES": calculate_variables,
-    "MAKE_RANKINGS": make_rankings,
-    "OPTIMIZE_PATHWAY": optimize_pathway,
-    "CALCULATE_OUTPUTS": calculate_outputs,
-    "EXPORT_OUTPUTS": export_outputs,
-}
+ROOT_PATH = Path(__file__).resolve().parent
 
 
-def _run_model(pathway, sensitivity):
-    for name, func in funcs.items():
-        if name in run_config:
+# Config constants that the optimizer depends on, also through the pathway it makes
+OPTIMIZE_CONFIG = [
+    "START_YEAR",
+    "END_YEAR",
+    "NO_FOSSIL_FROM_YEAR",
+    "CARBON_PRICE",
+    "RETROFIT_CAP",
+    "INITIAL_TECH_ALLOWED_UNTIL_YEAR",
+    "SECOND_RETROFIT_EARLIEST_YEAR",
+    "MINIMUM_AGE_DECOMMISSION",
+    "MAX_TECH_RAMP_RATE",
+    "REGIONAL_CAP",
+    "DISCOUNT_RATE",
+    "ECONOMIC_LIFETIME_YEARS",
+    "NUMBER_OF_BINS_RANKING",
+    "CARBON_PRICE_ADJUSTMENT",
+    "POWER_PRICE_ADJUSTMENT",
+    "CCS_PRICE_ADJUSTMENT",
+    "PLANT_SPEC_OVERRIDE",
+    "AGE_DEPENDENCY",
+    "MAX_PLANTS_RAMP_UP",
+    "BUILD_NEW_IN_BULK",
+    "RETROFIT_IN_BULK",
+    "PARALLEL_CHEMICALS",
+    "METHANOL_DEPENDENCY",
+    "METHANOL_AVAILABILITY_FACTOR",
+    "METHANOL_SUPPLY_TECH",
+    "METHANOL_DEMAND_TECH",
+    "METHANOL_TYPES",
+    "RANDOM_SEED",
+]
+
+RANKINGS = [
+    f"ranking/*/{rank_type}_rank.csv"
+    for rank_type in ["new_build", "retrofit", "decommission"]
+]
+PATHWAY_OUTPUTS = [
+    "final/*/technologies_over_time_region.csv",
+    "final/*/technologies_over_time_region_new.csv",
+    "final/All/transitions.csv",
+    "final/All/all_plants.csv",
+    "final/All/demand_output.csv",
+    "final/All/availability_output.csv",
+]
+
+
+def _branch_pathway(**kwargs):
+    """
+    Run the branches of a pathway, which can't change the config constants of the
+    sections before the pathway optimization
+    """
+    names = [stage.name for stage in stages]
+    fixed_constants = [
+        name
+        for stage in stages[: names.index("OPTIMIZE_PATHWAY")]
+        for name in stage.config
+    ]
+    return branch_pathway(fixed_constants=fixed_constants, **kwargs)
+
+
+# Sections of the model, in order, with the artifacts each one depends on and makes
+stages = [
+    Stage(
+        name="IMPORT_DATA",
+        func=import_data,
+        files=["data/Master template*.xlsx", "flow/import_data/*.py"],
+        config=["ECONOMIC_LIFETIME_YEARS", "PLANT_SPEC_OVERRIDE"],
+        outputs=[
+            "intermediate/technologies.csv",
+            "intermediate/technology_transitions.csv",
+            "intermediate/plant_specs.csv",
+        ],
+    ),
+    Stage(
+        name="CALCULATE_VARIABLES",
+        func=calculate_variables,
+        files=["flow/calculate/*.py", "flow/import_data/*.py"],
+        inputs=["intermediate/*.csv"],
+        config=[
+            "START_YEAR",
+            "END_YEAR",
+            "CARBON_PRICE",
+            "DISCOUNT_RATE",
+            "ECONOMIC_LIFETIME_YEARS",
+            "CARBON_PRICE_ADJUSTMENT",
+            "POWER_PRICE_ADJUSTMENT",
+            "CCS_PRICE_ADJUSTMENT",
+        ],
+        outputs=[
+            "intermediate/inputs_pivot.csv",
+            "intermediate/emissions.csv",
+            "intermediate/cost.csv",
+        ],
+    ),
+    Stage(
+        name="MAKE_RANKINGS",
+        func=make_rankings,
+        files=["flow/rank/*.py", "flow/import_data/*.py"],
+        inputs=[
+            "intermediate/technologies.csv",
+            "intermediate/technology_transitions.csv",
+            "intermediate/emissions.csv",
+            "intermediate/cost.csv",
+        ],
+        config=["INITIAL_TECH_ALLOWED_UNTIL_YEAR", "NUMBER_OF_BINS_RANKING"],
+        outputs=RANKINGS,
+    ),
+    Stage(
+        name="OPTIMIZE_PATHWAY",
+        func=optimize_pathway,
+        files=["flow/**/*.py", "models/*.py"],
+        inputs=["intermediate/*.csv"] + RANKINGS,
+        config=OPTIMIZE_CONFIG,
+        outputs=PATHWAY_OUTPUTS,
+    ),
+    Stage(
+        name="CALCULATE_OUTPUTS",
+        func=calculate_outputs,
+        files=["flow/calculate/*.py", "flow/import_data/*.py"],
+        inputs=["intermediate/*.csv"] + PATHWAY_OUTPUTS,
+        outputs=["final/All/lcox_start_year.csv"],
+    ),
+    Stage(
+        name="EXPORT_OUTPUTS",
+        func=export_outputs,
+        files=["export/export_outputs.py", "flow/**/*.py", "models/*.py"],
+        inputs=["intermediate/*.csv"] + RANKINGS + PATHWAY_OUTPUTS,
+        config=OPTIMIZE_CONFIG,
+        outputs=["final/All/emission_output.csv"],
+    ),
+    Stage(
+        name="BRANCH_PATHWAY",
+        func=_branch_pathway,
+        files=["flow/**/*.py", "models/*.py"],
+        inputs=["intermediate/*.csv", "checkpoints/*.pkl.gz"] + RANKINGS,
+        config=OPTIMIZE_CONFIG + ["BRANCHES", "BRANCH_FROM_YEAR"],
+        outputs=["branches/*/final/All/all_plants.csv"],
+    ),
+]
+
+
+def _get_output_dir(pathway, sensitivity, config: RunConfig):
+    return ROOT_PATH.joinpath(
+        config.OUTPUT_DIR, config.MODEL_SCOPE, pathway, sensitivity
+    )
+
+
+def _run_model(pathway, sensitivity, stage_names=None, config: RunConfig = None):
+    """
+    Run the sections of the model for a pathway and sensitivity
+
+    Args:
+        stage_names: Sections to run, defaults to run_config
+        config: Config of the run, defaults to config.py
+    """
+    config = config or RunConfig()
+    japan_chemicals = [
+        chemical
+        for chemical in config.CHEMICALS
+        if chemical
+        not in [
+            "Ammonia",
+            "Urea",
+            "Ammonium Nitrate",
+        ]
+    ]
+    runner = StageRunner(
+        output_dir=_get_output_dir(pathway, sensitivity, config),
+        skip_unchanged=SKIP_UNCHANGED_STAGES,
+        config=config,
+    )
+    for stage in stages:
+        if stage.name in (run_config if stage_names is None else stage_names):
             logger.info(
-                f"Running pathway {pathway} sensitivity {sensitivity} section {name}"
+                f"Running pathway {pathway} sensitivity {sensitivity} section "
+                f"{stage.name}"
             )
-            japan_chemicals = [
-                chemical
-                for chemical in CHEMICALS
-                if chemical
-                not in [
-                    "Ammonia",
-                    "Urea",
-                    "Ammonium Nitrate",
-                ]
-            ]
-            func(
+            runner.run(
+                stage,
                 pathway=pathway,
                 sensitivity=sensitivity,
-                chemicals=CHEMICALS if MODEL_SCOPE == "World" else japan_chemicals,
-                model_scope=MODEL_SCOPE,
+                chemicals=(
+                    config.CHEMICALS
+                    if config.MODEL_SCOPE == "World"
+                    else japan_chemicals
+                ),
+                model_scope=config.MODEL_SCOPE,
             )
 
 
@@ -63,28 +253,244 @@ def run_model_sequential(runs):
 
 
 def run_model_parallel(runs):
-    """Run model in parallel, faster but harder to debug"""
-    n_cores = mp.cpu_count()
-    logger.info(f"{n_cores} cores detected")
-    pool = mp.Pool(processes=n_cores)
+    """
+    Run model in parallel, faster but harder to debug
 
+    Returns:
+        Summary of each run, also exported to output/<model scope>/run_summary.json
+    """
     logger.info(f"Running model for scenario/sensitivity {runs}")
-    for pathway, sensitivity in runs:
-        pool.apply_async(_run_model, args=(pathway, sensitivity))
-    pool.close()
-    pool.join()
+    if FORK_AFTER_LOAD:
+        if mp.get_start_method() == "fork":
+            logger.info("Loading data shared by the runs")
+            load_shared_data(runs, chemicals=CHEMICALS, model_scope=MODEL_SCOPE)
+        else:
+            logger.warning("Workers are not forked, not loading shared data")
+
+    scheduler = RunScheduler(
+        func=_run_model, max_workers=MAX_WORKERS, retries=RUN_RETRIES
+    )
+    summary = scheduler.run(runs)
+    _export_summary(summary)
+    return summary
+
+
+def _get_work_queue():
+    return WorkQueue(
+        path=WORK_QUEUE,
+        retries=RUN_RETRIES,
+        heartbeat_interval=QUEUE_HEARTBEAT_SECONDS,
+        timeout=QUEUE_TIMEOUT_SECONDS,
+    )
+
+
+def _work_on_queue():
+    _get_work_queue().work(func=_run_model)
+
+
+def run_model_distributed(runs):
+    """
+    Add the runs to the work queue, and run queued runs on this host until all are done
+
+    The same command can be started on other hosts with access to the work queue and
+    output directory, to run the queued runs there too.
+
+    Returns:
+        Summary of each run in the queue, also exported to
+            output/<model scope>/run_summary.json
+    """
+    queue = _get_work_queue()
+    queue.enqueue(runs)
+
+    n_workers = MAX_WORKERS or mp.cpu_count()
+    logger.info(f"Running queued runs on {n_workers} workers")
+    RunScheduler(func=_work_on_queue, max_workers=n_workers).run([()] * n_workers)
+
+    summary = queue.summary()
+    _export_summary(summary)
+    return summary
+
+
+def _get_stage(name):
+    return next(stage for stage in stages if stage.name == name)
+
+
+def _split_stages(parameters):
+    """
+    Split the sections in run_config at the first one that depends on a parameter
+
+    Returns:
+        Names of the sections before it, that all runs of a sweep share, and of the
+            sections from it, that every run of the sweep runs itself
+    """
+    names = [stage.name for stage in stages if stage.name in run_config]
+    for i, name in enumerate(names):
+        if set(_get_stage(name).config) & set(parameters):
+            return names[:i], names[i:]
+    return names, []
+
+
+def _copy_shared_inputs(base_dir, output_dir, stage_names):
+    """
+    Copy the inputs of sections from the run they are shared by, except the outputs of
+    the sections themselves. Files are copied again only when the shared run changed them.
+    """
+    selected = [stage for stage in stages if stage.name in stage_names]
+    own_outputs = {
+        path
+        for stage in selected
+        for pattern in stage.outputs
+        for path in base_dir.glob(pattern)
+    }
+    for stage in selected:
+        for pattern in stage.inputs:
+            for path in base_dir.glob(pattern):
+                if path in own_outputs or not path.is_file():
+                    continue
+                copy_path = output_dir.joinpath(path.relative_to(base_dir))
+                if (
+                    copy_path.exists()
+                    and copy_path.stat().st_mtime_ns >= path.stat().st_mtime_ns
+                ):
+                    continue
+                copy_path.parent.mkdir(exist_ok=True, parents=True)
+                shutil.copy2(path, copy_path)
+
+
+def _run_sweep_point(pathway, sensitivity, name, point, stage_names):
+    """Run sections for one combination of parameter values, in its own directory"""
+    config = RunConfig(OUTPUT_DIR=str(Path(OUTPUT_DIR, "sweep", name)), **point)
+    _copy_shared_inputs(
+        base_dir=_get_output_dir(pathway, sensitivity, RunConfig()),
+        output_dir=_get_output_dir(pathway, sensitivity, config),
+        stage_names=stage_names,
+    )
+    _run_model(
+        pathway=pathway,
+        sensitivity=sensitivity,
+        stage_names=stage_names,
+        config=config,
+    )
+
+
+def run_sweep(runs):
+    """
+    Run the model for every combination of values in the parameter sweep (and every
+    seed of the ensemble), in parallel
+
+    The sections that no swept parameter affects run once per pathway and sensitivity,
+    all combinations continue from their outputs. The seed only affects the pathway
+    optimizer, so an ensemble runs the sections before it once. The outputs of each combination are
+    in output/sweep/<name>, with its parameter values in parameters.json.
+
+    Returns:
+        Points of the sweep by name, and the summary of each run
+    """
+    sweep = ParameterSweep(
+        parameters=SWEEP_PARAMETERS,
+        design=SWEEP_DESIGN,
+        samples=SWEEP_SAMPLES,
+        seed=SWEEP_SEED,
+        ensemble_size=ENSEMBLE_SIZE,
+        ensemble_seed=RANDOM_SEED,
+    )
+    points = {sweep.name(point): point for point in sweep.points()}
+    parameters = {name for point in points.values() for name in point}
+    shared, own = _split_stages(parameters)
+    logger.info(
+        f"Sweeping {sorted(parameters)} over {len(points)} combinations, "
+        f"sharing sections {shared}"
+    )
+    if not own:
+        logger.warning("None of the sections to run depends on the swept parameters")
+
+    summary = []
+    if shared:
+        summary += RunScheduler(
+            func=_run_model, max_workers=MAX_WORKERS, retries=RUN_RETRIES
+        ).run([(pathway, sensitivity, shared) for pathway, sensitivity in runs])
+        if any(result["status"] == "failed" for result in summary):
+            _export_summary(summary)
+            return points, summary
+
+    sweep_dir = ROOT_PATH.joinpath(OUTPUT_DIR, "sweep")
+    for name, point in points.items():
+        sweep_dir.joinpath(name).mkdir(exist_ok=True, parents=True)
+        with open(sweep_dir.joinpath(name, "parameters.json"), "w") as f:
+            json.dump(point, f, indent=2)
+
+    summary += RunScheduler(
+        func=_run_sweep_point, max_workers=MAX_WORKERS, retries=RUN_RETRIES
+    ).run(
+        [
+            (pathway, sensitivity, name, point, own)
+            for name, point in points.items()
+            for pathway, sensitivity in runs
+        ]
+    )
+    _export_summary(summary)
+    return points, summary
+
+
+def _export_summary(summary):
+    output_dir = ROOT_PATH.joinpath(OUTPUT_DIR, MODEL_SCOPE)
+    output_dir.mkdir(exist_ok=True, parents=True)
+    with open(output_dir.joinpath("run_summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+
+
+def _exit_if_failed(summary):
+    failed = [result["run"] for result in summary if result["status"] == "failed"]
+    if failed:
+        logger.error(f"Runs {failed} failed, not merging outputs")
+        sys.exit(1)
 
 
 def main():
+    if DEFAULT_CONSTANTS:
+        logger.warning(
+            f"config.py does not have {', '.join(DEFAULT_CONSTANTS)}, using the values "
+            "in config_template.py"
+        )
+
     runs = list(itertools.product(PATHWAYS, SENSITIVITIES))
-    if RUN_PARALLEL:
-        run_model_parallel(runs)
+    if SWEEP_PARAMETERS or ENSEMBLE_SIZE:
+        points, summary = run_sweep(runs)
+        _exit_if_failed(summary)
+        logger.info("Merge sweep outputs")
+        export_dir = ROOT_PATH.joinpath(OUTPUT_DIR, MODEL_SCOPE, "Aggregated")
+        tables = merge_sweep(
+            sweep_dir=ROOT_PATH.joinpath(OUTPUT_DIR, "sweep"),
+            points=points,
+            runs=runs,
+            model_scope=MODEL_SCOPE,
+            export_dir=export_dir,
+        )
+        if ENSEMBLE_SIZE:
+            logger.info("Summarize ensemble")
+            summarize_ensemble(
+                tables, percentiles=ENSEMBLE_PERCENTILES, export_dir=export_dir
+            )
+        return
+
+    if WORK_QUEUE is not None or RUN_PARALLEL:
+        if WORK_QUEUE is not None:
+            summary = run_model_distributed(runs)
+        else:
+            summary = run_model_parallel(runs)
+        _exit_if_failed(summary)
     else:
         run_model_sequential(runs)
 
-    if "MERGE_OUTPUTS" in run_config:
+    # With a work queue, only the first host to get here merges the outputs
+    if "MERGE_OUTPUTS" in run_config and (
+        WORK_QUEUE is None
+        or _get_work_queue().claim_event("MERGE_OUTPUTS", socket.gethostname())
+    ):
         logger.info("Merge outputs")
-        merge_outputs(model_scope=MODEL_SCOPE, chemicals=CHEMICALS)
+        merge_outputs(
+            model_scope=MODEL_SCOPE, chemicals=CHEMICALS, config=RunConfig()
+        )
 
 
 if __name__ == "__main__":
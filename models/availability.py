@@ -0,0 +1,310 @@
+import numpy as np
+import pandas as pd
+
+# Resources that are capped per region, with the plant attribute that holds its yearly use
+REGIONAL_RESOURCES = {
+    "Biomass": "biomass_yearly",
+    "CO2 storage": "ccs_yearly",
+    "Waste water": "waste_water_yearly",
+    "Pyrolysis oil": "pyrolysis_oil_yearly",
+    "Bio-oils": "bio_oils_yearly",
+    "Municipal solid waste RdF": "municipal_solid_waste_rdf_yearly",
+}
+
+# Resources that are capped globally (methanol availability follows the methanol stack)
+GLOBAL_RESOURCES = {
+    "Methanol - Black": "methanol_black_yearly",
+    "Methanol - Green": "methanol_green_yearly",
+}
+
+# For these resources, a chemical can only use its own share of the cap
+CHEMICAL_SHARE_RESOURCES = ["CO2 storage", "Biomass"]
+
+GLOBAL_REGION = "World"
+
+
+class AvailabilityLedger:
+    """
+    Dense ledger of resource availability, indexed by (resource, region, year)
+
+    Holds the cap and amount used of every resource in arrays, in total and per chemical,
+    so adding or removing a plant only touches the cells of that plant's region and year.
+    The ledger is created from, and exported to, the availability dataframe layout:
+    one row per resource/region/year with columns `cap`, `used`, `<chemical>_cap` and
+    `<chemical>_used`.
+    """
+
+    # Resources that a chemical can only use its own share of
+    share_resources = CHEMICAL_SHARE_RESOURCES
+
+    def __init__(self, df_availability: pd.DataFrame, chemicals: list, decimals=1):
+        self.chemicals = list(chemicals)
+        self.decimals = decimals
+
+        # Keep the identifying columns of every row, to export in the same layout
+        self._columns = list(df_availability.columns)
+        self._value_columns = ["cap", "used"] + [
+            f"{chemical}_{column}"
+            for chemical in self.chemicals
+            for column in ["cap", "used"]
+        ]
+        self._rows = df_availability.drop(columns=self._value_columns)
+
+        names = df_availability["name"].unique()
+        self.resources = list(REGIONAL_RESOURCES) + list(GLOBAL_RESOURCES)
+        self.resources += [name for name in names if name not in self.resources]
+        self.regions = list(df_availability["region"].unique())
+        self.start_year = int(df_availability["year"].min())
+        self.years = list(range(self.start_year, int(df_availability["year"].max()) + 1))
+
+        self._resource_index = {name: i for i, name in enumerate(self.resources)}
+        self._region_index = {region: i for i, region in enumerate(self.regions)}
+        self._chemical_index = {chemical: i for i, chemical in enumerate(self.chemicals)}
+
+        self._row_resource = df_availability["name"].map(self._resource_index).values
+        self._row_region = df_availability["region"].map(self._region_index).values
+        self._row_year = df_availability["year"].values.astype(int) - self.start_year
+        rows = (self._row_resource, self._row_region, self._row_year)
+
+        shape = (len(self.resources), len(self.regions), len(self.years))
+        self.exists = np.zeros(shape, dtype=bool)
+        self.exists[rows] = True
+
+        self.cap = np.full(shape, np.nan)
+        self.used = np.zeros(shape)
+        self.chemical_cap = np.full((len(self.chemicals),) + shape, np.nan)
+        self.chemical_used = np.full((len(self.chemicals),) + shape, np.nan)
+
+        self.cap[rows] = df_availability["cap"].values.astype(float)
+        self.used[rows] = df_availability["used"].values.astype(float)
+        for i, chemical in enumerate(self.chemicals):
+            self.chemical_cap[i][rows] = df_availability[f"{chemical}_cap"].values
+            self.chemical_used[i][rows] = df_availability[f"{chemical}_used"].values
+
+        self.cap = self.cap.round(self.decimals)
+        self.chemical_cap = self.chemical_cap.round(self.decimals)
+
+        self._n_regional = len(REGIONAL_RESOURCES)
+        self._global_slice = slice(
+            self._n_regional, self._n_regional + len(GLOBAL_RESOURCES)
+        )
+
+    def _year(self, year):
+        return year - self.start_year
+
+    def _has_year(self, year):
+        return 0 <= self._year(year) < len(self.years)
+
+    def update_from_plant(self, plant, year: int, remove: bool = False):
+        """
+        Update the amount used based on a plant that is added or removed
+
+        Args:
+            plant: The plant in consideration
+            year: Year the plant is added or removed
+            remove: The plant is removed
+        """
+        if remove:
+            return self.update_from_plants(year=year, removed=[plant])
+        return self.update_from_plants(year=year, added=[plant])
+
+    def update_from_plants(self, year: int, added=(), removed=()):
+        """
+        Update the amounts used based on plants that are added and removed at once
+
+        The use of the plants is summed per resource and region, and rounded once.
+
+        Args:
+            year: Year the plants are added or removed
+            added: Plants that are added
+            removed: Plants that are removed
+        """
+        y = self._year(year)
+        usage = np.zeros(self.used.shape[:2])
+        chemical_usage = np.zeros(self.chemical_used.shape[:3])
+        touched = np.zeros(usage.shape, dtype=bool)
+        chemical_touched = np.zeros(chemical_usage.shape, dtype=bool)
+        n = self._n_regional
+        g = self._region_index.get(GLOBAL_REGION)
+        for sign, plants in [(-1, removed), (1, added)]:
+            for plant in plants:
+                # Regional resources: update the total and the chemical's own use
+                r = self._region_index.get(plant.region)
+                if r is not None:
+                    use = sign * np.array(
+                        [
+                            getattr(plant, attribute)
+                            for attribute in REGIONAL_RESOURCES.values()
+                        ]
+                    )
+                    usage[:n, r] += use
+                    touched[:n, r] = True
+
+                    c = self._chemical_index.get(plant.chemical)
+                    if c is not None:
+                        chemical_usage[c, :n, r] += use
+                        chemical_touched[c, :n, r] = True
+
+                # Global resources (methanol) are only tracked in total
+                if g is not None:
+                    usage[self._global_slice, g] += sign * np.array(
+                        [
+                            getattr(plant, attribute)
+                            for attribute in GLOBAL_RESOURCES.values()
+                        ]
+                    )
+                    touched[self._global_slice, g] = True
+
+        used = self.used[..., y]
+        used[touched] = (used[touched] + usage[touched]).round(self.decimals)
+        chemical_used = self.chemical_used[..., y]
+        chemical_used[chemical_touched] = (
+            chemical_used[chemical_touched] + chemical_usage[chemical_touched]
+        ).round(self.decimals)
+        return self
+
+    def get_change_bound(self, regions: list, use: np.ndarray) -> np.ndarray:
+        """
+        Get the largest change of the remaining resources that adding or removing one
+        of a set of plants can make, including the rounding of the amounts used
+
+        Args:
+            regions: Region of each plant
+            use: Yearly use of each resource of each plant, in the order of the columns
+                of `get_remaining_array`
+
+        Returns:
+            Array indexed by region and resource, as from `get_remaining_array`
+        """
+        use = np.nan_to_num(np.abs(use)).reshape(len(regions), -1)
+        bound = np.zeros((len(self.regions), use.shape[1]))
+
+        # Regional resources change in the plant's region, global ones everywhere
+        n = self._n_regional
+        np.maximum.at(
+            bound[:, :n], [self._region_index[region] for region in regions], use[:, :n]
+        )
+        bound[:, n:] = use[:, n:].max(axis=0, initial=0)
+        return bound + np.where(bound > 0, 10.0**-self.decimals, 0)
+
+    def set_value(self, name, year, region=GLOBAL_REGION, cap=None, used=None):
+        """Overwrite the cap and/or amount used of a resource in a region and year"""
+        cell = (self._resource_index[name], self._region_index[region], self._year(year))
+        if cap is not None:
+            self.cap[cell] = round(cap, self.decimals)
+        if used is not None:
+            self.used[cell] = round(used, self.decimals)
+        return self
+
+    def set_partitioned(self, partitioned: bool):
+        """
+        Cap every regional resource on the chemicals' shares (partitioned), or only CO2
+        storage and biomass. With partitioned caps, what one chemical uses never changes
+        what another chemical can use in the same year.
+        """
+        self.share_resources = (
+            list(REGIONAL_RESOURCES) if partitioned else CHEMICAL_SHARE_RESOURCES
+        )
+        return self
+
+    def get_used(self, year) -> tuple:
+        """Copy of the amounts used in a year, in total and per chemical"""
+        y = self._year(year)
+        return self.used[:, :, y].copy(), self.chemical_used[..., y].copy()
+
+    def add_used(self, year, used: np.ndarray, chemical_used: np.ndarray):
+        """
+        Add to the amounts used in a year, e.g. the changes a worker process made to
+        its copy of the ledger
+
+        Args:
+            used: Amounts to add in total, as from `get_used`
+            chemical_used: Amounts to add per chemical, as from `get_used`
+        """
+        y = self._year(year)
+        self.used[:, :, y] = (self.used[:, :, y] + used).round(self.decimals)
+        self.chemical_used[..., y] = (self.chemical_used[..., y] + chemical_used).round(
+            self.decimals
+        )
+        return self
+
+    def copy_year(self, year):
+        """Copy the amounts used in a year to the next year"""
+        if self._has_year(year) and self._has_year(year + 1):
+            y = self._year(year)
+            self.used[:, :, y + 1] = self.used[:, :, y]
+            self.chemical_used[..., y + 1] = self.chemical_used[..., y]
+        return self
+
+    def get_remaining_array(self, year, chemical) -> np.ndarray:
+        """
+        Get the remaining amount of each resource that a chemical can use in a year
+
+        Resources that are capped per chemical (CO2 storage and biomass, or all regional
+        resources when partitioned) show the remainder of the chemical's share; global
+        resources show the same remainder in every region.
+
+        Returns:
+            Array indexed by region (as in `regions`) and resource (regional resources,
+            then global resources), NaN where a resource is not available
+        """
+        y = self._year(year)
+        exists = self.exists[:, :, y]
+
+        used = self.used[:, :, y].clip(min=0)
+        remaining = (self.cap[:, :, y] - used).clip(min=0)
+
+        c = self._chemical_index[chemical]
+        chemical_used = self.chemical_used[c, :, :, y].clip(min=0)
+        chemical_remaining = (self.chemical_cap[c, :, :, y] - chemical_used).clip(min=0)
+        for name in self.share_resources:
+            i = self._resource_index[name]
+            remaining[i] = chemical_remaining[i]
+
+        remaining = np.where(exists, remaining, np.nan)
+        remaining = remaining[: self._global_slice.stop].T
+
+        g = self._region_index.get(GLOBAL_REGION)
+        remaining[:, self._global_slice] = (
+            np.nan if g is None else remaining[g, self._global_slice].copy()
+        )
+        return remaining
+
+    def get_remaining(self, year, chemical):
+        """
+        Get the remaining amount of each resource that a chemical can use in a year
+
+        Returns:
+            Dataframe with regions as index and resources as columns
+        """
+        remaining = self.get_remaining_array(year=year, chemical=chemical)
+
+        # Regions that have any regional resource
+        regions = self.exists[: self._n_regional, :, self._year(year)].any(axis=0)
+        return pd.DataFrame(
+            remaining[regions],
+            index=pd.Index(np.array(self.regions, dtype=object)[regions], name="region"),
+            columns=list(REGIONAL_RESOURCES) + list(GLOBAL_RESOURCES),
+        )
+
+    def to_dataframe(self, year=None, name=None):
+        """Export the ledger in the availability dataframe layout"""
+        mask = np.ones(len(self._rows), dtype=bool)
+        if year is not None:
+            mask &= self._row_year == self._year(year)
+        if name is not None:
+            mask &= self._row_resource == self._resource_index.get(name, -1)
+
+        rows = (
+            self._row_resource[mask],
+            self._row_region[mask],
+            self._row_year[mask],
+        )
+        df = self._rows[mask].copy()
+        df["cap"] = self.cap[rows]
+        df["used"] = self.used[rows]
+        for i, chemical in enumerate(self.chemicals):
+            df[f"{chemical}_cap"] = self.chemical_cap[i][rows]
+            df[f"{chemical}_used"] = self.chemical_used[i][rows]
+
+        return df[self._columns]
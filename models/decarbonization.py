@@ -1,8 +1,12 @@
+import gzip
 import logging
 import math
+import pickle
 import random
 from collections import defaultdict
+from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import plotly.express as px
 from plotly.offline import plot
@@ -10,23 +14,31 @@ from plotly.subplots import make_subplots
 
 from config import (
     LOG_LEVEL,
-    METHANOL_AVAILABILITY_FACTOR,
     METHANOL_DEMAND_TECH,
     METHANOL_DEPENDENCY,
     METHANOL_SUPPLY_TECH,
     METHANOL_TYPES,
-    MODEL_SCOPE,
     PLANT_SPEC_OVERRIDE
 )
-from flow.calculate.calculate_availability import (
-    make_empty_methanol_availability,
-    update_availability_from_plant,
-)
+from flow.calculate.calculate_availability import make_empty_methanol_availability
 from flow.calculate.recalculate_variables import recalculate_variables
 from flow.import_data.intermediate_data import IntermediateDataImporter
 from flow.rank.rank_technologies import rank_tech
-from models.plant import PlantStack, create_plants
+from models.availability import AvailabilityLedger
+from models.plant import (
+    CHEMICAL_CODES,
+    REGION_CODES,
+    TECHNOLOGY_CODES,
+    PlantStack,
+    create_plants,
+    get_next_plant_id,
+    make_capacity_index,
+    set_next_plant_id,
+)
+from models.run_config import RunConfig
+from models.tech_eligibility import TechEligibility
 from models.transition import TransitionRegistry
+from models.year_table import YearTable
 from util.util import flatten_columns
 
 logger = logging.getLogger(__name__)
@@ -39,7 +51,14 @@ class DecarbonizationPathway:
     """Contains the current state of the decarbonization pathway, and methods to adjust that state"""
 
     def __init__(
-        self, chemicals, start_year, end_year, pathway_name, sensitivity, model_scope
+        self,
+        chemicals,
+        start_year,
+        end_year,
+        pathway_name,
+        sensitivity,
+        model_scope,
+        config: RunConfig = None,
     ):
         self.pathway_name = pathway_name
         self.sensitivity = sensitivity
@@ -47,26 +66,43 @@ class DecarbonizationPathway:
         self.start_year = start_year
         self.end_year = end_year
         self.model_scope = model_scope
+        self.config = config or RunConfig()
         self.importer = IntermediateDataImporter(
             pathway=pathway_name,
             sensitivity=sensitivity,
             chemicals=chemicals,
             model_scope=model_scope,
+            config=self.config,
         )
         logger.debug("Getting plant capacities")
         self.df_plant_capacities = self.importer.get_plant_capacities()
+        self.plant_capacities = make_capacity_index(self.df_plant_capacities)
 
         logger.debug("Getting multi product ratios")
         self.df_multi_product_ratio = self.importer.get_multi_product_ratio()
 
+        # Multi chemical total volume produced per MTX tech
+        self.mtx_totals = (
+            self.df_multi_product_ratio[
+                self.df_multi_product_ratio.technology.str.contains("MT")
+            ]
+            .drop_duplicates(["chemical", "technology"])
+            .groupby("technology")
+            .agg(total=("ratio", "sum"))
+        )
+        self.mtx_intensities = {}
+
         logger.debug("Making plant stacks")
         self.stacks = self.make_initial_plant_stack()
 
         logger.debug("Getting demand")
-        self.demand = self.importer.get_demand()
+        self.demand = YearTable(
+            self.importer.get_demand(), key="chemical", value="demand"
+        )
 
         logger.debug("Getting rankings")
         self.rankings = self._import_rankings()
+        self.updated_rankings = set()
 
         logger.debug("Getting emissions")
         self.emissions = self.importer.get_process_data(data_type="emissions")
@@ -77,8 +113,14 @@ class DecarbonizationPathway:
         logger.debug("Getting availability")
         self.availability = self._import_availability()
 
+        # Resource constraints of the last ranking that was checked
+        self.resource_constraints = None
+
         logger.debug("Getting tech")
         self.tech = self.importer.get_tech()
+        self.eligibility = TechEligibility(
+            df_tech=self.tech, df_multi_product_ratio=self.df_multi_product_ratio
+        )
 
         logger.debug("Getting inputs")
         self.inputs = self.importer.get_inputs()
@@ -88,18 +130,21 @@ class DecarbonizationPathway:
         self.cost = self.importer.get_process_data(data_type="cost")
         self.inputs_pivot = self.importer.get_process_data(data_type="inputs")
         self.plant_specs = self.importer.get_plant_specs()
+        self.cost_updates = []
         self.transitions = TransitionRegistry()
-        self.decommission_rates = self.importer.get_decommission_rates()
+        self.decommission_rates = YearTable(
+            self.importer.get_decommission_rates(),
+            key="technology",
+            value="decommission_rate",
+        )
 
     def get_year_earliest_force_decommission(self):
-        df = self.decommission_rates
-        return df.loc[df.decommission_rate > 0, "year"].min()
+        rates = self.decommission_rates
+        years = rates.years[(rates.values > 0).any(axis=0)]
+        return years.min() if len(years) else np.nan
 
     def get_decommission_rate(self, technology, year):
-        df = self.decommission_rates
-        return df.loc[
-            (df.technology == technology) & (df.year == year), "decommission_rate"
-        ].values[0]
+        return self.decommission_rates.get(technology, year)
 
     def get_shuffled_chemicals(self):
         chemicals = self.chemicals.copy()
@@ -111,13 +156,49 @@ class DecarbonizationPathway:
 
         return chemicals
 
+    def get_independent_chemicals(self) -> list:
+        """
+        Split the chemicals (except Methanol) into groups that do not depend on each
+        other within a year, with partitioned resource caps
+
+        Chemicals are in the same group when they share a technology (e.g. a steam
+        cracker that also produces the byproducts) or use the methanol of the stack.
+
+        Returns:
+            Groups of chemicals, in the order of the chemicals
+        """
+        chemicals = [chemical for chemical in self.chemicals if chemical != "Methanol"]
+        group = {chemical: {chemical} for chemical in chemicals}
+
+        def join(linked):
+            linked = [chemical for chemical in linked if chemical in group]
+            for chemical in linked[1:]:
+                joined = group[linked[0]] | group[chemical]
+                for member in joined:
+                    group[member] = joined
+
+        for df in [self.tech, self.df_plant_capacities]:
+            for _, df_technology in df.groupby("technology"):
+                join(list(df_technology.chemical.unique()))
+        df = self.df_multi_product_ratio
+        for primary_chemical, chemical in zip(df.primary_chemical, df.chemical):
+            join([primary_chemical, chemical])
+        join(METHANOL_DEPENDENCY)
+
+        groups = []
+        for chemical in chemicals:
+            members = [member for member in chemicals if member in group[chemical]]
+            if members not in groups:
+                groups.append(members)
+        return groups
+
     def save_transitions(self):
         df_transitions = self.transitions.to_dataframe().set_index("year")
         self.importer.export_data(
             df_transitions, export_dir="final/All", filename="transitions.csv"
         )
 
-    def _import_availability(self):
+    def _import_availability(self) -> AvailabilityLedger:
         """Import availabilities of biomass, waste, etc"""
         df_availability = self.importer.get_availabilities()
         df_availability = df_availability.rename(columns={"value": "cap"})
@@ -151,15 +232,18 @@ class DecarbonizationPathway:
                     ]
                 )
 
-        for plant in self.get_stack(self.start_year).plants:
-            df_availability = update_availability_from_plant(
-                df_availability=df_availability, plant=plant, year=self.start_year
-            )
-
         df_methanol = make_empty_methanol_availability()
 
         df_availability = pd.concat([df_availability, df_methanol])
-        return df_availability.query(f"year <= {self.end_year}")
+        availability = AvailabilityLedger(
+            df_availability=df_availability.query(f"year <= {self.end_year}"),
+            chemicals=self.chemicals,
+        )
+
+        for plant in self.get_stack(self.start_year).plants:
+            availability.update_from_plant(plant=plant, year=self.start_year)
+
+        return availability
 
     def update_methanol_availability_from_stack(self, year):
         """
@@ -168,7 +252,7 @@ class DecarbonizationPathway:
         Args:
             year: update the availability for this year
         """
-        df = self.availability
+        availability = self.availability
 
         # Calculate the total amount of methanol green and black
         caps = {}
@@ -177,10 +261,10 @@ class DecarbonizationPathway:
                 self.get_stack(year=year).get_yearly_volume(
                     chemical="Methanol", methanol_type=methanol_type
                 )
-                * METHANOL_AVAILABILITY_FACTOR
+                * self.config.METHANOL_AVAILABILITY_FACTOR
                 * 1e6
             )
-            df.loc[(df.name == methanol_type) & (df.year == year), "cap"] = cap
+            availability.set_value(name=methanol_type, year=year, cap=cap)
             caps[methanol_type] = cap
             logger.debug(f"{methanol_type} capacity: {cap}")
 
@@ -198,9 +282,11 @@ class DecarbonizationPathway:
 
             mtx_amount = self._get_mtx_demand(mtx_type=mtx_type, year=year)
 
-            df.loc[(df.name == methanol_type) & (df.year == year), "used"] = (
-                non_mtx_amount + mtx_amount
-            ) * 1e6
+            availability.set_value(
+                name=methanol_type,
+                year=year,
+                used=(non_mtx_amount + mtx_amount) * 1e6,
+            )
         return self
 
     def _import_rankings(self, japan_only=False):
@@ -211,7 +297,7 @@ class DecarbonizationPathway:
                 df_rank = self.importer.get_ranking(
                     rank_type=rank_type,
                     chemical=chemical,
-                    japan_only=(MODEL_SCOPE == "Japan"),
+                    japan_only=(self.config.MODEL_SCOPE == "Japan"),
                 )
 
                 rankings[chemical][rank_type] = {}
@@ -237,7 +323,7 @@ class DecarbonizationPathway:
                 )
 
     def save_demand(self):
-        df = self.demand
+        df = self.demand.to_dataframe()
         df = df[df.year <= self.end_year]
         df = df.pivot(index="chemical", columns="year", values="demand")
         self.importer.export_data(
@@ -247,7 +333,7 @@ class DecarbonizationPathway:
         )
 
     def save_availability(self):
-        df = self.availability
+        df = self.availability.to_dataframe()
         self.importer.export_data(
             df=df,
             filename="availability_output.csv",
@@ -294,8 +380,7 @@ class DecarbonizationPathway:
         Returns:
 
         """
-        df = self.demand
-        demand = df.loc[(df.chemical == chemical) & (df.year == year), "demand"].item()
+        demand = self.demand.get(chemical, year)
 
         # For Methanol, we have to take into account additional demand from MTO/MTP/MTA tech,
         if chemical == "Methanol" and mtx:
@@ -304,10 +389,7 @@ class DecarbonizationPathway:
             demand += mtx_demand
             logger.debug(f"Post-demand: {demand} & MTX-demand: {mtx_demand}")
             if build_new:
-                self.demand.loc[
-                    (self.demand.chemical == chemical) & (self.demand.year == year),
-                    "demand",
-                ] = demand
+                self.demand.set(chemical, year, demand)
 
         return demand
 
@@ -331,41 +413,54 @@ class DecarbonizationPathway:
         else:
             raise ValueError("Has to be 'Black', 'Green', 'both'")
 
-        # Get the capacity of MTO/MTP/MTA (Mton/annum)
-        df_mtx = flatten_columns(
-            self.stacks[year]
-            .aggregate_stack()
-            .query(f"technology.isin({methanol_tech})")
+        intensities = self._get_mtx_intensities(year=year)
+
+        # Get the volume of MTO/MTP/MTA (Mton/annum), kept up to date by the stack
+        volume = self.stacks[year].get_tech_region_volume()
+        return sum(
+            volume[technology_code, region_code] * intensity
+            for technology, technology_code, region_code, intensity in intensities
+            if technology in methanol_tech
         )
+
+    def _get_mtx_intensities(self, year):
+        """
+        Get the amount of Methanol used per Mton of MTX output, per technology and region
+
+        Includes the multi chemical total volume per technology, and only covers the
+        chemicals that we are running for. Made once per year.
+
+        Returns:
+            List of (technology, technology code, region code, intensity)
+        """
+        if year in self.mtx_intensities:
+            return self.mtx_intensities[year]
+
         # Get the amount of Methanol used for each (Mton)
         df_inputs = self.get_inputs(year=year)
-        df_inputs_mtx = df_inputs[
-            (df_inputs.technology.isin(methanol_tech))
+        df = df_inputs[
+            (df_inputs.technology.isin(METHANOL_DEMAND_TECH))
             & (df_inputs.name.str.contains("Methanol"))
         ].drop_duplicates(["region", "technology"])
-        df = pd.merge(
-            df_mtx,
-            df_inputs_mtx,
-            on=["technology", "region"],
-            how="inner",
-        )
-        # Multiply by multi chemical total volume produced per tech
-        mtx_totals = (
-            self.df_multi_product_ratio[
-                self.df_multi_product_ratio.technology.str.contains("MT")
-            ]
-            .drop_duplicates(["chemical", "technology"])
-            .groupby("technology")
-            .agg(total=("ratio", "sum"))
-        )
 
-        df = df.merge(mtx_totals, on="technology", how="left").fillna(1)
+        # Multiply by multi chemical total volume produced per tech
+        df = df.merge(self.mtx_totals, on="technology", how="left").fillna(1)
         df["input"] *= df["total"]
 
         # filter only for chemicals that we are running for
         chemical_list = list(set(self.chemicals).intersection(set(METHANOL_DEPENDENCY)))
         df = df[df.chemical.isin(chemical_list)]
-        return (df["yearly_volume_total"] * df["input"]).sum()
+
+        self.mtx_intensities[year] = [
+            (
+                technology,
+                TECHNOLOGY_CODES.code(technology),
+                REGION_CODES.code(region),
+                intensity,
+            )
+            for technology, region, intensity in zip(df.technology, df.region, df.input)
+        ]
+        return self.mtx_intensities[year]
 
     def get_inputs(self, year, chemical=None):
         """Get the inputs for a chemical in a year"""
@@ -396,6 +491,7 @@ class DecarbonizationPathway:
     def update_ranking(self, df_rank, chemical, year, rank_type):
         """Update ranking for a chemical, year, type"""
         self.rankings[chemical][rank_type][year] = df_rank
+        self.updated_rankings.add((chemical, rank_type, year))
 
     def calculate_emission_stack(self, year):
         """
@@ -439,7 +535,8 @@ class DecarbonizationPathway:
             "scope_1_stack_emissions"
         ].sum()
 
-        df_volumes = self.demand[self.demand.year==2050]
+        df_volumes = self.demand.to_dataframe()
+        df_volumes = df_volumes[df_volumes.year==2050]
         mask = df_volumes['chemical'].str.contains("Methanol")
         df_volumes.loc[mask, 'demand'] = 450
         df_volumes.loc["Methanol", 'demand'] = 450 # set to demand of 450 Mt to account for MTX (approxmiate value)
@@ -451,19 +548,7 @@ class DecarbonizationPathway:
         return (df_constraint_share / df_constraint_share.sum()).to_dict()
 
     def copy_availability(self, year):
-        df = self.availability
-
-        for chemical in self.chemicals:
-            df.loc[df.year == year + 1, f"{chemical}_used"] = list(
-                df.loc[df.year == year, f"{chemical}_used"]
-            )
-
-        df.loc[df.year == year + 1, "used"] = list(df.loc[df.year == year, "used"])
-        df.loc[
-            (df.year == year + 1) & (df.name.str.contains("Methanol")), "cap"
-        ] = list(
-            df.loc[(df.year == year + 1) & (df.name.str.contains("Methanol")), "cap"]
-        )
+        self.availability.copy_year(year=year)
 
     def update_availability(self, plant, year, remove=False):
         """
@@ -474,27 +559,25 @@ class DecarbonizationPathway:
             remove:
             plant: update based on this plant
         """
-        df = self.availability
-        df = update_availability_from_plant(df, plant=plant, remove=remove, year=year)
-        self.availability = df.round(1)
+        self.availability.update_from_plant(plant=plant, year=year, remove=remove)
+        return self
+
+    def update_availability_from_plants(self, year, added=(), removed=()):
+        """Update the amount used of resources for plants added and removed at once"""
+        self.availability.update_from_plants(year=year, added=added, removed=removed)
         return self
 
     def update_plant_status(self, year):
-        for plant in self.stacks[year].plants:
-            if year - plant.start_year >= plant.plant_lifetime:
-                plant.plant_status = "old"
+        self.stacks[year].update_plant_status(year=year)
         return self
 
     def get_availability(self, year=None, name=None):
-        df = self.availability.drop(columns=["unit"])
-
-        if year is not None:
-            df = df[df.year == year]
-
-        if name is not None:
-            df = df[df.name == name]
+        df = self.availability.to_dataframe(year=year, name=name)
+        return df.drop(columns=["unit"])
 
-        return df
+    def get_remaining_availability(self, year, chemical):
+        """Get the remaining resources per region that a chemical can use in a year"""
+        return self.availability.get_remaining(year=year, chemical=chemical)
 
     def get_stack(self, year: int) -> PlantStack:
         return self.stacks[year]
@@ -504,9 +587,9 @@ class DecarbonizationPathway:
         return self
 
     def copy_stack(self, year):
-        """Copy this year's stack to next year"""
+        """Copy this year's stack to next year, sharing its plant table"""
         old_stack = self.get_stack(year=year)
-        new_stack = PlantStack(plants=old_stack.plants.copy())
+        new_stack = old_stack.copy(year=year + 1)
         return self.add_stack(year=year + 1, stack=new_stack)
 
     def add_stack(self, year, stack):
@@ -553,7 +636,7 @@ class DecarbonizationPathway:
 
         # If Japan run, only create Japan plants
         df_production = self.importer.get_current_production(
-            japan_only=(MODEL_SCOPE == "Japan")
+            japan_only=(self.config.MODEL_SCOPE == "Japan")
         )
 
         # Only keep rows for chemicals that we are modelling
@@ -601,11 +684,11 @@ class DecarbonizationPathway:
             subset=["region", "chemical", "technology"]
         )
 
-        # Build them
+        # Build them: the plants of a row only differ in their status and start year
         all_plants = []
         for plant_status in ["old", "new"]:
-            plants = df_plants.apply(
-                lambda row: create_plants(
+            for row in df_plants.to_dict(orient="records"):
+                all_plants += create_plants(
                     n_plants=row[f"number_of_plants_{plant_status}"],
                     technology=row["technology"],
                     origin="Non-existent",
@@ -635,15 +718,10 @@ class DecarbonizationPathway:
                     plant_lifetime=40,
                     plant_status=plant_status,
                     capacity_factor=row["spec__capacity_factor"],
-                    df_plant_capacities=self.df_plant_capacities,
-                ),
-                axis=1,
-            ).tolist()
-
-            plants = [item for sublist in plants for item in sublist]
-            all_plants += plants
+                    plant_capacities=self.plant_capacities,
+                )
 
-        stack = PlantStack(plants=all_plants)
+        stack = PlantStack(plants=all_plants, year=self.start_year)
         return {self.start_year: stack}
 
     def plot_stacks(self, df_stack_agg, groupby, chemical):
@@ -663,7 +741,8 @@ class DecarbonizationPathway:
 
         wedge_fig = px.area(df, color=groupby, x="year", y="yearly_volume")
 
-        df_demand = self.demand.query(f"chemical=='{chemical}'").query(
+        df_demand = self.demand.to_dataframe()
+        df_demand = df_demand.query(f"chemical=='{chemical}'").query(
             f"year <= {df.year.max()}"
         )
         demand_fig = px.line(df_demand, x="year", y="demand")
@@ -676,7 +755,9 @@ class DecarbonizationPathway:
         fig.layout.yaxis.title = "Yearly volume (Mton / annum)"
         fig.layout.title = f"{groupby} over time for {chemical} - {self.pathway_name} - {self.sensitivity}"
 
-        filename = f"output/{self.model_scope}/{self.pathway_name}/{self.sensitivity}/final/{chemical}/{groupby}_over_time"
+        filename = str(
+            self.importer.export_dir.joinpath("final", chemical, f"{groupby}_over_time")
+        )
 
         plot(
             fig,
@@ -702,7 +783,11 @@ class DecarbonizationPathway:
             title=f"Methanol availability over time - {self.pathway_name} - {self.sensitivity}",
         )
 
-        filename = f"output/{self.model_scope}/{self.pathway_name}/{self.sensitivity}/final/Methanol/methanol_availability_over_time"
+        filename = str(
+            self.importer.export_dir.joinpath(
+                "final", "Methanol", "methanol_availability_over_time"
+            )
+        )
 
         plot(
             fig,
@@ -834,16 +919,14 @@ class DecarbonizationPathway:
         df_emissions = self.emissions
 
         # replace/update the df_cost in self
-        df_self_costs = self.cost
-        df_cost = df_self_costs.query(
-            f"~(year == {year} + 1 & technology == {METHANOL_DEMAND_TECH})"
-        ).append(df_tco)
-        self.cost = df_cost
+        df_cost = self.update_cost(year=year, df_tco=df_tco)
 
         df_tech_transitions = self.importer.get_tech_transitions()
         df_tech = self.importer.get_tech()
-        df_tech.type_of_tech = df_tech.type_of_tech.replace(
-            {"Initial": 1, "Transition": 2, "End-state": 3}
+        df_tech = df_tech.assign(
+            type_of_tech=df_tech.type_of_tech.replace(
+                {"Initial": 1, "Transition": 2, "End-state": 3}
+            )
         )
 
         # re-rank based on new variables
@@ -857,6 +940,14 @@ class DecarbonizationPathway:
 
         return self
 
+    def update_cost(self, year, df_tco):
+        """Replace the cost of methanol demand tech in the next year"""
+        self.cost = self.cost.query(
+            f"~(year == {year} + 1 & technology == {METHANOL_DEMAND_TECH})"
+        ).append(df_tco)
+        self.cost_updates.append((year, df_tco))
+        return self.cost
+
     def make_re_rankings(
         self, df_cost, df_emissions, df_tech, df_tech_transitions, year
     ):
@@ -878,6 +969,7 @@ class DecarbonizationPathway:
                 rank_type=rank_type,
                 year=year + 1,
                 pathway=self.pathway_name,
+                config=self.config,
             )
 
             # Update ranking for each chemical
@@ -901,25 +993,108 @@ class DecarbonizationPathway:
         Returns:
 
         """
-        if ("technology" in df_tech.columns) and ("destination" in df_tech.columns):
-            df_tech.drop(columns="technology", inplace=True)
-
-        df = self.df_multi_product_ratio
-        primary_chemicals = df.drop_duplicates(["technology", "primary_chemical"])[
-            ["technology", "primary_chemical"]
+        return df_tech[
+            self.eligibility.is_primary(
+                chemical=chemical,
+                chemicals=df_tech["chemical"],
+                technologies=df_tech[col],
+            )
         ]
-        technologies = primary_chemicals[primary_chemicals.primary_chemical == chemical]
 
-        multi_product_idx = df_tech[col].isin(primary_chemicals.technology)
-        df_single = df_tech[~multi_product_idx]
-        df_multi = df_tech[multi_product_idx]
+    def save_checkpoint(self, path, year):
+        """
+        Save the state of the pathway at the end of a year, to continue from it later
+
+        The state is what the optimization changes: the stacks, availability, demand,
+        transitions, the rankings and costs that were updated, the codes of the plant
+        table, plant identifiers and the state of the random generators.
+
+        Args:
+            path: File to save to
+            year: The last year that was optimized
+        """
+        state = {
+            "run": self._get_run(),
+            "year": year,
+            "stacks": self.stacks,
+            "availability": self.availability,
+            "demand": self.demand,
+            "transitions": self.transitions,
+            "mtx_intensities": self.mtx_intensities,
+            "rankings": {
+                (chemical, rank_type, ranking_year): self.rankings[chemical][rank_type][
+                    ranking_year
+                ]
+                for chemical, rank_type, ranking_year in self.updated_rankings
+            },
+            "cost_updates": self.cost_updates,
+            "codes": [
+                categories.labels
+                for categories in [TECHNOLOGY_CODES, REGION_CODES, CHEMICAL_CODES]
+            ],
+            "next_plant_id": get_next_plant_id(),
+            "random_state": random.getstate(),
+            "numpy_random_state": np.random.get_state(),
+        }
+
+        # Write to a temporary file first, so a crash never leaves half a checkpoint
+        path = Path(path)
+        path.parent.mkdir(exist_ok=True, parents=True)
+        temporary_path = path.with_suffix(".tmp")
+        with gzip.open(temporary_path, "wb", compresslevel=1) as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        temporary_path.replace(path)
+
+    def load_checkpoint(self, path) -> int:
+        """
+        Continue from the state saved at the end of a year by `save_checkpoint`
 
-        df_multi = df_multi.merge(
-            technologies,
-            left_on=[col, "chemical"],
-            right_on=["technology", "primary_chemical"],
+        Args:
+            path: File to load from
+
+        Returns:
+            The last year that was optimized
+        """
+        with gzip.open(path, "rb") as f:
+            state = pickle.load(f)
+
+        if state["run"] != self._get_run():
+            raise ValueError(
+                f"Checkpoint {path} is of run {state['run']}, not {self._get_run()}"
+            )
+
+        for categories, labels in zip(
+            [TECHNOLOGY_CODES, REGION_CODES, CHEMICAL_CODES], state["codes"]
+        ):
+            categories.restore(labels)
+
+        self.stacks = state["stacks"]
+        self.availability = state["availability"]
+        self.demand = state["demand"]
+        self.transitions = state["transitions"]
+        self.mtx_intensities = state["mtx_intensities"]
+        for (chemical, rank_type, year), df_rank in state["rankings"].items():
+            self.update_ranking(
+                df_rank=df_rank, chemical=chemical, year=year, rank_type=rank_type
+            )
+        for year, df_tco in state["cost_updates"]:
+            self.update_cost(year=year, df_tco=df_tco)
+
+        set_next_plant_id(state["next_plant_id"])
+        random.setstate(state["random_state"])
+        np.random.set_state(state["numpy_random_state"])
+        self.resource_constraints = None
+        return state["year"]
+
+    def _get_run(self):
+        return (
+            self.pathway_name,
+            self.sensitivity,
+            self.model_scope,
+            list(self.chemicals),
+            self.start_year,
+            self.end_year,
         )
-        return pd.concat([df_multi, df_single])
 
     def save_stacks(self):
         """Save all plants throughout all stack, with start year"""
@@ -0,0 +1,102 @@
+import hashlib
+import itertools
+import json
+import random
+
+import numpy as np
+
+
+class ParameterSweep:
+    """
+    Design of config constant values to run the model for
+
+    Every parameter has a list of values. A grid design runs all combinations of them,
+    a random design runs `samples` random combinations. In a random design, a parameter
+    can also be a (low, high) tuple, to draw uniformly from that range (integers if both
+    bounds are integers).
+
+    With an ensemble, every combination is run for `ensemble_size` values of
+    RANDOM_SEED, the seed of the random tie-breaks in the pathway optimizer.
+    """
+
+    def __init__(
+        self,
+        parameters: dict,
+        design: str = "grid",
+        samples: int = None,
+        seed: int = 0,
+        ensemble_size: int = 0,
+        ensemble_seed: int = 0,
+    ):
+        """
+        Args:
+            parameters: Values or range of each config constant, by name
+            design: "grid" or "random"
+            samples: Number of combinations in a random design
+            seed: Seed of a random design, so that it can be run again
+            ensemble_size: Number of seeds to run every combination for (0: one run
+                with the seed in config.py)
+            ensemble_seed: Seed the seeds of the ensemble are drawn from
+        """
+        if design not in ["grid", "random"]:
+            raise ValueError(f"Sweep design {design} does not exist")
+        if design == "random" and not samples:
+            raise ValueError("A random sweep design needs a number of samples")
+        for name, values in parameters.items():
+            if isinstance(values, tuple) and (design == "grid" or len(values) != 2):
+                raise ValueError(
+                    f"Sweep parameter {name} needs a list of values, or a (low, high) "
+                    f"range in a random design"
+                )
+        if ensemble_size and "RANDOM_SEED" in parameters:
+            raise ValueError("RANDOM_SEED can't be swept in an ensemble")
+
+        self.parameters = parameters
+        self.design = design
+        self.samples = samples
+        self.seed = seed
+        self.ensemble_size = ensemble_size
+        self.ensemble_seed = ensemble_seed
+
+    def points(self) -> list:
+        """Values of the parameters for every run of the sweep, without duplicates"""
+        names = list(self.parameters)
+        if self.design == "grid":
+            combinations = itertools.product(*self.parameters.values())
+        else:
+            rng = random.Random(self.seed)
+            combinations = (
+                [self._draw(rng, self.parameters[name]) for name in names]
+                for _ in range(self.samples)
+            )
+
+        members = [{"RANDOM_SEED": seed} for seed in self.ensemble_seeds()] or [{}]
+        points = {}
+        for values in combinations:
+            for member in members:
+                point = {**dict(zip(names, values)), **member}
+                points.setdefault(self.name(point), point)
+        return list(points.values())
+
+    def ensemble_seeds(self) -> list:
+        """
+        Seeds of the ensemble, each from an independent stream of the ensemble seed
+        (rather than consecutive seeds, whose random numbers can be correlated)
+        """
+        streams = np.random.SeedSequence(self.ensemble_seed).spawn(self.ensemble_size)
+        return [int(stream.generate_state(1)[0]) for stream in streams]
+
+    @staticmethod
+    def _draw(rng: random.Random, values):
+        if not isinstance(values, tuple):
+            return rng.choice(values)
+        low, high = values
+        if isinstance(low, int) and isinstance(high, int):
+            return rng.randint(low, high)
+        return rng.uniform(low, high)
+
+    @staticmethod
+    def name(point: dict) -> str:
+        """Name of a run of the sweep, the same for the same parameter values"""
+        values = json.dumps(point, sort_keys=True, default=str)
+        return hashlib.sha1(values.encode()).hexdigest()[:12]
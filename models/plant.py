@@ -1,9 +1,14 @@
-from uuid import uuid4
+import copyreg
+import heapq
+import itertools
+from collections import defaultdict
+from types import MappingProxyType
 
+import numpy as np
 import pandas as pd
 
 from config import METHANOL_SUPPLY_TECH
-from util.util import first
+from models.availability import GLOBAL_RESOURCES, REGIONAL_RESOURCES
 
 # Unabated fossil tech
 UNABATED_FOSSIL_TECH = {
@@ -26,7 +31,87 @@ UNABATED_FOSSIL_TECH = {
 }
 
 
+# Capacities of a technology/region combination that is not in the plant specs
+NO_CAPACITIES = MappingProxyType({})
+
+
+
+def _make_read_only(values: dict) -> MappingProxyType:
+    return MappingProxyType(values)
+
+
+# Read-only capacities and specs are pickled as their dict, e.g. in pathway checkpoints
+copyreg.pickle(MappingProxyType, lambda proxy: (_make_read_only, (dict(proxy),)))
+
+# Plant identifiers: cheap and unique within a process
+_plant_ids = itertools.count()
+
+
+def get_next_plant_id() -> int:
+    """Get the identifier the next plant will get, without using it"""
+    global _plant_ids
+    next_id = next(_plant_ids)
+    _plant_ids = itertools.count(next_id)
+    return next_id
+
+
+def set_next_plant_id(next_id: int):
+    """Continue plant identifiers from this one, e.g. when resuming a pathway"""
+    global _plant_ids
+    _plant_ids = itertools.count(next_id)
+
+
+def renumber_plant(plant):
+    """Give a plant made in another process (e.g. a worker) an identifier of this one"""
+    plant.uuid = next(_plant_ids)
+    return plant
+
+
+def make_capacity_index(df_plant_capacities: pd.DataFrame) -> dict:
+    """
+    Map (technology, region) to the capacities of the chemicals that a plant produces
+
+    The capacities are read-only, and shared by all plants with the same technology
+    and region.
+    """
+    df = df_plant_capacities.drop_duplicates(["technology", "region", "chemical"])
+
+    capacity_index = defaultdict(dict)
+    for technology, region, chemical, capacity in zip(
+        df.technology, df.region, df.chemical, df.assumed_plant_capacity
+    ):
+        capacity_index[(technology, region)][chemical] = capacity
+
+    return {
+        key: MappingProxyType(capacities) for key, capacities in capacity_index.items()
+    }
+
+
 class Plant:
+    __slots__ = (
+        "chemical",
+        "origin",
+        "technology",
+        "region",
+        "start_year",
+        "capacities",
+        "capacity_factor",
+        "uuid",
+        "retrofit",
+        "biomass_yearly",
+        "bio_oils_yearly",
+        "pyrolysis_oil_yearly",
+        "waste_water_yearly",
+        "municipal_solid_waste_rdf_yearly",
+        "methanol_black_yearly",
+        "methanol_green_yearly",
+        "ccs_total",
+        "ccs_yearly",
+        "plant_status",
+        "plant_lifetime",
+        "type_of_tech",
+    )
+
     def __init__(
         self,
         origin,
@@ -45,7 +130,7 @@ class Plant:
         ccs_total,
         ccs_yearly,
         plant_lifetime,
-        df_plant_capacities,
+        plant_capacities,
         type_of_tech="Initial",
         retrofit=False,
         plant_status="new",
@@ -55,10 +140,9 @@ class Plant:
         self.technology = technology
         self.region = region
         self.start_year = start_year
-        self.df_plant_capacities = df_plant_capacities
-        self.capacities = self.import_capacities()
+        self.capacities = plant_capacities.get((technology, region), NO_CAPACITIES)
         self.capacity_factor = capacity_factor
-        self.uuid = uuid4().hex
+        self.uuid = next(_plant_ids)
         self.retrofit = retrofit
         self.biomass_yearly = biomass_yearly
         self.bio_oils_yearly = bio_oils_yearly
@@ -80,22 +164,6 @@ class Plant:
     def get_age(self, year):
         return year - self.start_year
 
-    def import_capacities(self) -> dict:
-        """Import plant capacities for the different chemicals that this plant produces"""
-        df = self.df_plant_capacities
-
-        # Find the capacities
-        df_capacities = df[
-            (df.technology == self.technology) & (df.region == self.region)
-        ]
-
-        return {
-            chemical: df_capacities.loc[
-                df_capacities.chemical == chemical, "assumed_plant_capacity"
-            ].values[0]
-            for chemical in df_capacities.chemical
-        }
-
     def get_capacity(self, chemical=None):
         """Get plant capacity"""
         return self.capacities.get(chemical or self.chemical, 0)
@@ -108,20 +176,371 @@ class Plant:
         return self.get_capacity(chemical) * self.capacity_factor
 
 
-def create_plants(n_plants: int, df_plant_capacities: pd.DataFrame, **kwargs) -> list:
+def create_plants(n_plants: int, plant_capacities: dict, **kwargs) -> list:
     """Convenience function to create a list of plants at once"""
     return [
-        Plant(df_plant_capacities=df_plant_capacities, **kwargs)
-        for _ in range(n_plants)
+        Plant(plant_capacities=plant_capacities, **kwargs) for _ in range(n_plants)
     ]
 
 
+class Categories:
+    """Append-only mapping between labels (e.g. technology names) and integer codes"""
+
+    def __init__(self):
+        self.labels = []
+        self._codes = {}
+
+    def __len__(self):
+        return len(self.labels)
+
+    def code(self, label) -> int:
+        """Get the code of a label, adding the label if it is new"""
+        try:
+            return self._codes[label]
+        except KeyError:
+            self._codes[label] = len(self.labels)
+            self.labels.append(label)
+            return self._codes[label]
+
+    def get(self, label) -> int:
+        """Get the code of a label, or -1 if the label is unknown"""
+        return self._codes.get(label, -1)
+
+    def get_many(self, labels) -> np.ndarray:
+        return np.array([self.get(label) for label in labels], dtype=np.int32)
+
+    def to_labels(self, codes: np.ndarray) -> np.ndarray:
+        return np.array(self.labels, dtype=object)[codes]
+
+    def restore(self, labels: list):
+        """
+        Make sure labels have the codes they had in another process, e.g. when resuming
+        a pathway, by adding the missing labels in the same order
+        """
+        for code, label in enumerate(labels):
+            if self.code(label) != code:
+                raise ValueError(
+                    f"Label {label} has code {self.code(label)} instead of {code}"
+                )
+
+
+# Codes are shared by all stacks, so that stacks can be compared code by code
+TECHNOLOGY_CODES = Categories()
+REGION_CODES = Categories()
+CHEMICAL_CODES = Categories()
+
+PLANT_STATUSES = ["new", "old"]
+
+UNABATED_FOSSIL_CODES = [TECHNOLOGY_CODES.code(tech) for tech in UNABATED_FOSSIL_TECH]
+METHANOL_SUPPLY_CODES = {
+    methanol_type: [TECHNOLOGY_CODES.code(tech) for tech in technologies]
+    for methanol_type, technologies in METHANOL_SUPPLY_TECH.items()
+}
+
+# Resource use per plant, in the order of the availability ledger
+RESOURCE_ATTRIBUTES = list(REGIONAL_RESOURCES.values()) + list(
+    GLOBAL_RESOURCES.values()
+)
+
+
+# Open end of the interval of a plant that has not been removed
+NEVER = np.iinfo(np.int32).max
+
+
+class PlantTable:
+    """
+    Column-wise table of all plants of a set of yearly stacks
+
+    Every plant is a row in a set of parallel arrays (technology, region, chemical,
+    start year, status, capacity factor, capacity per chemical and resource use),
+    so filters and aggregations over a stack are vectorized. Rows are only ever added.
+    Each row has the interval of years [added, removed) that the plant is in the stack,
+    so the stacks of all years are views on the same table.
+    """
+
+    _columns = {
+        "technology": np.int32,
+        "origin": np.int32,
+        "region": np.int32,
+        "chemical": np.int32,
+        "start_year": np.int32,
+        "plant_lifetime": np.float64,
+        "status": np.int8,
+        "capacity_factor": np.float64,
+        "retrofit": bool,
+        "added": np.int32,
+        "removed": np.int32,
+    }
+
+    def __init__(self, latest_year: int):
+        self.plants = []
+        self.rows = {}
+        self.size = 0
+        self.data = {
+            column: np.zeros(0, dtype=dtype) for column, dtype in self._columns.items()
+        }
+        self.capacity = np.zeros((0, 0))
+        self.has_capacity = np.zeros((0, 0), dtype=bool)
+        self.resources = np.zeros((0, len(RESOURCE_ATTRIBUTES)))
+
+        # Year of the most recent stack, the intervals of its plants are open-ended
+        self.latest_year = latest_year
+
+        # Changes with every update, to know when cached masks are out of date
+        self.version = 0
+        self.status_version = 0
+
+        # Calendar of (year, row) when new plants reach the end of their lifetime
+        self.aging = []
+
+    def col(self, column) -> np.ndarray:
+        return self.data[column][: self.size]
+
+    def _reserve(self, size, width):
+        """Make sure the arrays can hold this number of plants and chemicals"""
+        allocated, allocated_width = self.capacity.shape
+        if size <= allocated and width <= allocated_width:
+            return
+
+        new_size = max(size, 2 * allocated, 64) if size > allocated else allocated
+        new_width = max(width, allocated_width)
+        for column, values in self.data.items():
+            self.data[column] = np.zeros(new_size, dtype=values.dtype)
+            self.data[column][: self.size] = values[: self.size]
+
+        for name in ["capacity", "has_capacity", "resources"]:
+            values = getattr(self, name)
+            shape = (new_size, new_width if name != "resources" else values.shape[1])
+            new_values = np.zeros(shape, dtype=values.dtype)
+            new_values[: self.size, : values.shape[1]] = values[: self.size]
+            setattr(self, name, new_values)
+
+    def extend(self, plants: list, added: int, removed: int = NEVER):
+        """Add plants as rows at the end, in the stacks of the years [added, removed)"""
+        self.version += 1
+        if not plants:
+            return
+
+        start = self.size
+        end = start + len(plants)
+        chemicals = [CHEMICAL_CODES.code(plant.chemical) for plant in plants]
+        capacities = [
+            (CHEMICAL_CODES.code(chemical), capacity)
+            for plant in plants
+            for chemical, capacity in plant.capacities.items()
+        ]
+        self._reserve(end, len(CHEMICAL_CODES))
+        self.size = end
+
+        data = self.data
+        data["technology"][start:end] = [
+            TECHNOLOGY_CODES.code(plant.technology) for plant in plants
+        ]
+        data["origin"][start:end] = [
+            TECHNOLOGY_CODES.code(plant.origin) for plant in plants
+        ]
+        data["region"][start:end] = [
+            REGION_CODES.code(plant.region) for plant in plants
+        ]
+        data["chemical"][start:end] = chemicals
+        data["start_year"][start:end] = [plant.start_year for plant in plants]
+        data["plant_lifetime"][start:end] = [plant.plant_lifetime for plant in plants]
+        data["status"][start:end] = [
+            PLANT_STATUSES.index(plant.plant_status) for plant in plants
+        ]
+        data["capacity_factor"][start:end] = [plant.capacity_factor for plant in plants]
+        data["retrofit"][start:end] = [plant.retrofit for plant in plants]
+        data["added"][start:end] = added
+        data["removed"][start:end] = removed
+
+        rows = np.repeat(
+            np.arange(start, end), [len(plant.capacities) for plant in plants]
+        )
+        self.capacity[start:end] = 0
+        self.has_capacity[start:end] = False
+        if capacities:
+            chemicals, values = zip(*capacities)
+            self.capacity[rows, chemicals] = values
+            self.has_capacity[rows, chemicals] = True
+        self.resources[start:end] = [
+            [getattr(plant, attribute) for attribute in RESOURCE_ATTRIBUTES]
+            for plant in plants
+        ]
+
+        for row, plant in enumerate(plants, start=start):
+            self.rows[plant.uuid] = row
+        self.plants.extend(plants)
+        self.schedule_aging(np.arange(start, end))
+
+    def load_rows(self, source, rows: np.ndarray, added: int):
+        """Fill this (empty) table with rows of another table"""
+        width = source.capacity.shape[1]
+        self._reserve(len(rows), width)
+        self.size = len(rows)
+        for column in self._columns:
+            self.data[column][: self.size] = source.data[column][rows]
+        self.data["added"][: self.size] = added
+        self.data["removed"][: self.size] = NEVER
+        self.capacity[: self.size, :width] = source.capacity[rows]
+        self.has_capacity[: self.size, :width] = source.has_capacity[rows]
+        self.resources[: self.size] = source.resources[rows]
+
+        self.plants = [source.plants[row] for row in rows]
+        self.rows = {plant.uuid: row for row, plant in enumerate(self.plants)}
+        self.version += 1
+        self.aging = []
+        self.schedule_aging(np.arange(self.size))
+        return self
+
+    def schedule_aging(self, rows: np.ndarray):
+        """Add new plants to the calendar, in the year they reach their lifetime"""
+        rows = rows[self.col("status")[rows] == PLANT_STATUSES.index("new")]
+        years = self.col("start_year")[rows] + self.col("plant_lifetime")[rows]
+        has_year = ~np.isnan(years)
+        for year, row in zip(years[has_year].tolist(), rows[has_year].tolist()):
+            heapq.heappush(self.aging, (year, row))
+
+    def in_year(self, year: int) -> np.ndarray:
+        """Boolean mask of the rows that are in the stack of a year"""
+        return (self.col("added") <= year) & (year < self.col("removed"))
+
+    def set_interval(self, row, added=None, removed=None):
+        if added is not None:
+            self.data["added"][row] = added
+        if removed is not None:
+            self.data["removed"][row] = removed
+        self.version += 1
+
+
 class PlantStack:
-    def __init__(self, plants: list):
-        self.plants = plants
+    """
+    Stack of plants in a year, as a view on a plant table
+
+    Copying a stack to the next year shares the table and only moves the view,
+    so the stacks of all years together only take memory for the plants that are
+    added over time. Filtered stacks are views on a fixed set of rows.
+    Updating a stack that can not be expressed in the shared table (e.g. removing a
+    plant from a past year but not from the years after) first gives the stack
+    its own table.
+    """
+
+    def __init__(self, plants: list, year: int = 0, table: PlantTable = None):
+        self.year = year
+        if table is None:
+            table = PlantTable(latest_year=year)
+            table.extend(plants, added=year)
+        self._table = table
+
+        # Rows of a filtered stack, None if the stack holds all plants of the year
+        self._fixed_rows = None
+        self._alive_cache = (None, None)
+
+        # Running totals of capacity and number of plants, per technology or region
+        self._totals = {}
+        self._n_updates = 0
+
+        # Running yearly volume of the plants' own chemical, per technology and region
+        self._volume_totals = None
+        self._regions_below_cap = (None, None, None)
+
+        # Capacity up to which each region (by code) can grow, None without a quota
+        self._regional_quota = None
+
+        # Oldest-first heaps of (start year, row), per (chemical, technology, region,
+        # status) code, for the table and plant statuses they were made with
+        self._heaps = (None, None, None)
+
+        # Heaps of rows in the order added, per (own chemical, region, technology) code,
+        # for the table they were made with
+        self._first_rows = (None, None)
+
         # Keep track of all plants added this year
         self.new_ids = []
 
+    def __len__(self):
+        return int(self._alive().sum())
+
+    @property
+    def plants(self) -> list:
+        """The plants in this stack, in the order they were added"""
+        return [self._table.plants[row] for row in np.flatnonzero(self._alive())]
+
+    @property
+    def _size(self):
+        return self._table.size
+
+    @property
+    def _plants(self):
+        return self._table.plants
+
+    @property
+    def _capacity(self):
+        return self._table.capacity
+
+    @property
+    def _has_capacity(self):
+        return self._table.has_capacity
+
+    def _col(self, column) -> np.ndarray:
+        return self._table.col(column)
+
+    def _alive(self) -> np.ndarray:
+        """Boolean mask of the rows of the table that are in this stack"""
+        version, alive = self._alive_cache
+        if version != self._table.version:
+            alive = self._table.in_year(self.year)
+            if self._fixed_rows is not None:
+                alive = np.zeros(self._size, dtype=bool)
+                alive[self._fixed_rows] = True
+            self._alive_cache = (self._table.version, alive)
+        return alive
+
+    def _new(self) -> np.ndarray:
+        """Boolean mask of the rows that were added to this stack this year"""
+        rows = [self._table.rows.get(uuid) for uuid in self.new_ids]
+        new = np.zeros(self._size, dtype=bool)
+        new[[row for row in rows if row is not None]] = True
+        return new & self._alive()
+
+    def _subset(self, mask: np.ndarray):
+        """View on the plants in the mask"""
+        stack = PlantStack(plants=[], year=self.year, table=self._table)
+        stack._fixed_rows = np.flatnonzero(mask)
+        return stack
+
+    def _detach(self):
+        """Give this stack its own table, with only its own plants"""
+        rows = np.flatnonzero(self._alive())
+        self._table = PlantTable(latest_year=self.year).load_rows(
+            self._table, rows, added=self.year
+        )
+        self._fixed_rows = None
+
+    def copy(self, year=None):
+        """
+        Copy of this stack, without the record of plants added this year
+
+        Args:
+            year: Year of the copy. Copying the most recent stack to a later year shares
+                the plant table, any other copy gets its own table.
+        """
+        year = self.year if year is None else year
+        table = self._table
+        if self._fixed_rows is None and self.year == table.latest_year < year:
+            table.latest_year = year
+            stack = PlantStack(plants=[], year=year, table=table)
+        else:
+            stack = PlantStack(plants=[], year=year, table=PlantTable(latest_year=year))
+            stack._table.load_rows(table, np.flatnonzero(self._alive()), added=year)
+
+        stack._totals = {
+            by: [values.copy() for values in totals]
+            for by, totals in self._totals.items()
+        }
+        if self._volume_totals is not None:
+            stack._volume_totals = self._volume_totals.copy()
+        return stack
+
     def to_dataframe(self):
         return pd.DataFrame(
             [
@@ -139,65 +558,304 @@ class PlantStack:
             ]
         )
 
+    def _is_latest(self):
+        return self.year == self._table.latest_year
+
+    def get_plant(self, uuid):
+        """Get the plant in this stack with an identifier"""
+        row = self._table.rows.get(uuid)
+        if row is None or not self._alive()[row]:
+            raise ValueError("Plant is not in the stack")
+        return self._plants[row]
+
     def remove(self, remove_plant):
-        self.plants.remove(remove_plant)
+        row = self._table.rows.get(remove_plant.uuid)
+        if row is None or not self._alive()[row]:
+            raise ValueError("Plant is not in the stack")
+
+        self._track(row, sign=-1)
+        year = self.year
+        added, removed = self._col("added")[row], self._col("removed")[row]
+        if self._fixed_rows is None and (self._is_latest() or removed == year + 1):
+            # Also out of the stacks after this year (if any)
+            self._table.set_interval(row, removed=year)
+        elif self._fixed_rows is None and added == year:
+            # Stays in the stacks after this year
+            self._table.set_interval(row, added=year + 1)
+        else:
+            self._detach()
+            self._table.set_interval(self._table.rows[remove_plant.uuid], removed=year)
+
+    def remove_many(self, remove_plants: list):
+        """Remove plants at once, in the same way as removing them one by one"""
+        table = self._table
+        rows = np.array(
+            [table.rows.get(plant.uuid, -1) for plant in remove_plants], dtype=int
+        )
+        year = self.year
+        if (
+            self._fixed_rows is not None
+            or (rows < 0).any()
+            or len(np.unique(rows)) < len(rows)
+            or not self._alive()[rows].all()
+            or not (self._is_latest() or (self._col("removed")[rows] == year + 1).all())
+        ):
+            for plant in remove_plants:
+                self.remove(plant)
+            return
+
+        # Also out of the stacks after this year (if any)
+        self._track(rows, sign=-1)
+        table.set_interval(rows, removed=year)
 
     def append(self, new_plant):
-        self.plants.append(new_plant)
+        year = self.year
+        if self._fixed_rows is not None:
+            self._detach()
+
+        table = self._table
+        end = NEVER if self._is_latest() else year + 1
+        row = table.rows.get(new_plant.uuid)
+        in_table = row is not None
+        if not in_table:
+            table.extend([new_plant], added=year, removed=end)
+        else:
+            added, removed = self._col("added")[row], self._col("removed")[row]
+            if added <= year < removed:
+                raise ValueError("Plant is already in the stack")
+            if added >= removed:
+                # Not in any stack
+                table.set_interval(row, added=year, removed=end)
+            elif removed == year:
+                # In the stacks up to this year
+                table.set_interval(row, removed=end)
+            elif added == year + 1:
+                # In the stacks after this year
+                table.set_interval(row, added=year)
+            else:
+                self._detach()
+                self._table.extend([new_plant], added=year)
+
+        row = self._table.rows[new_plant.uuid]
+        if in_table:
+            # The plant may have left the calendar while it was not in any stack
+            self._table.schedule_aging(np.array([row]))
+
+        self._track(row, sign=1)
+        table, status_version, heaps = self._heaps
+        if table is self._table and status_version == table.status_version:
+            self._push(heaps, row)
+        table, first_rows = self._first_rows
+        if table is self._table:
+            heapq.heappush(first_rows.setdefault(self._first_key(row), []), int(row))
         self.new_ids.append(new_plant.uuid)
 
+    def extend(self, new_plants: list):
+        """Add plants at once, in the same way as appending them one by one"""
+        table = self._table
+        if self._fixed_rows is not None or any(
+            plant.uuid in table.rows for plant in new_plants
+        ):
+            for plant in new_plants:
+                self.append(plant)
+            return
+
+        start = table.size
+        end = NEVER if self._is_latest() else self.year + 1
+        table.extend(new_plants, added=self.year, removed=end)
+        rows = np.arange(start, table.size)
+
+        self._track(rows, sign=1)
+        table, status_version, heaps = self._heaps
+        if table is self._table and status_version == table.status_version:
+            for row in rows:
+                self._push(heaps, row)
+        table, first_rows = self._first_rows
+        if table is self._table:
+            for row in rows.tolist():
+                heapq.heappush(first_rows.setdefault(self._first_key(row), []), row)
+        self.new_ids.extend(plant.uuid for plant in new_plants)
+
+    def _track(self, rows, sign):
+        """Update the running totals for plants (rows) added (1) or removed (-1)"""
+        self._n_updates += 1
+        for by in list(self._totals):
+            codes = self._col(by)[rows]
+            capacity, number_of_plants = self._get_totals(by)
+            row_capacity, row_number_of_plants = self._contribution(by, rows)
+            np.add.at(capacity, codes, sign * row_capacity)
+            np.add.at(number_of_plants, codes, sign * row_number_of_plants)
+
+        if self._volume_totals is not None:
+            volume = self._get_volume_totals()
+            cells = (self._col("technology")[rows], self._col("region")[rows])
+            np.add.at(volume, cells, sign * self._own_yearly_volume(rows))
+
     def empty(self):
         """Return True if no plants in stack"""
-        return not self.plants
+        return not self._alive().any()
 
-    def filter_plants(
-        self, region=None, technology=None, chemical=None, methanol_type=None
+    def _capacity_of(self, chemical=None) -> np.ndarray:
+        """Capacity of each row for a chemical (or the plant's own chemical)"""
+        if chemical is None:
+            return self._capacity[np.arange(self._size), self._col("chemical")]
+
+        code = CHEMICAL_CODES.get(chemical)
+        if 0 <= code < self._capacity.shape[1]:
+            return self._capacity[: self._size, code]
+        return np.zeros(self._size)
+
+    def _mask(
+        self,
+        region=None,
+        technology=None,
+        chemical=None,
+        methanol_type=None,
+        plant_status=None,
     ):
-        """Filter plants based on one or more criteria"""
-        plants = self.plants
+        """Boolean mask of the rows that match one or more criteria"""
+        mask = self._alive().copy()
         if region is not None:
-            plants = filter(lambda plant: plant.region == region, plants)
+            mask &= self._col("region") == REGION_CODES.get(region)
         if technology is not None:
-            plants = filter(lambda plant: plant.technology == technology, plants)
+            mask &= self._col("technology") == TECHNOLOGY_CODES.get(technology)
         if chemical is not None:
-            plants = filter(
-                lambda plant: (plant.chemical == chemical)
-                or (chemical in plant.byproducts),
-                plants,
+            mask &= (self._col("chemical") == CHEMICAL_CODES.get(chemical)) | (
+                self._capacity_of(chemical) != 0
             )
         if methanol_type is not None:
-            plants = filter(
-                lambda plant: plant.technology in METHANOL_SUPPLY_TECH[methanol_type],
-                plants,
+            mask &= np.isin(
+                self._col("technology"), METHANOL_SUPPLY_CODES[methanol_type]
+            )
+        if plant_status is not None:
+            mask &= self._col("status") == PLANT_STATUSES.index(plant_status)
+        return mask
+
+    def filter_plants(
+        self, region=None, technology=None, chemical=None, methanol_type=None
+    ):
+        """Filter plants based on one or more criteria"""
+        mask = self._mask(
+            region=region,
+            technology=technology,
+            chemical=chemical,
+            methanol_type=methanol_type,
+        )
+        return [self._plants[row] for row in np.flatnonzero(mask)]
+
+    def _push(self, heaps, row):
+        """Add a row to the heaps of every chemical the plant counts for"""
+        chemicals = set(np.flatnonzero(self._capacity[row]).tolist())
+        chemicals.add(int(self._col("chemical")[row]))
+        key = tuple(
+            int(self._col(column)[row]) for column in ["technology", "region", "status"]
+        )
+        entry = (int(self._col("start_year")[row]), int(row))
+        for chemical in chemicals:
+            heapq.heappush(heaps.setdefault((chemical,) + key, []), entry)
+
+    def _get_heaps(self):
+        """Oldest-first heaps of the rows in this stack, made when first needed"""
+        table, status_version, heaps = self._heaps
+        if table is self._table and status_version == table.status_version:
+            return heaps
+
+        # Rows in order of start year (first added if equal) form a heap already
+        rows = np.flatnonzero(self._alive())
+        rows = rows[np.argsort(self._col("start_year")[rows], kind="stable")]
+        in_heap = self._capacity[rows] != 0
+        in_heap[np.arange(len(rows)), self._col("chemical")[rows]] = True
+        entries, chemicals = np.nonzero(in_heap)
+
+        heaps = {}
+        for chemical, technology, region, status, start_year, row in zip(
+            chemicals.tolist(),
+            self._col("technology")[rows][entries].tolist(),
+            self._col("region")[rows][entries].tolist(),
+            self._col("status")[rows][entries].tolist(),
+            self._col("start_year")[rows][entries].tolist(),
+            rows[entries].tolist(),
+        ):
+            heaps.setdefault((chemical, technology, region, status), []).append(
+                (start_year, row)
             )
 
-        return list(plants)
+        self._heaps = (self._table, self._table.status_version, heaps)
+        return heaps
 
-    def get_fossil_plants(self, chemical):
-        return [
-            plant
-            for plant in self.plants
-            if (
-                (plant.technology in UNABATED_FOSSIL_TECH)
-                and (plant.chemical == chemical)
+    def _peek_oldest(self, key):
+        """Oldest (start year, row) in a heap, dropping rows that left the stack"""
+        heap = self._get_heaps().get(key)
+        if not heap:
+            return None
+
+        added, removed = self._col("added"), self._col("removed")
+        while heap and not added[heap[0][1]] <= self.year < removed[heap[0][1]]:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def get_oldest_plant(
+        self,
+        region=None,
+        technology=None,
+        chemical=None,
+        methanol_type=None,
+        plant_status=None,
+    ):
+        """Get the plant with the earliest start year (first added if equal)"""
+        if (
+            self._fixed_rows is None
+            and methanol_type is None
+            and None not in (region, technology, chemical)
+        ):
+            codes = (
+                CHEMICAL_CODES.get(chemical),
+                TECHNOLOGY_CODES.get(technology),
+                REGION_CODES.get(region),
             )
-        ]
+            statuses = PLANT_STATUSES if plant_status is None else [plant_status]
+            oldest = [
+                self._peek_oldest(codes + (PLANT_STATUSES.index(status),))
+                for status in statuses
+            ]
+            oldest = [entry for entry in oldest if entry is not None]
+            return self._plants[min(oldest)[1]] if oldest else None
+
+        mask = self._mask(
+            region=region,
+            technology=technology,
+            chemical=chemical,
+            methanol_type=methanol_type,
+            plant_status=plant_status,
+        )
+        if not mask.any():
+            return None
+        start_year = np.where(mask, self._col("start_year"), np.iinfo(np.int32).max)
+        return self._plants[np.argmin(start_year)]
+
+    def get_fossil_plants(self, chemical):
+        mask = self._alive() & (
+            self._col("chemical") == CHEMICAL_CODES.get(chemical)
+        )
+        mask &= np.isin(self._col("technology"), UNABATED_FOSSIL_CODES)
+        return [self._plants[row] for row in np.flatnonzero(mask)]
 
     def get_capacity(self, chemical, methanol_type=None, **kwargs):
         """Get the plant capacity, optionally filtered by region, technology, chemical"""
         if methanol_type is not None:
             kwargs["methanol_type"] = methanol_type
 
-        plants = self.filter_plants(chemical=chemical, **kwargs)
-        return sum(plant.get_capacity(chemical) for plant in plants)
+        mask = self._mask(chemical=chemical, **kwargs)
+        return float(self._capacity_of(chemical)[mask].sum())
 
     def get_yearly_volume(self, chemical, methanol_type=None, **kwargs):
         """Get the yearly volume, optionally filtered by region, technology, chemical"""
         if methanol_type is not None:
             kwargs["methanol_type"] = methanol_type
 
-        plants = self.filter_plants(chemical=chemical, **kwargs)
-        return sum(plant.get_yearly_volume(chemical=chemical) for plant in plants)
+        mask = self._mask(chemical=chemical, **kwargs)
+        yearly_volume = self._capacity_of(chemical) * self._col("capacity_factor")
+        return float(yearly_volume[mask].sum())
 
     def get_tech(self, id_vars, chemical=None):
         """
@@ -209,146 +867,355 @@ class PlantStack:
         Returns:
             Dataframe with technologies
         """
+        # One entry for every chemical that a plant has a capacity for
+        rows, chemicals = np.nonzero(
+            self._has_capacity[: self._size] & self._alive()[:, None]
+        )
+        if len(rows) == 0:
+            # There are no plants
+            return pd.DataFrame()
 
         df = pd.DataFrame(
-            [
-                {
-                    "chemical": plant.chemical,
-                    "technology": plant.technology,
-                    "region": plant.region,
-                    "retrofit": plant.retrofit,
-                    "capacity": plant.get_capacity_all(),
-                }
-                for plant in self.plants
+            {
+                "technology": TECHNOLOGY_CODES.to_labels(self._col("technology")[rows]),
+                "region": REGION_CODES.to_labels(self._col("region")[rows]),
+                "retrofit": self._col("retrofit")[rows],
+                "chemical": CHEMICAL_CODES.to_labels(chemicals),
+                "capacity": self._capacity[rows, chemicals],
+            }
+        )
+
+        return df.groupby(id_vars).agg(
+            capacity=("capacity", "sum"), number_of_plants=("capacity", "count")
+        )
+
+    def _contribution(self, by, rows):
+        """Capacity and number of plants of rows, as they count in the running totals"""
+        if by == "technology":
+            # A plant counts once for every chemical it has a capacity for
+            return (
+                self._capacity[rows].sum(axis=-1),
+                self._has_capacity[rows].sum(axis=-1),
+            )
+
+        # Capacity of the plant's own chemical
+        return self._capacity[rows, self._col("chemical")[rows]], np.ones_like(rows)
+
+    def _get_totals(self, by):
+        """Running totals per technology or region code, padded to all known codes"""
+        n_codes = len(TECHNOLOGY_CODES if by == "technology" else REGION_CODES)
+        totals = self._totals.get(by)
+        if totals is None:
+            rows = np.flatnonzero(self._alive())
+            totals = [
+                np.bincount(self._col(by)[rows], weights=values, minlength=n_codes)
+                for values in self._contribution(by, rows)
             ]
+        elif len(totals[0]) < n_codes:
+            totals = [np.pad(values, (0, n_codes - len(values))) for values in totals]
+
+        self._totals[by] = totals
+        return totals
+
+    def get_tech_totals(self):
+        """
+        Get the capacity and number of plants per technology
+
+        As in `get_tech`, a plant counts once for every chemical it has a capacity for.
+        The totals are kept up to date as plants are added and removed.
+
+        Returns:
+            Arrays of capacity and number of plants, indexed by technology code
+        """
+        capacity, number_of_plants = self._get_totals("technology")
+        return capacity.copy(), number_of_plants.copy()
+
+    def _own_yearly_volume(self, rows):
+        return (
+            self._capacity[rows, self._col("chemical")[rows]]
+            * self._col("capacity_factor")[rows]
         )
-        #drop chem and rename byproduct
-        df_byproduct = pd.DataFrame([*df.capacity], df.index).stack().rename_axis([None, 'chemicals']).reset_index(1,name='capacity')
-        df = df.explode("capacity")
-        df = df.rename(columns={"capacity":"byproduct"})
-        df = pd.concat([df,df_byproduct], axis=1)
-        df.drop(columns=["chemical", "byproduct"], inplace=True)
-        df.rename(columns={"chemicals":"chemical"}, inplace=True)
 
-        try:
-            return df.groupby(id_vars).agg(
-                capacity=("capacity", "sum"), number_of_plants=("capacity", "count")
+    def _get_volume_totals(self):
+        """Running volume totals, padded to all known technologies and regions"""
+        shape = (len(TECHNOLOGY_CODES), len(REGION_CODES))
+        volume = self._volume_totals
+        if volume is None:
+            rows = np.flatnonzero(self._alive())
+            volume = np.zeros(shape)
+            np.add.at(
+                volume,
+                (self._col("technology")[rows], self._col("region")[rows]),
+                self._own_yearly_volume(rows),
             )
-        except KeyError:
-            # There are no plants
-            return pd.DataFrame()
+        elif volume.shape != shape:
+            volume = np.pad(
+                volume,
+                [(0, shape[0] - volume.shape[0]), (0, shape[1] - volume.shape[1])],
+            )
+
+        self._volume_totals = volume
+        return volume
+
+    def get_tech_region_volume(self):
+        """
+        Get the yearly volume of the plants' own chemical per technology and region
+
+        The totals are kept up to date as plants are added and removed.
+
+        Returns:
+            Array indexed by technology code and region code
+        """
+        return self._get_volume_totals().copy()
 
     def get_new_plant_stack(self):
-        return PlantStack(
-            plants=[plant for plant in self.plants if plant.plant_status == "new"]
+        return self._subset(
+            self._alive() & (self._col("status") == PLANT_STATUSES.index("new"))
         )
 
     def get_old_plant_stack(self):
-        return PlantStack(
-            plants=[plant for plant in self.plants if plant.plant_status == "old"]
+        return self._subset(
+            self._alive() & (self._col("status") == PLANT_STATUSES.index("old"))
         )
 
-    def get_unique_tech(self, chemical=None):
-        if chemical is not None:
-            plants = self.filter_plants(chemical=chemical)
-        else:
-            plants = self.plants
+    def update_plant_status(self, year):
+        """Mark plants that have reached the end of their lifetime as old"""
+        table = self._table
+        alive = self._alive()
+        status = self._col("status")
+        old = PLANT_STATUSES.index("old")
 
-        valid_combos = {(plant.technology, plant.region) for plant in plants}
-        return pd.DataFrame(valid_combos, columns=["technology", "region"])
+        # Only the plants that are due in the calendar, plants that can still be in
+        # a later stack go back in the calendar
+        rows, later = [], []
+        while table.aging and table.aging[0][0] <= year:
+            entry = heapq.heappop(table.aging)
+            row = entry[1]
+            if status[row] == old:
+                continue
+            if alive[row]:
+                rows.append(row)
+            elif self._col("removed")[row] > year:
+                later.append(entry)
+        for entry in later:
+            heapq.heappush(table.aging, entry)
 
-    def get_regional_contribution(self):
-        df_agg = (
-            pd.DataFrame(
-                [
-                    {
-                        "region": plant.region,
-                        "capacity": plant.get_capacity(),
-                    }
-                    for plant in self.plants
-                ]
-            )
-            .groupby("region", as_index=False)
-            .sum()
+        status[rows] = old
+        if rows:
+            table.status_version += 1
+        for row in rows:
+            self._plants[row].plant_status = "old"
+        return self
+
+    def _first_key(self, row):
+        columns = ["chemical", "region", "technology"]
+        return tuple(int(self._col(column)[row]) for column in columns)
+
+    def _get_first_rows(self):
+        """Heaps of the rows in this stack in the order added, made when first needed"""
+        table, first_rows = self._first_rows
+        if table is self._table:
+            return first_rows
+
+        # Rows in the order added form a heap already
+        rows = np.flatnonzero(self._alive())
+        first_rows = {}
+        for chemical, region, technology, row in zip(
+            self._col("chemical")[rows].tolist(),
+            self._col("region")[rows].tolist(),
+            self._col("technology")[rows].tolist(),
+            rows.tolist(),
+        ):
+            first_rows.setdefault((chemical, region, technology), []).append(row)
+
+        self._first_rows = (self._table, first_rows)
+        return first_rows
+
+    def get_first_start_years(self, chemicals, regions, technologies) -> np.ndarray:
+        """
+        Get the start year of the first plant added (of its own chemical) for each
+        chemical, region and technology, NaN if there is none
+        """
+        first_rows = self._get_first_rows()
+        alive = self._alive()
+
+        start_years = {}
+        keys = zip(
+            CHEMICAL_CODES.get_many(chemicals).tolist(),
+            REGION_CODES.get_many(regions).tolist(),
+            TECHNOLOGY_CODES.get_many(technologies).tolist(),
         )
+        result = np.full(len(chemicals), np.nan)
+        for i, key in enumerate(keys):
+            if key not in start_years:
+                heap = first_rows.get(key, [])
+                while heap and not alive[heap[0]]:
+                    heapq.heappop(heap)
+                start_years[key] = self._col("start_year")[heap[0]] if heap else np.nan
+            result[i] = start_years[key]
+        return result
+
+    def get_unique_tech(self, chemical=None, **kwargs):
+        mask = self._mask(chemical=chemical, **kwargs)
+        valid_combos = np.unique(
+            np.stack([self._col("technology")[mask], self._col("region")[mask]]),
+            axis=1,
+        )
+        return pd.DataFrame(
+            {
+                "technology": TECHNOLOGY_CODES.to_labels(valid_combos[0]),
+                "region": REGION_CODES.to_labels(valid_combos[1]),
+            }
+        )
+
+    def get_regional_contribution(self):
+        capacity, number_of_plants = self._get_totals("region")
+        has_plants = number_of_plants > 0
+
+        df_agg = pd.DataFrame(
+            {
+                "region": REGION_CODES.to_labels(np.flatnonzero(has_plants)),
+                "capacity": capacity[has_plants],
+            }
+        ).sort_values("region", ignore_index=True)
         df_agg["proportion"] = df_agg["capacity"] / df_agg["capacity"].sum()
         return df_agg
 
+    def set_regional_quota(self, quota: dict = None):
+        """
+        Limit the capacity that can be added to each region from now on, on top of the
+        regional cap: a region that reached its quota is no longer below the cap. Copies
+        of the stack do not have the quota.
+
+        Args:
+            quota: Capacity that can be added per region, regions without a quota
+                can't get any. None for no quota.
+        """
+        if quota is None:
+            self._regional_quota = None
+        else:
+            added = np.zeros(len(REGION_CODES))
+            for region, capacity in quota.items():
+                added[REGION_CODES.code(region)] = capacity
+            capacity, _ = self._get_totals("region")
+            self._regional_quota = capacity + added
+        self._regions_below_cap = (None, None, None)
+        return self
+
+    def get_regional_quota_left(self) -> np.ndarray:
+        """
+        Get the capacity that can still be added to each region under its quota
+
+        Returns:
+            Array indexed by region code, infinite without a quota
+        """
+        capacity, _ = self._get_totals("region")
+        if self._regional_quota is None:
+            return np.full(len(capacity), np.inf)
+        limit = np.pad(
+            self._regional_quota, (0, len(capacity) - len(self._regional_quota))
+        )
+        return limit - capacity
+
+    def get_regions_below_cap(self, regional_cap):
+        """
+        Get the regions with plants whose share of the stack's capacity is below a cap,
+        and that did not reach their quota (see `set_regional_quota`)
+
+        The result is kept until a plant is added or removed.
+
+        Returns:
+            Dataframe with the regions, sorted by name
+        """
+        n_updates, cap, df_regions = self._regions_below_cap
+        if n_updates != self._n_updates or cap != regional_cap:
+            capacity, number_of_plants = self._get_totals("region")
+            with np.errstate(divide="ignore", invalid="ignore"):
+                proportion = capacity / capacity.sum()
+
+            valid = (
+                (number_of_plants > 0)
+                & (proportion < regional_cap)
+                & (self.get_regional_quota_left() > 0)
+            )
+            df_regions = pd.DataFrame(
+                {"region": np.sort(REGION_CODES.to_labels(np.flatnonzero(valid)))}
+            )
+            self._regions_below_cap = (self._n_updates, regional_cap, df_regions)
+
+        return df_regions
+
     def aggregate_stack(self, chemical=None, year=None, this_year=False):
 
         # Filter for chemical
-        if chemical is not None:
-            plants = self.filter_plants(chemical=chemical)
-        else:
-            plants = self.plants
+        mask = self._mask(chemical=chemical)
 
         # Keep only plants that were built in a year
         if this_year:
-            plants = [plant for plant in plants if plant.uuid in self.new_ids]
+            mask &= self._new()
 
-        # Calculate capacity and number of plants for new and retrofit
-        try:
-            df_agg = (
-                pd.DataFrame(
-                    [
-                        {
-                            "capacity": plant.get_capacity(chemical),
-                            "yearly_volume": plant.get_yearly_volume(chemical=chemical),
-                            "technology": plant.technology,
-                            "origin": plant.origin,
-                            "region": plant.region,
-                            "retrofit": plant.retrofit,
-                        }
-                        for plant in plants
-                    ]
-                )
-                .groupby(["origin", "technology", "region", "retrofit"], as_index=False)
-                .agg(
-                    capacity=("capacity", "sum"),
-                    number_of_plants=("capacity", "count"),
-                    yearly_volume=("yearly_volume", "sum"),
-                )
-            ).fillna(0)
-
-            # Helper column to avoid having True and False as column names
-            df_agg["build_type"] = "new_build"
-            df_agg.loc[df_agg.retrofit, "build_type"] = "retrofit"
-
-            df = df_agg.pivot_table(
-                values=["capacity", "number_of_plants", "yearly_volume"],
-                index=["region", "origin", "technology"],
-                columns="build_type",
-                dropna=False,
-                fill_value=0,
-            )
+        # No plants exist
+        if not mask.any():
+            return pd.DataFrame()
 
-            # Make sure all columns are present
-            for col in [
-                ("capacity", "retrofit"),
-                ("capacity", "new_build"),
-                ("number_of_plants", "retrofit"),
-                ("number_of_plants", "new_build"),
-                ("yearly_volume", "retrofit"),
-                ("yearly_volume", "new_build"),
-            ]:
-                if col not in df.columns:
-                    df[col] = 0
-
-            # Add totals
-            df[("capacity", "total")] = (
-                df[("capacity", "new_build")] + df[("capacity", "retrofit")]
-            )
-            df[("number_of_plants", "total")] = (
-                df[("number_of_plants", "new_build")]
-                + df[("number_of_plants", "retrofit")]
+        # Calculate capacity and number of plants for new and retrofit
+        capacity = self._capacity_of(chemical)[mask]
+        df_agg = (
+            pd.DataFrame(
+                {
+                    "capacity": capacity,
+                    "yearly_volume": capacity * self._col("capacity_factor")[mask],
+                    "technology": TECHNOLOGY_CODES.to_labels(
+                        self._col("technology")[mask]
+                    ),
+                    "origin": TECHNOLOGY_CODES.to_labels(self._col("origin")[mask]),
+                    "region": REGION_CODES.to_labels(self._col("region")[mask]),
+                    "retrofit": self._col("retrofit")[mask],
+                }
             )
-            df[("yearly_volume", "total")] = (
-                df[("yearly_volume", "new_build")] + df[("yearly_volume", "retrofit")]
+            .groupby(["origin", "technology", "region", "retrofit"], as_index=False)
+            .agg(
+                capacity=("capacity", "sum"),
+                number_of_plants=("capacity", "count"),
+                yearly_volume=("yearly_volume", "sum"),
             )
+        ).fillna(0)
 
-        # No plants exist
-        except KeyError:
-            return pd.DataFrame()
+        # Helper column to avoid having True and False as column names
+        df_agg["build_type"] = "new_build"
+        df_agg.loc[df_agg.retrofit, "build_type"] = "retrofit"
+
+        df = df_agg.pivot_table(
+            values=["capacity", "number_of_plants", "yearly_volume"],
+            index=["region", "origin", "technology"],
+            columns="build_type",
+            dropna=False,
+            fill_value=0,
+        )
+
+        # Make sure all columns are present
+        for col in [
+            ("capacity", "retrofit"),
+            ("capacity", "new_build"),
+            ("number_of_plants", "retrofit"),
+            ("number_of_plants", "new_build"),
+            ("yearly_volume", "retrofit"),
+            ("yearly_volume", "new_build"),
+        ]:
+            if col not in df.columns:
+                df[col] = 0
+
+        # Add totals
+        df[("capacity", "total")] = (
+            df[("capacity", "new_build")] + df[("capacity", "retrofit")]
+        )
+        df[("number_of_plants", "total")] = (
+            df[("number_of_plants", "new_build")]
+            + df[("number_of_plants", "retrofit")]
+        )
+        df[("yearly_volume", "total")] = (
+            df[("yearly_volume", "new_build")] + df[("yearly_volume", "retrofit")]
+        )
 
         df.columns.names = ["quantity", "build_type"]
 
@@ -360,63 +1227,100 @@ class PlantStack:
         return df
 
     def get_tech_plant_stack(self, technology: str):
-        return PlantStack(
-            plants=[plant for plant in self.plants if plant.technology == technology]
+        return self._subset(
+            self._alive()
+            & (self._col("technology") == TECHNOLOGY_CODES.get(technology))
         )
 
 
+# Plant arguments that come from the process data, with their process data column
+SPEC_COLUMNS = {
+    "technology": "technology",
+    "origin": "origin",
+    "region": "region",
+    "biomass_yearly": ("inputs", "Raw material", "biomass_yearly"),
+    "bio_oils_yearly": ("inputs", "Raw material", "bio_oils_yearly"),
+    "pyrolysis_oil_yearly": ("inputs", "Raw material", "pyrolysis_oil_yearly"),
+    "waste_water_yearly": ("inputs", "Raw material", "waste_water_yearly"),
+    "municipal_solid_waste_rdf_yearly": (
+        "inputs",
+        "Raw material",
+        "municipal_solid_waste_rdf_yearly",
+    ),
+    "methanol_black_yearly": ("inputs", "Raw material", "methanol_black_yearly"),
+    "methanol_green_yearly": ("inputs", "Raw material", "methanol_green_yearly"),
+    "ccs_total": ("emissions", "", "ccs_total"),
+    "ccs_yearly": ("emissions", "", "ccs_yearly"),
+    "plant_lifetime": ("spec", "", "plant_lifetime"),
+    "capacity_factor": ("spec", "", "capacity_factor"),
+}
+
+# Map tech type back from ints
+TYPES_OF_TECH = {1: "Initial", 2: "Transition", 3: "End-state"}
+
+
+class PlantSpecTable:
+    """
+    Specs of the plants that can be built, per (technology, year, region)
+
+    Made from the process data of a chemical and year, the first time a plant is made.
+    Each spec is a read-only mapping of `Plant` arguments, so making a plant does not
+    filter the process data.
+    """
+
+    def __init__(self, df_process_data: pd.DataFrame):
+        self.df_process_data = df_process_data
+        self._specs = None
+
+    def _make_specs(self):
+        df = self.df_process_data.reset_index()
+        columns = {
+            argument: df[column].values for argument, column in SPEC_COLUMNS.items()
+        }
+
+        specs = {}
+        for i, key in enumerate(
+            zip(columns["technology"], df["year"].values, columns["region"])
+        ):
+            # The first row counts if a technology is in the process data more than once
+            if key not in specs:
+                specs[key] = MappingProxyType(
+                    {argument: values[i] for argument, values in columns.items()}
+                )
+        return specs
+
+    def get(self, technology, year, region) -> MappingProxyType:
+        if self._specs is None:
+            self._specs = self._make_specs()
+        return self._specs[(technology, year, region)]
+
+
 def make_new_plant(
-    best_transition, df_process_data, year, retrofit, chemical, df_plant_capacities
+    best_transition, spec_table, year, retrofit, chemical, plant_capacities
 ):
     """
     Make a new plant, based on a transition entry from the ranking dataframe
 
     Args:
         best_transition: The best transition (destination is the plant to build)
-        df_process_data: The inputs dataframe (needed for plant specs)
+        spec_table: Specs of the plants that can be built
         year: Build the plant in this year
         retrofit: Plant is retrofitted from an old plant
 
     Returns:
         The new plant
     """
-    df_process_data = df_process_data.reset_index()
-    spec = df_process_data[
-        (df_process_data.technology == best_transition["destination"])
-        & (df_process_data.year == best_transition["year"])
-        & (df_process_data.region == best_transition["region"])
-    ]
-
-    # Map tech type back from ints
-    types_of_tech = {1: "Initial", 2: "Transition", 3: "End-state"}
-    type_of_tech = types_of_tech[best_transition["type_of_tech_destination"]]
+    spec = spec_table.get(
+        technology=best_transition["destination"],
+        year=best_transition["year"],
+        region=best_transition["region"],
+    )
 
     return Plant(
-        technology=first(spec["technology"]),
-        origin=first(spec["origin"]),
-        region=first(spec["region"]),
+        **spec,
         start_year=year,
         retrofit=retrofit,
-        biomass_yearly=first(spec["inputs", "Raw material", "biomass_yearly"]),
-        bio_oils_yearly=first(spec["inputs", "Raw material", "bio_oils_yearly"]),
-        pyrolysis_oil_yearly=first(
-            spec["inputs", "Raw material", "pyrolysis_oil_yearly"]
-        ),
-        waste_water_yearly=first(spec["inputs", "Raw material", "waste_water_yearly"]),
-        municipal_solid_waste_rdf_yearly=first(
-            spec["inputs", "Raw material", "municipal_solid_waste_rdf_yearly"]
-        ),
-        methanol_black_yearly=first(
-            spec["inputs", "Raw material", "methanol_black_yearly"]
-        ),
-        methanol_green_yearly=first(
-            spec["inputs", "Raw material", "methanol_green_yearly"]
-        ),
-        ccs_total=first(spec["emissions", "", "ccs_total"]),
-        ccs_yearly=first(spec["emissions", "", "ccs_yearly"]),
-        plant_lifetime=first(spec["spec", "", "plant_lifetime"]),
         chemical=chemical,
-        capacity_factor=first(spec["spec", "", "capacity_factor"]),
-        type_of_tech=type_of_tech,
-        df_plant_capacities=df_plant_capacities,
+        type_of_tech=TYPES_OF_TECH[best_transition["type_of_tech_destination"]],
+        plant_capacities=plant_capacities,
     )
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+from models.availability import GLOBAL_RESOURCES, REGIONAL_RESOURCES
+
+# Column with the yearly use of each resource, in the order of the remaining resources
+RESOURCE_USE = {**REGIONAL_RESOURCES, **GLOBAL_RESOURCES}
+
+
+class ResourceConstraints:
+    """
+    Feasibility of the candidates of a ranking under the remaining resources
+
+    The candidates (ranking rows merged with their resource use) are fixed for a
+    chemical and year, only the remaining resources change as plants are added or
+    removed. The check of every candidate against every resource is kept, and on an
+    update only the candidates in the regions and resources whose remainder changed
+    are checked again.
+    """
+
+    def __init__(self, df_candidates: pd.DataFrame, regions: list, sources: tuple):
+        """
+        Args:
+            df_candidates: Ranking merged with the remaining resources and resource use
+            regions: Regions of the remaining resources array, in order
+            sources: Objects the candidates are made from, to know when to remake them
+        """
+        self.df_candidates = df_candidates
+        self.sources = sources
+
+        region_index = {region: i for i, region in enumerate(regions)}
+        self._region = df_candidates["region"].map(region_index).values.astype(int)
+        self._use = df_candidates[list(RESOURCE_USE.values())].values.astype(float)
+        self._rows_per_region = [
+            np.flatnonzero(self._region == i) for i in range(len(regions))
+        ]
+
+        self._remaining = None
+        self._feasible = np.zeros(self._use.shape, dtype=bool)
+
+    def is_for(self, *sources) -> bool:
+        """Check if the candidates were made from these objects"""
+        return len(sources) == len(self.sources) and all(
+            source is own_source for source, own_source in zip(sources, self.sources)
+        )
+
+    def update(self, remaining: np.ndarray):
+        """Check the candidates again where the remaining resources changed"""
+        remaining = np.nan_to_num(remaining, nan=0.0)
+        if self._remaining is None:
+            changed = np.ones(remaining.shape, dtype=bool)
+        else:
+            changed = remaining != self._remaining
+
+        for region, resource in zip(*np.nonzero(changed)):
+            rows = self._rows_per_region[region]
+            self._feasible[rows, resource] = (
+                self._use[rows, resource] <= remaining[region, resource]
+            )
+
+        self._remaining = remaining
+        return self
+
+    def get_feasible(self, remaining: np.ndarray) -> pd.DataFrame:
+        """
+        Get the candidates that would not exceed one of the resource caps
+
+        Args:
+            remaining: Remaining resources, indexed by region and resource
+
+        Returns:
+            The feasible candidates, with the remaining resources of their region
+        """
+        self.update(remaining=remaining)
+        mask = self._feasible.all(axis=1)
+
+        df = self.df_candidates[mask].copy()
+        df[list(RESOURCE_USE)] = self._remaining[self._region[mask]]
+        return df
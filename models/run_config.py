@@ -0,0 +1,64 @@
+import config as config_module
+import config_template
+
+# Constants that define the model itself, the same for all runs in a process
+MODEL_CONSTANTS = [
+    "LOG_LEVEL",
+    "METHANOL_DEPENDENCY",
+    "METHANOL_SUPPLY_TECH",
+    "METHANOL_DEMAND_TECH",
+    "METHANOL_TYPES",
+]
+
+
+def _get_constants(module) -> dict:
+    return {name: getattr(module, name) for name in dir(module) if name.isupper()}
+
+
+# Constants that config.py does not have, e.g. when it was made from an older version
+# of config_template.py. They take their value from config_template.py.
+DEFAULT_CONSTANTS = sorted(
+    set(_get_constants(config_template)) - set(_get_constants(config_module))
+)
+
+
+class RunConfig:
+    """
+    Config constants of one model run
+
+    Starts from the constants in config.py, with the values changed for this run. The
+    run passes it to its sections, pathway and importers, so that runs with different
+    constants (e.g. the runs of a parameter sweep) can share one process. Constants are
+    read as attributes, e.g. `config.RETROFIT_CAP`. Constants that config.py derives
+    from others (e.g. MAX_PLANTS_RAMP_UP) are not recalculated, and need to be changed
+    themselves. The constants in MODEL_CONSTANTS define the model itself and can't be
+    changed per run, and the constants in DEFAULT_CONSTANTS come from
+    config_template.py.
+    """
+
+    def __init__(self, **overrides):
+        """
+        Args:
+            overrides: Values of config constants for this run, by name
+        """
+        constants = {
+            **_get_constants(config_template),
+            **_get_constants(config_module),
+        }
+        unknown = set(overrides) - set(constants)
+        if unknown:
+            raise ValueError(f"Config constants {sorted(unknown)} do not exist")
+        fixed = set(overrides) & set(MODEL_CONSTANTS)
+        if fixed:
+            raise ValueError(f"Config constants {sorted(fixed)} can't change per run")
+
+        self.__dict__.update(constants)
+        self.__dict__.update(overrides)
+        self.overrides = overrides
+
+    def replace(self, **overrides):
+        """Copy of this config with more constants changed"""
+        return RunConfig(**{**self.overrides, **overrides})
+
+    def __repr__(self):
+        return f"RunConfig({self.overrides})"
@@ -0,0 +1,150 @@
+import logging
+import multiprocessing as mp
+import time
+import traceback
+from multiprocessing.connection import wait
+
+from config import LOG_LEVEL
+
+logger = logging.getLogger(__name__)
+logger.setLevel(LOG_LEVEL)
+
+
+def _run_in_worker(func, args, conn):
+    """Run a function in a worker process, and send back the traceback if it fails"""
+    try:
+        func(*args)
+    except BaseException:
+        conn.send(traceback.format_exc())
+        conn.close()
+        raise SystemExit(1)
+    conn.send(None)
+    conn.close()
+
+
+class RunScheduler:
+    """
+    Run a function for a list of runs, each in its own worker process
+
+    At most `max_workers` runs are executed at the same time. Every run is tracked until
+    its worker exits: a run fails when it raises (the worker traceback is kept) or when
+    its worker exits with a non-zero code without reporting, e.g. when it is killed for
+    running out of memory. Failed runs are tried again up to `retries` times.
+    """
+
+    def __init__(self, func, max_workers: int = None, retries: int = 0):
+        """
+        Args:
+            func: Module level function, called with the arguments of each run
+            max_workers: Maximum number of runs at the same time, defaults to the cores
+            retries: Number of times a failed run is tried again
+        """
+        self.func = func
+        self.max_workers = max_workers or mp.cpu_count()
+        self.retries = retries
+
+    def run(self, runs: list) -> list:
+        """
+        Execute the runs, and wait until all of them succeeded or failed
+
+        Args:
+            runs: Arguments of each run, as tuples
+
+        Returns:
+            Summary of each run, in the order of the runs: its arguments, status
+                ("succeeded" or "failed"), exit code, number of attempts, duration of the
+                last attempt in seconds and the traceback of the last failure
+        """
+        summary = [
+            {
+                "run": list(run),
+                "status": None,
+                "exit_code": None,
+                "attempts": 0,
+                "duration": None,
+                "error": None,
+            }
+            for run in runs
+        ]
+        queue = list(range(len(runs)))
+        running = {}
+        n_done = 0
+
+        logger.info(f"Running {len(runs)} runs on {self.max_workers} workers")
+        while queue or running:
+            while queue and len(running) < self.max_workers:
+                i = queue.pop(0)
+                running[i] = self._start(runs[i])
+                summary[i]["attempts"] += 1
+
+            # Wait until a worker reports back or exits
+            handles = [worker["process"].sentinel for worker in running.values()]
+            handles += [
+                worker["conn"]
+                for worker in running.values()
+                if worker["conn"] is not None
+            ]
+            ready = wait(handles)
+            for i, worker in list(running.items()):
+                process, conn = worker["process"], worker["conn"]
+                if conn is not None and conn in ready:
+                    try:
+                        worker["error"] = conn.recv()
+                    except EOFError:
+                        pass
+                    conn.close()
+                    worker["conn"] = None
+                if process.sentinel not in ready:
+                    continue
+
+                process.join()
+                if worker["conn"] is not None:
+                    worker["conn"].close()
+                del running[i]
+
+                result = summary[i]
+                result["exit_code"] = process.exitcode
+                result["duration"] = round(time.perf_counter() - worker["start"], 1)
+                if process.exitcode == 0:
+                    result["status"] = "succeeded"
+                    result["error"] = None
+                else:
+                    result["status"] = "failed"
+                    result["error"] = worker["error"] or (
+                        f"Worker exited with code {process.exitcode}"
+                    )
+
+                if result["status"] == "failed" and result["attempts"] <= self.retries:
+                    logger.warning(
+                        f"Run {runs[i]} failed (attempt {result['attempts']}), "
+                        f"trying again:\n{result['error']}"
+                    )
+                    queue.append(i)
+                    continue
+
+                n_done += 1
+                message = (
+                    f"Run {n_done}/{len(runs)} {runs[i]} {result['status']} "
+                    f"in {result['duration']}s"
+                )
+                if result["status"] == "succeeded":
+                    logger.info(message)
+                else:
+                    logger.error(f"{message}:\n{result['error']}")
+
+        return summary
+
+    def _start(self, run: tuple):
+        """Start a worker process for a run"""
+        receive_conn, send_conn = mp.Pipe(duplex=False)
+        process = mp.Process(
+            target=_run_in_worker, args=(self.func, run, send_conn), daemon=False
+        )
+        process.start()
+        send_conn.close()
+        return {
+            "process": process,
+            "conn": receive_conn,
+            "start": time.perf_counter(),
+            "error": None,
+        }
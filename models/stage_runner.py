@@ -0,0 +1,146 @@
+import hashlib
+import json
+import logging
+from pathlib import Path
+
+from config import LOG_LEVEL
+from models.run_config import RunConfig
+
+logger = logging.getLogger(__name__)
+logger.setLevel(LOG_LEVEL)
+
+ROOT_PATH = Path(__file__).resolve().parents[1]
+
+
+class Stage:
+    """
+    A section of the model, with the artifacts it depends on and the ones it makes
+
+    Paths are glob patterns: `files` are relative to the repository (input data and
+    code), `inputs` and `outputs` are relative to the output directory of the run.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func,
+        files: list = (),
+        inputs: list = (),
+        config: list = (),
+        outputs: list = (),
+    ):
+        self.name = name
+        self.func = func
+        self.files = list(files)
+        self.inputs = list(inputs)
+        self.config = list(config)
+        self.outputs = list(outputs)
+
+
+class StageRunner:
+    """
+    Run the stages of one model run, skipping the stages whose inputs did not change
+
+    The fingerprint of a stage hashes the arguments of the run, the values of its config
+    constants and the contents of its files and inputs. It is stored in `stages.json`
+    in the output directory of the run after the stage succeeded; a stage is skipped
+    when its fingerprint matches the stored one and all its outputs exist. Since the
+    inputs of a stage are the outputs of the stages before it (its own outputs are not
+    part of its inputs), a change only runs the stages downstream of it. File hashes
+    are kept with the size and modification time of the file, so unchanged files are
+    not read again. Stage functions are called with the config of the run.
+    """
+
+    def __init__(
+        self, output_dir: Path, skip_unchanged: bool = True, config: RunConfig = None
+    ):
+        self.output_dir = Path(output_dir)
+        self.skip_unchanged = skip_unchanged
+        self.config = config or RunConfig()
+        self.state_path = self.output_dir.joinpath("stages.json")
+        self.state = self._load_state()
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            state = {}
+        state.setdefault("stages", {})
+        state.setdefault("files", {})
+        return state
+
+    def _save_state(self):
+        self.output_dir.mkdir(exist_ok=True, parents=True)
+        with open(self.state_path, "w") as f:
+            json.dump(self.state, f, indent=2)
+
+    def _hash_file(self, path: Path) -> str:
+        """Hash the contents of a file, unless its size and modification time match"""
+        stat = path.stat()
+        key = str(path)
+        cached = self.state["files"].get(key)
+        if cached is not None and cached[:2] == [stat.st_mtime_ns, stat.st_size]:
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        self.state["files"][key] = [stat.st_mtime_ns, stat.st_size, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def _hash_paths(self, digest, base_path: Path, patterns: list, exclude=()):
+        for pattern in patterns:
+            for path in sorted(base_path.glob(pattern)):
+                if path.is_file() and path not in exclude:
+                    relative_path = path.relative_to(base_path).as_posix()
+                    digest.update(f"{relative_path}:{self._hash_file(path)}\n".encode())
+
+    def fingerprint(self, stage: Stage, **kwargs) -> str:
+        """Hash the run arguments, config constants, files and inputs of a stage"""
+        digest = hashlib.sha256()
+        digest.update(f"{stage.name}:{sorted(kwargs.items())}\n".encode())
+        for name in stage.config:
+            digest.update(f"{name}={getattr(self.config, name)!r}\n".encode())
+        self._hash_paths(digest, ROOT_PATH, stage.files)
+        # The outputs of the stage itself are made after the fingerprint, so they are
+        # left out even when the patterns of its inputs match them
+        outputs = {
+            path for pattern in stage.outputs for path in self.output_dir.glob(pattern)
+        }
+        self._hash_paths(digest, self.output_dir, stage.inputs, exclude=outputs)
+        return digest.hexdigest()
+
+    def _has_outputs(self, stage: Stage) -> bool:
+        return all(any(self.output_dir.glob(pattern)) for pattern in stage.outputs)
+
+    def run(self, stage: Stage, **kwargs) -> bool:
+        """
+        Run a stage, unless it is unchanged since its last successful run
+
+        Args:
+            stage: Stage to run
+            kwargs: Arguments of the stage function
+
+        Returns:
+            True if the stage was run, False if it was skipped
+        """
+        fingerprint = self.fingerprint(stage, **kwargs)
+        if (
+            self.skip_unchanged
+            and self.state["stages"].get(stage.name) == fingerprint
+            and self._has_outputs(stage)
+        ):
+            logger.info(f"Skipping section {stage.name}, its inputs did not change")
+            return False
+
+        # Forget the previous run first, in case this one fails halfway
+        self.state["stages"].pop(stage.name, None)
+        self._save_state()
+
+        stage.func(config=self.config, **kwargs)
+
+        self.state["stages"][stage.name] = fingerprint
+        self._save_state()
+        return True
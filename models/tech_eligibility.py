@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+from models.plant import CHEMICAL_CODES, TECHNOLOGY_CODES
+
+
+class TechEligibility:
+    """
+    Which technologies a chemical can use, as boolean masks over technology codes
+
+    Made once per pathway from the tech table and the multi product ratios, indexed by
+    (chemical code, technology code). Filtering a ranking on one of the rules is then
+    an array lookup on the codes of its chemical and technology columns, instead of a
+    merge. Chemicals and technologies that are not in the tech table are never eligible.
+    """
+
+    def __init__(self, df_tech: pd.DataFrame, df_multi_product_ratio: pd.DataFrame):
+        chemicals = [CHEMICAL_CODES.code(chemical) for chemical in df_tech.chemical]
+        technologies = [
+            TECHNOLOGY_CODES.code(technology) for technology in df_tech.technology
+        ]
+        multi_product_technologies = [
+            TECHNOLOGY_CODES.code(technology)
+            for technology in df_multi_product_ratio.technology
+        ]
+        primary_chemicals = [
+            CHEMICAL_CODES.code(chemical)
+            for chemical in df_multi_product_ratio.primary_chemical
+        ]
+
+        # One more row and column, that unknown codes (-1) point to
+        self.n_chemicals = len(CHEMICAL_CODES)
+        self.n_technologies = len(TECHNOLOGY_CODES)
+        shape = (self.n_chemicals + 1, self.n_technologies + 1)
+
+        self.available_from = np.full(shape, np.nan)
+        self.available_until = np.full(shape, np.nan)
+        self.initial = np.zeros(shape, dtype=bool)
+        self.non_initial = np.zeros(shape, dtype=bool)
+        self.non_fossil = np.zeros(shape, dtype=bool)
+
+        cells = (chemicals, technologies)
+        self.available_from[cells] = df_tech.available_from.values
+        self.available_until[cells] = df_tech.available_until.values
+        self.initial[cells] = (df_tech.type_of_tech == "Initial").values
+        self.non_initial[cells] = (df_tech.type_of_tech != "Initial").values
+        self.non_fossil[cells] = ~df_tech.category_detailed.str.contains(
+            "Fossil"
+        ).values
+
+        # Multi product tech can only be used by its primary chemical
+        self.multi_product = np.zeros(shape[1], dtype=bool)
+        self.multi_product[multi_product_technologies] = True
+        self.primary = np.zeros(shape, dtype=bool)
+        self.primary[primary_chemicals, multi_product_technologies] = True
+
+    def _chemical_codes(self, chemicals) -> np.ndarray:
+        codes = CHEMICAL_CODES.get_many(chemicals)
+        codes[codes >= self.n_chemicals] = -1
+        return codes
+
+    def _technology_codes(self, technologies) -> np.ndarray:
+        codes = TECHNOLOGY_CODES.get_many(technologies)
+        codes[codes >= self.n_technologies] = -1
+        return codes
+
+    def is_available(self, chemical, year, technologies) -> np.ndarray:
+        """Technologies of the chemical that are available in a year"""
+        c = self._chemical_codes([chemical])[0]
+        t = self._technology_codes(technologies)
+        return (self.available_from[c, t] <= year) & (
+            year <= self.available_until[c, t]
+        )
+
+    def is_initial(self, chemicals, technologies) -> np.ndarray:
+        """Technologies that are initial tech of their chemical"""
+        return self.initial[
+            self._chemical_codes(chemicals), self._technology_codes(technologies)
+        ]
+
+    def is_non_initial(self, technologies) -> np.ndarray:
+        """Technologies that are not initial tech of at least one chemical"""
+        return self.non_initial.any(axis=0)[self._technology_codes(technologies)]
+
+    def is_non_fossil(self, chemicals, technologies) -> np.ndarray:
+        """Technologies that are not fossil tech of their chemical"""
+        return self.non_fossil[
+            self._chemical_codes(chemicals), self._technology_codes(technologies)
+        ]
+
+    def is_primary(self, chemical, chemicals, technologies) -> np.ndarray:
+        """
+        Technologies that a chemical can use: single product tech, or multi product tech
+        of which it is the primary chemical (for rows of that chemical only)
+        """
+        c = self._chemical_codes([chemical])[0]
+        t = self._technology_codes(technologies)
+        is_chemical = self._chemical_codes(chemicals) == c
+        return ~self.multi_product[t] | (self.primary[c, t] & is_chemical & (c >= 0))
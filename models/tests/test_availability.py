@@ -0,0 +1,142 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from models.availability import AvailabilityLedger
+
+
+def _make_ledger():
+    rows = []
+    for year in [2020, 2021]:
+        for region in ["Africa", "Europe"]:
+            for name in ["Biomass", "CO2 storage", "Waste water"]:
+                rows.append((name, region, 100.0, "t", year))
+        for name in ["Methanol - Black", "Methanol - Green"]:
+            rows.append((name, "World", np.nan, "t", year))
+
+    df = pd.DataFrame(rows, columns=["name", "region", "cap", "unit", "year"])
+    df["used"] = 0
+    df["Ethylene_cap"] = np.where(df.region == "World", np.nan, df.cap * 0.5)
+    df["Ethylene_used"] = np.where(df.region == "World", np.nan, 0)
+    return AvailabilityLedger(df_availability=df, chemicals=["Ethylene"])
+
+
+def _make_plant(**kwargs):
+    usage = dict(
+        chemical="Ethylene",
+        region="Africa",
+        biomass_yearly=0,
+        ccs_yearly=0,
+        waste_water_yearly=0,
+        pyrolysis_oil_yearly=0,
+        bio_oils_yearly=0,
+        municipal_solid_waste_rdf_yearly=0,
+        methanol_black_yearly=0,
+        methanol_green_yearly=0,
+    )
+    usage.update(kwargs)
+    return SimpleNamespace(**usage)
+
+
+def test_update_from_plant():
+    """Adding and removing a plant should only change its own region and year"""
+    ledger = _make_ledger()
+    plant = _make_plant(biomass_yearly=30, methanol_black_yearly=5)
+
+    ledger.update_from_plant(plant=plant, year=2020)
+    df = ledger.to_dataframe(year=2020).set_index(["name", "region"])
+    assert df.loc[("Biomass", "Africa"), "used"] == 30
+    assert df.loc[("Biomass", "Africa"), "Ethylene_used"] == 30
+    assert df.loc[("Biomass", "Europe"), "used"] == 0
+    assert df.loc[("Methanol - Black", "World"), "used"] == 5
+    assert ledger.to_dataframe(year=2021, name="Biomass").used.sum() == 0
+
+    ledger.update_from_plant(plant=plant, year=2020, remove=True)
+    assert ledger.to_dataframe(year=2020).used.sum() == 0
+
+
+def test_update_from_plants():
+    """Updating for plants at once should give the same amounts used as one by one"""
+    ledger = _make_ledger()
+    other_ledger = _make_ledger()
+    added = [
+        _make_plant(biomass_yearly=30, methanol_black_yearly=5),
+        _make_plant(region="Europe", chemical="Benzene", ccs_yearly=10),
+    ]
+    removed = [_make_plant(biomass_yearly=20)]
+
+    ledger.update_from_plants(year=2020, added=added, removed=removed)
+    for plant in removed:
+        other_ledger.update_from_plant(plant=plant, year=2020, remove=True)
+    for plant in added:
+        other_ledger.update_from_plant(plant=plant, year=2020)
+    pd.testing.assert_frame_equal(ledger.to_dataframe(), other_ledger.to_dataframe())
+
+
+def test_get_remaining():
+    """Biomass and CO2 storage are capped on the chemical's share, others on the total"""
+    ledger = _make_ledger()
+    ledger.set_value(name="Methanol - Black", year=2020, cap=50, used=20)
+    ledger.update_from_plant(
+        plant=_make_plant(biomass_yearly=30, waste_water_yearly=30), year=2020
+    )
+
+    df = ledger.get_remaining(year=2020, chemical="Ethylene")
+    assert df.loc["Africa", "Biomass"] == 20
+    assert df.loc["Africa", "Waste water"] == 70
+    assert df.loc["Europe", "CO2 storage"] == 50
+    assert (df["Methanol - Black"] == 30).all()
+    assert "World" not in df.index
+
+
+def test_to_dataframe_layout():
+    """Export should have the same rows and columns the ledger was created from"""
+    ledger = _make_ledger()
+    ledger.update_from_plant(plant=_make_plant(ccs_yearly=10), year=2020)
+    ledger.copy_year(year=2020)
+
+    df = ledger.to_dataframe()
+    assert list(df.columns) == [
+        "name",
+        "region",
+        "cap",
+        "unit",
+        "year",
+        "used",
+        "Ethylene_cap",
+        "Ethylene_used",
+    ]
+    assert len(df) == 16
+    df_ccs = df[(df.name == "CO2 storage") & (df.region == "Africa")]
+    assert df_ccs.used.tolist() == [10, 10]
+
+
+def test_partitioned():
+    """Partitioned, every regional resource is capped on the chemical's share"""
+    ledger = _make_ledger()
+    ledger.update_from_plant(plant=_make_plant(waste_water_yearly=30), year=2020)
+
+    ledger.set_partitioned(True)
+    assert ledger.get_remaining(year=2020, chemical="Ethylene").loc[
+        "Africa", "Waste water"
+    ] == 20
+    ledger.set_partitioned(False)
+    assert ledger.get_remaining(year=2020, chemical="Ethylene").loc[
+        "Africa", "Waste water"
+    ] == 70
+
+
+def test_add_used():
+    """Adding the changes made to a copy should give the same amounts used"""
+    ledger = _make_ledger()
+    copy = _make_ledger()
+    used, chemical_used = copy.get_used(year=2020)
+    copy.update_from_plant(plant=_make_plant(biomass_yearly=30), year=2020)
+    copy.update_from_plant(plant=_make_plant(methanol_green_yearly=5), year=2020)
+    new_used, new_chemical_used = copy.get_used(year=2020)
+
+    ledger.add_used(
+        year=2020, used=new_used - used, chemical_used=new_chemical_used - chemical_used
+    )
+    pd.testing.assert_frame_equal(ledger.to_dataframe(), copy.to_dataframe())
@@ -0,0 +1,52 @@
+import pytest
+
+from models.parameter_sweep import ParameterSweep
+
+
+def test_points():
+    """Should expand a grid to all combinations, and a random design reproducibly"""
+    grid = ParameterSweep({"RETROFIT_CAP": [0.05, 0.1], "REGIONAL_CAP": [0.2, 0.3]})
+    assert grid.points() == [
+        {"RETROFIT_CAP": 0.05, "REGIONAL_CAP": 0.2},
+        {"RETROFIT_CAP": 0.05, "REGIONAL_CAP": 0.3},
+        {"RETROFIT_CAP": 0.1, "REGIONAL_CAP": 0.2},
+        {"RETROFIT_CAP": 0.1, "REGIONAL_CAP": 0.3},
+    ]
+
+    parameters = {"RETROFIT_CAP": (0.01, 0.1), "NUMBER_OF_BINS_RANKING": (10, 50)}
+    points = ParameterSweep(parameters, design="random", samples=5, seed=1).points()
+    assert points == ParameterSweep(
+        parameters, design="random", samples=5, seed=1
+    ).points()
+    assert len(points) == 5
+    for point in points:
+        assert 0.01 <= point["RETROFIT_CAP"] <= 0.1
+        assert isinstance(point["NUMBER_OF_BINS_RANKING"], int)
+    assert len({ParameterSweep.name(point) for point in points}) == 5
+
+    with pytest.raises(ValueError):
+        ParameterSweep({"RETROFIT_CAP": (0.01, 0.1)})
+
+
+def test_ensemble():
+    """Should run every combination for the same, reproducible seeds"""
+    sweep = ParameterSweep(
+        {"RETROFIT_CAP": [0.05, 0.1]}, ensemble_size=3, ensemble_seed=1
+    )
+    seeds = sweep.ensemble_seeds()
+    assert len(set(seeds)) == 3
+    assert seeds == sweep.ensemble_seeds()
+    assert seeds != ParameterSweep({}, ensemble_size=3).ensemble_seeds()
+    assert sweep.points() == [
+        {"RETROFIT_CAP": retrofit_cap, "RANDOM_SEED": seed}
+        for retrofit_cap in [0.05, 0.1]
+        for seed in seeds
+    ]
+
+    ensemble = ParameterSweep({}, ensemble_size=2)
+    assert ensemble.points() == [
+        {"RANDOM_SEED": seed} for seed in ensemble.ensemble_seeds()
+    ]
+
+    with pytest.raises(ValueError):
+        ParameterSweep({"RANDOM_SEED": [1, 2]}, ensemble_size=2)
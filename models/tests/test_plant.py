@@ -1,7 +1,19 @@
+import pickle
+
+import numpy as np
 import pandas as pd
 import pytest
 
-from models.plant import Plant
+from models.plant import (
+    SPEC_COLUMNS,
+    Plant,
+    PlantSpecTable,
+    PlantStack,
+    get_next_plant_id,
+    make_capacity_index,
+    make_new_plant,
+    renumber_plant,
+)
 
 
 def _make_plant(chemical, technology):
@@ -20,6 +32,7 @@ def _make_plant(chemical, technology):
 
     return Plant(
         technology=technology,
+        origin="Non-existent",
         region="Africa",
         start_year=2020,
         capacity_factor=1,
@@ -32,10 +45,11 @@ def _make_plant(chemical, technology):
         methanol_black_yearly=0,
         methanol_green_yearly=0,
         ccs_total=0,
+        ccs_yearly=0,
         plant_lifetime=30,
         retrofit=False,
         plant_status="new",
-        df_plant_capacities=plant_capacities,
+        plant_capacities=make_capacity_index(plant_capacities),
     )
 
 
@@ -65,3 +79,214 @@ def test_byproducts():
     """Should give back the right byproducts"""
     plant = _make_plant(chemical="Ethylene", technology="MTO - Black")
     assert "Propylene" in plant.byproducts
+
+
+def test_stack_copy_shares_plants():
+    """Changing next year's stack should leave this year's stack as it was"""
+    plants = [
+        _make_plant(chemical="Ethylene", technology="MTO - Black") for _ in range(3)
+    ]
+    stack = PlantStack(plants=plants[:2], year=2020)
+    next_stack = stack.copy(year=2021)
+    assert next_stack._table is stack._table
+
+    next_stack.remove(plants[0])
+    next_stack.append(plants[2])
+    assert stack.plants == plants[:2]
+    assert next_stack.plants == plants[1:]
+
+    # Retrofit in both years at once, as for forced retrofits
+    new_plant = _make_plant(chemical="Ethylene", technology="MTO - Black")
+    next_stack.remove(plants[1])
+    stack.remove(plants[1])
+    next_stack.append(new_plant)
+    stack.append(new_plant)
+    assert stack.plants == [plants[0], new_plant]
+    assert next_stack.plants == [plants[2], new_plant]
+    assert next_stack.get_capacity(chemical="Ethylene") == 200
+
+
+def test_apply_worker_plants():
+    """Plants made in another process should be found and renumbered in this one"""
+    plants = [
+        _make_plant(chemical="Ethylene", technology="MTO - Black") for _ in range(2)
+    ]
+    stack = PlantStack(plants=plants, year=2020)
+    assert stack.get_plant(plants[1].uuid) is plants[1]
+
+    worker_plant = pickle.loads(pickle.dumps(plants[0]))
+    renumber_plant(worker_plant)
+    assert worker_plant.uuid not in [plant.uuid for plant in plants]
+    stack.remove(stack.get_plant(plants[0].uuid))
+    stack.append(worker_plant)
+    assert stack.plants == [plants[1], worker_plant]
+    with pytest.raises(ValueError):
+        stack.get_plant(plants[0].uuid)
+
+
+def test_extend_stack():
+    """Adding plants at once should give the same stack and totals as one by one"""
+    plants = [
+        _make_plant(chemical=chemical, technology="MTO - Black")
+        for chemical in ["Ethylene", "Propylene", "Ethylene"]
+    ]
+    stack = PlantStack(plants=plants[:1], year=2020)
+    other_stack = PlantStack(plants=plants[:1], year=2020)
+    for some_stack in [stack, other_stack]:
+        some_stack.get_tech_totals()
+        some_stack.get_regions_below_cap(regional_cap=0.5)
+
+    stack.extend(plants[1:])
+    for plant in plants[1:]:
+        other_stack.append(plant)
+    assert stack.plants == other_stack.plants == plants
+    assert stack.new_ids == other_stack.new_ids
+    for totals, other_totals in zip(
+        stack.get_tech_totals(), other_stack.get_tech_totals()
+    ):
+        np.testing.assert_array_equal(totals, other_totals)
+    pd.testing.assert_frame_equal(
+        stack.get_regional_contribution(), other_stack.get_regional_contribution()
+    )
+
+
+def test_remove_many():
+    """Removing plants at once should give the same stack and totals as one by one"""
+    plants = [
+        _make_plant(chemical=chemical, technology="MTO - Black")
+        for chemical in ["Ethylene", "Propylene", "Ethylene"]
+    ]
+    stack = PlantStack(plants=plants, year=2020)
+    other_stack = PlantStack(plants=plants, year=2020)
+    for some_stack in [stack, other_stack]:
+        some_stack.get_tech_totals()
+        some_stack.get_regions_below_cap(regional_cap=0.5)
+
+    stack.remove_many(plants[1:])
+    for plant in plants[1:]:
+        other_stack.remove(plant)
+    assert stack.plants == other_stack.plants == plants[:1]
+    for totals, other_totals in zip(
+        stack.get_tech_totals(), other_stack.get_tech_totals()
+    ):
+        np.testing.assert_array_equal(totals, other_totals)
+    pd.testing.assert_frame_equal(
+        stack.get_regional_contribution(), other_stack.get_regional_contribution()
+    )
+    with pytest.raises(ValueError):
+        stack.remove_many(plants[:2])
+
+
+def test_get_oldest_plant():
+    """Should give the oldest plant still in the stack, the first one added if equal"""
+    plants = []
+    for start_year in [2010, 2000, 2000, 2005]:
+        plant = _make_plant(chemical="Ethylene", technology="MTO - Black")
+        plant.start_year = start_year
+        plants.append(plant)
+    stack = PlantStack(plants=plants, year=2020)
+    spec = dict(technology="MTO - Black", region="Africa")
+
+    # Byproducts count as well
+    assert stack.get_oldest_plant(chemical="Propylene", **spec) is plants[1]
+    stack.remove(plants[1])
+    assert stack.get_oldest_plant(chemical="Ethylene", **spec) is plants[2]
+    stack.remove(plants[2])
+    assert stack.get_oldest_plant(chemical="Ethylene", **spec) is plants[3]
+    assert stack.get_oldest_plant(chemical="Ammonia", **spec) is None
+
+
+def test_make_new_plant():
+    """Should make the plant from the first process data row of its tech and region"""
+    rows = [
+        ("MTO - Black", "Naphtha steam cracking", "Africa", 2.0),
+        ("MTO - Black", "Ethane steam cracking", "Africa", 3.0),
+        ("MTO - Black", "Naphtha steam cracking", "Europe", 4.0),
+    ]
+    index = pd.MultiIndex.from_tuples(
+        [row[:3] for row in rows], names=["technology", "origin", "region"]
+    )
+    columns = pd.MultiIndex.from_tuples(
+        [column for column in SPEC_COLUMNS.values() if isinstance(column, tuple)],
+        names=["category", "type", "name"],
+    )
+    df_process_data = pd.DataFrame(1.0, index=index, columns=columns)
+    df_process_data[("inputs", "Raw material", "methanol_black_yearly")] = [
+        row[3] for row in rows
+    ]
+    df_process_data["year"] = 2030
+
+    plant = make_new_plant(
+        best_transition={
+            "destination": "MTO - Black",
+            "region": "Africa",
+            "year": 2030,
+            "type_of_tech_destination": 2,
+        },
+        spec_table=PlantSpecTable(df_process_data),
+        year=2030,
+        retrofit=True,
+        chemical="Ethylene",
+        plant_capacities={},
+    )
+    assert plant.origin == "Naphtha steam cracking"
+    assert plant.methanol_black_yearly == 2.0
+    assert plant.type_of_tech == "Transition"
+    assert plant.retrofit
+
+
+def test_update_plant_status():
+    """Only plants in the stack that reached their lifetime should become old"""
+    plants = []
+    for start_year in [1990, 2000, 2005]:
+        plant = _make_plant(chemical="Ethylene", technology="MTO - Black")
+        plant.start_year = start_year
+        plants.append(plant)
+    stack = PlantStack(plants=plants, year=2020)
+    stack.remove(plants[1])
+
+    stack.update_plant_status(year=2030)
+    assert [plant.plant_status for plant in plants] == ["old", "new", "new"]
+
+    next_stack = stack.copy(year=2035)
+    next_stack.update_plant_status(year=2035)
+    assert [plant.plant_status for plant in plants] == ["old", "new", "old"]
+
+
+def test_get_first_start_years():
+    """Should give the start year of the first plant added that is still in the stack"""
+    plants = []
+    for start_year in [2010, 2000, 2005]:
+        plant = _make_plant(chemical="Ethylene", technology="MTO - Black")
+        plant.start_year = start_year
+        plants.append(plant)
+    stack = PlantStack(plants=plants, year=2020)
+    spec = dict(regions=["Africa", "Africa"], technologies=["MTO - Black", "PDH"])
+
+    start_years = stack.get_first_start_years(chemicals=["Ethylene"] * 2, **spec)
+    assert start_years[0] == 2010
+    assert np.isnan(start_years[1])
+
+    stack.remove(plants[0])
+    start_years = stack.get_first_start_years(chemicals=["Ethylene"] * 2, **spec)
+    assert start_years[0] == 2000
+
+
+def test_pickle_stack():
+    """A pickled stack should keep its plants, and new plants their own identifiers"""
+    stack = PlantStack(
+        [_make_plant(chemical="Ethylene", technology="MTO - Black") for _ in range(2)],
+        year=2020,
+    )
+    next_id = get_next_plant_id()
+
+    stack = pickle.loads(pickle.dumps(stack.copy(year=2021)))
+    plant = _make_plant(chemical="Ethylene", technology="MTO - Black")
+
+    assert plant.uuid == next_id
+    assert stack.get_capacity(chemical="Propylene") == 300
+    assert dict(stack.plants[0].capacities) == {
+        "Ethylene": 100,
+        "Propylene": 150,
+        "Xylene": 50,
+    }
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+from models.resource_constraints import RESOURCE_USE, ResourceConstraints
+
+
+def test_get_feasible():
+    """Only candidates in a region where a resource changed should be checked again"""
+    df_candidates = pd.DataFrame(
+        {
+            "destination": ["A", "B", "C"],
+            "region": ["Africa", "Europe", "Europe"],
+            **{resource: 0.0 for resource in RESOURCE_USE},
+            **{use: 0.0 for use in RESOURCE_USE.values()},
+        }
+    )
+    df_candidates["biomass_yearly"] = [10.0, 10.0, 30.0]
+    constraints = ResourceConstraints(
+        df_candidates=df_candidates, regions=["Africa", "Europe"], sources=()
+    )
+
+    remaining = np.zeros((2, len(RESOURCE_USE)))
+    remaining[:, 0] = [20, 20]
+    df = constraints.get_feasible(remaining=remaining)
+    assert df.destination.tolist() == ["A", "B"]
+    assert df.Biomass.tolist() == [20, 20]
+
+    remaining[1, 0] = np.nan
+    assert constraints.get_feasible(remaining=remaining).destination.tolist() == ["A"]
@@ -0,0 +1,31 @@
+import pytest
+
+import config
+import config_template
+from models.run_config import RunConfig
+
+
+def test_run_config():
+    """Should start from config.py, with the overrides of the run"""
+    default = RunConfig()
+    assert default.RETROFIT_CAP == config.RETROFIT_CAP
+    assert default.START_YEAR == config.START_YEAR
+
+    run_config = RunConfig(RETROFIT_CAP=0.5)
+    assert run_config.RETROFIT_CAP == 0.5
+
+    replaced = run_config.replace(REGIONAL_CAP=0.1)
+    assert replaced.RETROFIT_CAP == 0.5
+    assert replaced.REGIONAL_CAP == 0.1
+    assert run_config.REGIONAL_CAP == config.REGIONAL_CAP
+
+    with pytest.raises(ValueError):
+        RunConfig(NOT_A_CONSTANT=1)
+    with pytest.raises(ValueError):
+        RunConfig(METHANOL_TYPES=[])
+
+
+def test_missing_constant(monkeypatch):
+    """A constant that config.py does not have should come from config_template.py"""
+    monkeypatch.delattr(config, "WORK_QUEUE")
+    assert RunConfig().WORK_QUEUE == config_template.WORK_QUEUE
@@ -0,0 +1,26 @@
+import os
+
+from models.run_scheduler import RunScheduler
+
+
+def _run(name, exit_code):
+    if name == "error":
+        raise ValueError("Run failed")
+    if exit_code:
+        os._exit(exit_code)
+
+
+def test_run():
+    """Should report the traceback or exit code of failed runs, after retrying them"""
+    runs = [("ok", 0), ("error", 0), ("killed", 3)]
+    summary = RunScheduler(func=_run, max_workers=2, retries=1).run(runs)
+
+    assert [result["status"] for result in summary] == [
+        "succeeded",
+        "failed",
+        "failed",
+    ]
+    assert [result["exit_code"] for result in summary] == [0, 1, 3]
+    assert [result["attempts"] for result in summary] == [1, 2, 2]
+    assert "ValueError: Run failed" in summary[1]["error"]
+    assert summary[2]["error"] == "Worker exited with code 3"
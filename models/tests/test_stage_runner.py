@@ -0,0 +1,62 @@
+import config
+from models.stage_runner import Stage, StageRunner
+
+
+def test_run(tmp_path, monkeypatch):
+    """Should only run a stage again when its inputs or config constants changed"""
+    calls = []
+
+    def func(pathway, config):
+        calls.append(pathway)
+        tmp_path.joinpath("output.csv").write_text(
+            tmp_path.joinpath("input.csv").read_text()
+        )
+
+    stage = Stage(
+        name="STAGE",
+        func=func,
+        inputs=["input.csv"],
+        config=["REGIONAL_CAP"],
+        outputs=["output.csv"],
+    )
+    tmp_path.joinpath("input.csv").write_text("a")
+
+    assert StageRunner(output_dir=tmp_path).run(stage, pathway="me")
+    assert not StageRunner(output_dir=tmp_path).run(stage, pathway="me")
+    assert StageRunner(output_dir=tmp_path).run(stage, pathway="nf")
+
+    tmp_path.joinpath("input.csv").write_text("b")
+    assert StageRunner(output_dir=tmp_path).run(stage, pathway="nf")
+
+    monkeypatch.setattr(config, "REGIONAL_CAP", 0.5)
+    assert StageRunner(output_dir=tmp_path).run(stage, pathway="nf")
+    assert not StageRunner(output_dir=tmp_path).run(stage, pathway="nf")
+
+    tmp_path.joinpath("output.csv").unlink()
+    assert StageRunner(output_dir=tmp_path).run(stage, pathway="nf")
+    assert calls == ["me", "nf", "nf", "nf", "nf"]
+
+
+def test_run_own_outputs(tmp_path):
+    """Its own outputs should not make a stage run again, even if its inputs match"""
+    calls = []
+
+    def func(config):
+        calls.append(True)
+        tmp_path.joinpath("intermediate", "output.csv").write_text(str(len(calls)))
+
+    stage = Stage(
+        name="STAGE",
+        func=func,
+        inputs=["intermediate/*.csv"],
+        outputs=["intermediate/output.csv"],
+    )
+    tmp_path.joinpath("intermediate").mkdir()
+    tmp_path.joinpath("intermediate", "input.csv").write_text("a")
+
+    assert StageRunner(output_dir=tmp_path).run(stage)
+    assert not StageRunner(output_dir=tmp_path).run(stage)
+
+    tmp_path.joinpath("intermediate", "input.csv").write_text("b")
+    assert StageRunner(output_dir=tmp_path).run(stage)
+    assert len(calls) == 2
@@ -0,0 +1,59 @@
+import pandas as pd
+
+from models.tech_eligibility import TechEligibility
+
+
+def _make_eligibility():
+    df_tech = pd.DataFrame(
+        [
+            ("Ethylene", "Naphtha steam cracking", "Initial", "Fossil", 2020, 2050),
+            ("Ethylene", "MTO - Green", "End-state", "Clean", 2030, 2050),
+            ("Propylene", "MTO - Green", "End-state", "Clean", 2030, 2050),
+            ("Propylene", "PDH", "Initial", "Fossil", 2020, 2040),
+        ],
+        columns=[
+            "chemical",
+            "technology",
+            "type_of_tech",
+            "category_detailed",
+            "available_from",
+            "available_until",
+        ],
+    )
+    df_multi_product_ratio = pd.DataFrame(
+        {
+            "technology": ["MTO - Green", "MTO - Green"],
+            "primary_chemical": ["Ethylene", "Ethylene"],
+            "chemical": ["Ethylene", "Propylene"],
+        }
+    )
+    return TechEligibility(
+        df_tech=df_tech, df_multi_product_ratio=df_multi_product_ratio
+    )
+
+
+def test_is_available():
+    """Tech should be available from and until its years, for its own chemical only"""
+    eligibility = _make_eligibility()
+    technologies = ["Naphtha steam cracking", "MTO - Green", "PDH", "Unknown"]
+
+    assert eligibility.is_available(
+        chemical="Ethylene", year=2025, technologies=technologies
+    ).tolist() == [True, False, False, False]
+    assert eligibility.is_available(
+        chemical="Propylene", year=2045, technologies=technologies
+    ).tolist() == [False, True, False, False]
+
+
+def test_is_primary():
+    """Multi product tech should only be kept for rows of its primary chemical"""
+    eligibility = _make_eligibility()
+    chemicals = ["Ethylene", "Propylene", "Propylene"]
+    technologies = ["MTO - Green", "MTO - Green", "PDH"]
+
+    assert eligibility.is_primary(
+        chemical="Ethylene", chemicals=chemicals, technologies=technologies
+    ).tolist() == [True, False, True]
+    assert eligibility.is_primary(
+        chemical="Propylene", chemicals=chemicals, technologies=technologies
+    ).tolist() == [False, False, True]
@@ -0,0 +1,37 @@
+from models.work_queue import WorkQueue
+
+
+def _run(pathway, sensitivity):
+    if sensitivity == "ccs":
+        raise ValueError("Run failed")
+
+
+def test_work(tmp_path):
+    """Should run every queued run once, retry failed runs and merge only once"""
+    queue = WorkQueue(path=tmp_path.joinpath("runs.db"), retries=1)
+    queue.enqueue([("me", "def"), ("me", "ccs")])
+    queue.enqueue([("me", "def")])
+
+    queue.work(func=_run, worker="host:1")
+
+    summary = queue.summary()
+    assert [result["run"] for result in summary] == [["me", "def"], ["me", "ccs"]]
+    assert [result["status"] for result in summary] == ["succeeded", "failed"]
+    assert [result["attempts"] for result in summary] == [1, 2]
+    assert "ValueError: Run failed" in summary[1]["error"]
+
+    assert queue.is_drained()
+    assert queue.claim_event("MERGE_OUTPUTS", worker="host")
+    assert not queue.claim_event("MERGE_OUTPUTS", worker="other host")
+
+
+def test_claim_abandoned(tmp_path):
+    """A run should be claimed again when its worker stopped sending heartbeats"""
+    queue = WorkQueue(path=tmp_path.joinpath("runs.db"), retries=1, timeout=0)
+    queue.enqueue([("me", "def")])
+
+    job_id, run = queue.claim(worker="host:1")
+    assert run == ("me", "def")
+    assert queue.claim(worker="host:2") == (job_id, run)
+    assert queue.claim(worker="host:3") is None
+    assert queue.summary()[0]["status"] == "failed"
@@ -0,0 +1,25 @@
+import pandas as pd
+import pytest
+
+from models.year_table import YearTable
+
+
+def test_get_set():
+    """Values should be looked up and overwritten per key and year"""
+    df = pd.DataFrame(
+        {
+            "chemical": ["Ethylene", "Ethylene", "Ammonia"],
+            "year": [2020, 2021, 2021],
+            "demand": [1.0, 2.0, 3.0],
+            "unit": "Mt",
+        }
+    )
+    table = YearTable(df, key="chemical", value="demand")
+    assert table.get("Ethylene", 2021) == 2
+    with pytest.raises(KeyError):
+        table.get("Ammonia", 2020)
+
+    table.set("Ammonia", 2021, 5.0)
+    df_out = table.to_dataframe()
+    assert list(df_out.columns) == list(df.columns)
+    assert df_out.demand.tolist() == [1.0, 2.0, 5.0]
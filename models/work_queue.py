@@ -0,0 +1,226 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from pathlib import Path
+
+from config import LOG_LEVEL
+
+logger = logging.getLogger(__name__)
+logger.setLevel(LOG_LEVEL)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    run TEXT UNIQUE NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    heartbeat REAL,
+    duration REAL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS events (name TEXT PRIMARY KEY, worker TEXT, time REAL);
+"""
+
+
+class WorkQueue:
+    """
+    Durable queue of model runs in a SQLite database, shared by workers on any host
+
+    Workers claim pending runs one at a time and send a heartbeat while running them.
+    A run whose worker stopped sending heartbeats for `timeout` seconds (e.g. it was
+    killed, or its host went down) is given back to the queue, or marked failed after
+    `retries` retries, like a run that raised. The database can be on shared storage,
+    as long as it supports file locks.
+    """
+
+    def __init__(
+        self,
+        path,
+        retries: int = 0,
+        heartbeat_interval: float = 30,
+        timeout: float = 300,
+    ):
+        """
+        Args:
+            path: Path of the SQLite database, created if it does not exist
+            retries: Number of times a failed or abandoned run is tried again
+            heartbeat_interval: Seconds between heartbeats of a running run
+            timeout: Seconds without heartbeat after which a run is abandoned
+        """
+        self.path = str(path)
+        self.retries = retries
+        self.heartbeat_interval = heartbeat_interval
+        self.timeout = timeout
+
+        Path(self.path).parent.mkdir(exist_ok=True, parents=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, runs: list):
+        """Add runs to the queue, unless they are in it already"""
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO jobs (run) VALUES (?)",
+                [(json.dumps(list(run)),) for run in runs],
+            )
+
+    def _requeue_abandoned(self, conn: sqlite3.Connection):
+        expired = time.time() - self.timeout
+        conn.execute(
+            """
+            UPDATE jobs SET
+                status = CASE WHEN attempts <= ? THEN 'pending' ELSE 'failed' END,
+                error = 'Worker ' || worker || ' stopped sending heartbeats'
+            WHERE status = 'running' AND heartbeat < ?
+            """,
+            (self.retries, expired),
+        )
+
+    def claim(self, worker: str):
+        """
+        Claim the next pending run
+
+        Returns:
+            Id and arguments of the run, or None if no run is pending
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._requeue_abandoned(conn)
+            row = conn.execute(
+                "SELECT id, run FROM jobs WHERE status = 'pending' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    """
+                    UPDATE jobs SET status = 'running', worker = ?, heartbeat = ?,
+                        attempts = attempts + 1
+                    WHERE id = ?
+                    """,
+                    (worker, time.time(), row[0]),
+                )
+            conn.execute("COMMIT")
+
+        return None if row is None else (row[0], tuple(json.loads(row[1])))
+
+    def heartbeat(self, job_id: int, worker: str):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET heartbeat = ? WHERE id = ? AND worker = ?",
+                (time.time(), job_id, worker),
+            )
+
+    def complete(self, job_id: int, worker: str, duration: float, error: str = None):
+        """Mark a run as done, or failed (pending again if it can be retried)"""
+        with self._connect() as conn:
+            conn.execute(
+                """
+                UPDATE jobs SET
+                    status = CASE
+                        WHEN ? IS NULL THEN 'done'
+                        WHEN attempts <= ? THEN 'pending'
+                        ELSE 'failed'
+                    END,
+                    duration = ?,
+                    error = ?
+                WHERE id = ? AND worker = ? AND status = 'running'
+                """,
+                (error, self.retries, round(duration, 1), error, job_id, worker),
+            )
+
+    def is_drained(self) -> bool:
+        """Check if all runs are done or failed"""
+        with self._connect() as conn:
+            self._requeue_abandoned(conn)
+            (n_open,) = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'running')"
+            ).fetchone()
+        return n_open == 0
+
+    def claim_event(self, name: str, worker: str) -> bool:
+        """Claim a one-off event (e.g. merging outputs), True for the first claim only"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO events (name, worker, time) VALUES (?, ?, ?)",
+                (name, worker, time.time()),
+            )
+        return cursor.rowcount == 1
+
+    def summary(self) -> list:
+        """Status of every run, in the layout of the run scheduler summary"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT run, status, attempts, worker, duration, error FROM jobs "
+                "ORDER BY id"
+            ).fetchall()
+        return [
+            {
+                "run": json.loads(run),
+                "status": "succeeded" if status == "done" else status,
+                "attempts": attempts,
+                "worker": worker,
+                "duration": duration,
+                "error": error,
+            }
+            for run, status, attempts, worker, duration, error in rows
+        ]
+
+    def work(self, func, worker: str = None):
+        """
+        Run `func` for claimed runs until the queue is drained
+
+        While other workers are running the last runs, wait for them: their runs are
+        given back to the queue if they are abandoned.
+
+        Args:
+            func: Function called with the arguments of each run
+            worker: Name of this worker, defaults to host and process id
+        """
+        worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+        while True:
+            job = self.claim(worker)
+            if job is None:
+                if self.is_drained():
+                    return
+                time.sleep(self.heartbeat_interval)
+                continue
+
+            job_id, run = job
+            logger.info(f"Worker {worker} running {run}")
+            stop = threading.Event()
+            beat = threading.Thread(
+                target=self._send_heartbeats, args=(job_id, worker, stop), daemon=True
+            )
+            beat.start()
+
+            start = time.perf_counter()
+            error = None
+            try:
+                func(*run)
+            except Exception:
+                error = traceback.format_exc()
+                logger.error(f"Worker {worker} failed running {run}:\n{error}")
+            finally:
+                stop.set()
+                beat.join()
+            self.complete(
+                job_id, worker, duration=time.perf_counter() - start, error=error
+            )
+
+    def _send_heartbeats(self, job_id: int, worker: str, stop: threading.Event):
+        while not stop.wait(self.heartbeat_interval):
+            self.heartbeat(job_id, worker)
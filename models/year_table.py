@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+
+class YearTable:
+    """
+    Dense table of a value per key (e.g. chemical or technology) and year
+
+    Holds the values in a (key x year) array, with a code per key, so looking up or
+    overwriting a value does not scan the dataframe. The table is created from, and
+    exported to, a dataframe with one row per key and year.
+    """
+
+    def __init__(self, df: pd.DataFrame, key: str, value: str):
+        self.key = key
+        self.value = value
+
+        # Keep the other columns of every row, to export in the same layout
+        self._columns = list(df.columns)
+        self._rows = df.drop(columns=[value])
+
+        self.keys = list(df[key].unique())
+        self.start_year = int(df["year"].min())
+        self.years = np.arange(self.start_year, int(df["year"].max()) + 1)
+        self._key_index = {k: i for i, k in enumerate(self.keys)}
+
+        self._row_key = df[key].map(self._key_index).values
+        self._row_year = df["year"].values.astype(int) - self.start_year
+
+        shape = (len(self.keys), len(self.years))
+        self.exists = np.zeros(shape, dtype=bool)
+        self.values = np.full(shape, np.nan)
+
+        # The first row counts if a key and year are in the dataframe more than once
+        first = ~df.duplicated(subset=[key, "year"]).values
+        cells = (self._row_key[first], self._row_year[first])
+        self.exists[cells] = True
+        self.values[cells] = df[value].values[first]
+
+    def _cell(self, key, year):
+        i = self._key_index.get(key)
+        y = year - self.start_year
+        if i is None or not 0 <= y < len(self.years) or not self.exists[i, y]:
+            raise KeyError(f"No {self.value} for {self.key} {key} in {year}")
+        return i, y
+
+    def get(self, key, year) -> float:
+        return float(self.values[self._cell(key, year)])
+
+    def set(self, key, year, value):
+        self.values[self._cell(key, year)] = value
+        return self
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Export the table in the layout of the dataframe it was created from"""
+        df = self._rows.copy()
+        df[self.value] = self.values[self._row_key, self._row_year]
+        return df[self._columns]